@@ -1,36 +1,45 @@
-import pandas as pd
-from typing import List
+import logging
+
+from typing import List, TYPE_CHECKING
 from pathlib import Path
 from decimal import Decimal
 
 from Core.Dataclasses import ProtoTransaction
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
 
 class BinanceCSVReader:
 
     @classmethod
     def import_directory(cls, directory: [str, Path]):
-        print("Starting importing directory")
         directory = cls._convert_to_path(directory)
+        logger.debug("Importing directory %s", directory)
 
         csv_files = directory.glob('*.csv')
 
         transactions_list = []
+        number_of_files = 0
         for file in csv_files:
             transactions_list.extend(cls.import_file(file))
+            number_of_files += 1
 
-        print(f"Finished importing all files. Generated {len(transactions_list)} transactions")
+        logger.info("Imported %d transactions from %d files in %s", len(transactions_list), number_of_files,
+                    directory)
         return transactions_list
 
     @classmethod
     def import_file(cls, file: [str, Path]) -> List[ProtoTransaction]:
+        import pandas as pd
         file = cls._convert_to_path(file)
-        print(f"Importing file {file}")
-        print(f"Reading file...")
-        data = pd.read_csv(file, infer_datetime_format=True, parse_dates=['UTC_Time'], dtype={'Change': str})
-        print(f"Finished read file")
+        data = pd.read_csv(file, parse_dates=['UTC_Time'], dtype={'Change': str})
         transactions_list = cls._parse_data(data)
-        print(f"Finished parsing data - from: {data['UTC_Time'][0]} to {data['UTC_Time'][data.index[-1]]}")
+        if len(data):
+            logger.debug("Imported %d transactions from %s, from %s to %s", len(transactions_list), file,
+                         data['UTC_Time'].iloc[0], data['UTC_Time'].iloc[-1])
 
         return transactions_list
 
@@ -41,19 +50,18 @@ class BinanceCSVReader:
         return string
 
     @classmethod
-    def _parse_data(cls, data: pd.DataFrame) -> List[ProtoTransaction]:
-        print("Parsing data")
-        total_rows = len(data)
+    def _parse_data(cls, data: 'pd.DataFrame') -> List[ProtoTransaction]:
+        import pandas as pd
+        # The whole column is parsed at once, the rows get their time already parsed
+        utc_times = pd.to_datetime(data['UTC_Time'])
         transactions_list = []
-        for idx, row in data.iterrows():
-            # print(f"Parsing transaction {idx} of {total_rows}")
-            transactions_list.append(cls._parse_entry(row))
+        for (idx, row), utc_time in zip(data.iterrows(), utc_times):
+            transactions_list.append(cls._parse_entry(row, utc_time))
         return transactions_list
 
     @classmethod
-    def _parse_entry(cls, row: pd.Series) -> ProtoTransaction:
+    def _parse_entry(cls, row: 'pd.Series', utc_time: 'pd.Timestamp') -> ProtoTransaction:
         # ['User_ID', 'UTC_Time', 'Account', 'Operation', 'Coin', 'Change', 'Remark']
-        utc_time = pd.to_datetime(row['UTC_Time'])
         value = Decimal(row['Change'])
         transaction_type = cls._get_transaction_type(row['Operation'], value)
         coin = row['Coin']
@@ -0,0 +1,82 @@
+"""Import, validate, process and export a portfolio without the GUI.
+
+Run from the repository root with ``python -m CLI --config config.json --output report.json``. The config is the one
+of the GUI, ``csv_folder``, ``keys_path`` and ``cache_folder`` are required. Only the standard library is imported
+until the arguments are parsed, and every stage imports its own dependencies, so a cron job that fails early does not
+pay for pandas or binance.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('json', 'csv')
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m CLI', description=__doc__.splitlines()[0])
+    parser.add_argument('--config', type=Path, default=Path('config.json'))
+    parser.add_argument('--csv-folder', type=Path, help="Overrides csv_folder of the config")
+    parser.add_argument('--cache-folder', type=Path, help="Overrides cache_folder of the config")
+    parser.add_argument('--fiat', default='EUR')
+    parser.add_argument('--output', type=Path, help="Report file, written to stdout when not given")
+    parser.add_argument('--format', choices=FORMATS, help="Taken from the output suffix, json by default")
+    parser.add_argument('--workers', type=int, default=0, help="Coins processed at the same time")
+    parser.add_argument('--aggregate-interest', action=argparse.BooleanOptionalAction,
+                        help="Fold the interest payments of a day, taken from the config by default")
+    parser.add_argument('--verbose', '-v', action='store_true')
+    args = parser.parse_args(argv)
+    if args.format is None:
+        suffix = args.output.suffix.lstrip('.').lower() if args.output is not None else ''
+        args.format = suffix if suffix in FORMATS else 'json'
+    return args
+
+
+def run(args: argparse.Namespace) -> int:
+    from Core.config import Config
+    from Core.database import TransactionValidator
+    from Core.metrics import MetricsRegistry
+    from .pipeline import load_database
+
+    metrics = MetricsRegistry()
+    try:
+        db_api = load_database(Config(args.config), args.csv_folder, args.cache_folder, args.fiat,
+                               args.aggregate_interest, metrics)
+    except TransactionValidator.ValidationError as error:
+        print(error.report, file=sys.stderr)
+        return 1
+
+    from .report import coin_report_row, write_csv, write_json
+    if args.workers > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(args.workers, thread_name_prefix='prices') as executor:
+            rows = [coin_report_row(*x) for x in db_api.process_coins(executor=executor)]
+    else:
+        rows = [coin_report_row(*x) for x in db_api.process_coins()]
+    rows.sort(key=lambda x: x['coin'])
+
+    stream = open(args.output, 'w', newline='') if args.output is not None else sys.stdout
+    try:
+        if args.format == 'csv':
+            write_csv(rows, stream)
+        else:
+            write_json(rows, stream, args.fiat, metrics.to_dict())
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    logger.info("Report of %d coins written", len(rows))
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr,
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
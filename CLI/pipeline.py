@@ -0,0 +1,38 @@
+from pathlib import Path
+from typing import Optional, Union
+
+from Core.config import Config
+from Core.database import DataBaseAPI, TransactionValidator
+from Core.metrics import MetricsRegistry
+
+
+def load_database(config: Config, csv_folder: Optional[Union[str, Path]] = None,
+                  cache_folder: Optional[Union[str, Path]] = None, fiat: str = 'EUR',
+                  aggregate_interest: Optional[bool] = None,
+                  metrics: Optional[MetricsRegistry] = None) -> DataBaseAPI:
+    """Database with the transactions of every CSV export in the folder, not processed yet.
+
+    The folders and `aggregate_interest` not given are taken from the config. Interest is only aggregated when the
+    config turns it on, since the aggregates replace the original transactions in the lots. Raises
+    `TransactionValidator.ValidationError` when the import is not valid.
+    """
+    csv_folder = csv_folder or config.get_config_value('csv_folder')
+    cache_folder = cache_folder or config.get_config_value('cache_folder')
+    if aggregate_interest is None:
+        aggregate_interest = config.get_config_value('aggregate_interest', False)
+
+    from API.CSVReader import BinanceCSVReader
+    proto_transactions = BinanceCSVReader.import_directory(csv_folder)
+
+    from Core.CoinAPIExternal import BinanceAPI
+    external_api = BinanceAPI(config.get_config_value('keys_path'), cache_folder, metrics=metrics)
+    db_api = DataBaseAPI(DataBaseAPI.create_new_database(config.get_config_value('database_name', 'default')),
+                         external_api, fiat, metrics=metrics)
+
+    validator = TransactionValidator(db_api, config.get_config_value('duplicate_whitelist', None))
+    transactions = validator.validate_and_parse_transactions(proto_transactions)
+    if aggregate_interest:
+        from Core.interestAggregator import InterestAggregator
+        transactions = InterestAggregator().aggregate(transactions)
+    db_api.add_transaction(transactions)
+    return db_api
@@ -0,0 +1,40 @@
+import csv
+import json
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, TextIO
+
+from Core.Dataclasses import CoinData
+
+REPORT_COLUMNS = ('coin', 'spot_quantity', 'earn_quantity', 'current_value_per_unit', 'current_total_value',
+                  'current_average_cost', 'total_costs', 'total_current_cost', 'total_unrealized_gains',
+                  'total_realized_gains', 'total_realized_value', 'total_fees')
+
+Row = Dict[str, Optional[str]]
+
+
+def _to_text(value: Optional[Decimal]) -> Optional[str]:
+    # Decimals are written as text so no precision is lost on the way to JSON or CSV
+    return None if value is None else str(value)
+
+
+def coin_report_row(coin_tick: str, coin_data: CoinData) -> Row:
+    """Row of the report with the totals of a processed coin, every value as text."""
+    values = {name: getattr(coin_data, name) for name in REPORT_COLUMNS[1:-1]}
+    values['total_fees'] = coin_data.fees_data.total_cost
+    row = {'coin': coin_tick}
+    row.update((name, _to_text(value)) for name, value in values.items())
+    return row
+
+
+def write_json(rows: Iterable[Row], stream: TextIO, fiat: str, metrics: Optional[Dict] = None):
+    report = {'fiat': fiat, 'coins': list(rows)}
+    if metrics is not None:
+        report['metrics'] = metrics
+    json.dump(report, stream, indent=2)
+    stream.write('\n')
+
+
+def write_csv(rows: Iterable[Row], stream: TextIO):
+    writer = csv.DictWriter(stream, fieldnames=REPORT_COLUMNS, lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(rows)
@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+import subprocess
+import sys
+from decimal import Decimal
+from pathlib import Path
+from unittest import TestCase
+
+from Core.Dataclasses import Coin, CoinData, CoinEarn, CoinInfo, FeeData
+from ..__main__ import parse_args
+from ..report import REPORT_COLUMNS, coin_report_row, write_csv, write_json
+
+
+def _coin_data(tick: str) -> CoinData:
+    coin = Coin(CoinInfo(tick, tick), [])
+    return CoinData(coin=coin, spot_quantity=Decimal('1.5'), earn_quantity=Decimal('0'),
+                    current_value_per_unit=Decimal('0.1'), current_average_cost=Decimal('0.05'),
+                    total_costs=Decimal('0.075'), total_current_cost=Decimal('0.075'),
+                    total_unrealized_gains=Decimal('0.075'), current_total_value=Decimal('0.15'),
+                    total_realized_gains=Decimal('0'), total_realized_value=Decimal('0'), fees_data=FeeData(),
+                    coin_earn=CoinEarn(coin, Decimal('0')))
+
+
+class TestReport(TestCase):
+
+    def test_rows_keep_decimals_as_text(self):
+        row = coin_report_row('BTC', _coin_data('BTC'))
+
+        assert tuple(row) == REPORT_COLUMNS
+        assert row['coin'] == 'BTC'
+        assert row['spot_quantity'] == '1.5'
+        assert row['current_value_per_unit'] == '0.1'
+        assert row['total_fees'] == '0'
+
+    def test_json_and_csv(self):
+        rows = [coin_report_row(x, _coin_data(x)) for x in ('BTC', 'ETH')]
+
+        stream = io.StringIO()
+        write_json(rows, stream, 'EUR', {'counters': {}, 'timers': {}})
+        report = json.loads(stream.getvalue())
+        assert report['fiat'] == 'EUR'
+        assert [x['coin'] for x in report['coins']] == ['BTC', 'ETH']
+        assert 'metrics' in report
+
+        stream = io.StringIO()
+        write_csv(rows, stream)
+        assert list(csv.DictReader(io.StringIO(stream.getvalue()))) == rows
+
+    def test_format_from_output(self):
+        assert parse_args([]).format == 'json'
+        assert parse_args(['--output', 'report.CSV']).format == 'csv'
+        assert parse_args(['--output', 'report.txt']).format == 'json'
+        assert parse_args(['--output', 'report.json', '--format', 'csv']).format == 'csv'
+
+    def test_aggregate_interest_from_config_by_default(self):
+        assert parse_args([]).aggregate_interest is None
+        assert parse_args(['--aggregate-interest']).aggregate_interest is True
+        assert parse_args(['--no-aggregate-interest']).aggregate_interest is False
+
+    def test_no_heavy_imports_at_start(self):
+        root = Path(__file__).resolve().parents[2]
+        code = ("import sys, CLI.__main__, CLI.report; "
+                "print(','.join(x for x in ('pandas', 'binance', 'PyQt5') if x in sys.modules))")
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+        assert output.stdout.strip() == ''
@@ -1,13 +1,19 @@
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Dict, Callable
+from typing import Dict, Iterable, List, Optional, Set, TYPE_CHECKING
 from decimal import Decimal
-
-import pandas as pd
-from binance.client import Client
+import logging
 
 from .Dataclasses import CoinInfo
+from .fixedPoint import DEFAULT_SCALE
+from .metrics import MetricsRegistry
+from .priceHistory import Kline, PriceHistoryDatabase, Resolution
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
 
 
 class APIBase:
@@ -15,6 +21,30 @@ class APIBase:
     def get_conversion_rate(self, first: str, second: str, date: datetime) -> Decimal:
         raise NotImplementedError
 
+    def get_quantity_precision(self, coin_tick: str) -> int:
+        return DEFAULT_SCALE
+
+    def get_daily_conversion_rates(self, first: str, second: str, start: date, days: int) -> List[Optional[Decimal]]:
+        rates = []
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            try:
+                rates.append(self.get_conversion_rate(first, second, datetime(day.year, day.month, day.day)))
+            except (KeyError, ValueError):
+                rates.append(None)
+        return rates
+
+    def get_current_conversion_rates(self, coins: Iterable[str], second: str) -> Dict[str, Decimal]:
+        """Current rate of every coin in `second`, coins without a conversion are left out."""
+        rates = {}
+        now = datetime.now()
+        for coin_tick in coins:
+            try:
+                rates[coin_tick] = self.get_conversion_rate(coin_tick, second, now)
+            except (KeyError, ValueError):
+                pass
+        return rates
+
 
 class CoinAPI:
     __FTM_coin_info = CoinInfo('FTM', 'Phantom')
@@ -60,6 +90,7 @@ class BinanceAPI(APIBase):
     class Coin:
         coin_tick: str
         coin_pairs: Dict[str, 'BinanceAPI.Pair']
+        precision: int = DEFAULT_SCALE
 
     @dataclass
     class Pair:
@@ -71,49 +102,11 @@ class BinanceAPI(APIBase):
         def __post_init__(self):
             self.inv_symbol = self.second.coin_tick + self.first.coin_tick
 
-    class PriceHistoryDatabase:
-
-        def __init__(self, path: Path, request_callback: Callable[[str, datetime], Decimal], verbose: bool):
-            self._cache_path = path
-            self._cached_data = {}
-            self._request_price = request_callback
-            self._verbose = verbose
-
-            self._load_cached_data()
-
-            self.file_handler = self._cache_path.open('a')
-
-        def __del__(self):
-            self.file_handler.close()
-
-        def _load_cached_data(self):
-            if not self._cache_path.exists():
-                return None
-
-            with self._cache_path.open('r') as f:
-                if self._verbose:
-                    print("Loading price cache from file")
-                for row in f.readlines():
-                    id, value = row.split(';')
-                    self._cached_data[id] = value
-
-        def _add_to_cache(self, cached_id: str, value: Decimal):
-            self._cached_data[cached_id] = value
-            self.file_handler.write(f"{cached_id};{value}\n")
-
-        def get_price(self, symbol, date: datetime) -> Decimal:
-            timestamp = str(int(date.timestamp() * 1000))
-            cached_id = f"{symbol.symbol}_{timestamp}"
-            if cached_id in self._cached_data:
-                if self._verbose:
-                    print(f"Using cache: {cached_id}")
-                return Decimal(self._cached_data[cached_id])
-            else:
-                if self._verbose:
-                    print(f"Requesting price: {cached_id}")
-                value = self._request_price(symbol.symbol, date)
-                self._add_to_cache(cached_id, value)
-                return Decimal(value)
+    PriceHistoryDatabase = PriceHistoryDatabase
+    Resolution = Resolution
+
+    _RESOLUTION_INTERVALS = {Resolution.M1: timedelta(minutes=1), Resolution.H1: timedelta(hours=1),
+                             Resolution.D1: timedelta(days=1)}
 
     class LimitCheck:
         """Unused"""
@@ -126,104 +119,178 @@ class BinanceAPI(APIBase):
     class ConversionError(Exception):
         pass
 
-    def __init__(self, keys_path, cache_folder, verbose: bool = False):
-
-        keys = self._readKeys(keys_path)
+    def __init__(self, keys_path, cache_folder, verbose: bool = False, price_tolerance: timedelta = timedelta(0),
+                 client=None, metrics: Optional[MetricsRegistry] = None):
 
         self._cache_validity = timedelta(days=15)
         self._cache_folder_path = Path(cache_folder)
         self._check_cache_folder(self._cache_folder_path)
         self._cache_pairs_path = self._cache_folder_path / "pairs_cache.csv"
 
-        self._client = self._create_client(keys)
+        # Any object with the Client calls used here, like Core.fakeBinance.FakeBinanceClient for offline runs
+        self._client = client if client is not None else self._create_client(self._readKeys(keys_path))
 
         self._coin_dict = {}
         self._pairs_priority = ('BTC', 'ETH', 'BNB', 'BUSD', 'USDT')
 
         self._cache_price_path = self._cache_folder_path / "price_history.txt"
-        self._price_history_db = self.PriceHistoryDatabase(self._cache_price_path, self._get_price, verbose)
+        self._price_history_db = self.PriceHistoryDatabase(self._cache_price_path, self._get_klines, verbose,
+                                                           self._get_kline_range, tolerance=price_tolerance,
+                                                           metrics=metrics)
 
         symbols_dataframe = self._check_pairs_cache(self._cache_pairs_path)
         self._build_pairs(symbols_dataframe)
 
+    @property
+    def metrics(self) -> MetricsRegistry:
+        return self._price_history_db.metrics
+
+    def compact_price_cache(self):
+        self._price_history_db.compact()
+
     def _create_client(self, keys):
+        # Imported here, binance takes longer to import than the rest of Core together
+        from binance.client import Client
         client = Client(**keys)
         client.ping()
         return client
 
-    def _get_price(self, symbol: str, target_time: datetime) -> Decimal:
-
-        start_time = target_time - timedelta(seconds=30)
-        start_time_timestamp = int(start_time.timestamp() * 1000)
-        end_time = target_time + timedelta(seconds=30)
-        end_time_timestamp = int(end_time.timestamp() * 1000)
+    def _get_klines(self, symbol: str, target_time: datetime, resolution: str = Resolution.M1) -> List[Kline]:
+        # From the candle containing the time up to half an interval later, in case that candle is missing
+        interval = self._RESOLUTION_INTERVALS[resolution]
+        target_time_timestamp = int(target_time.timestamp() * 1000)
+        start_time_timestamp = target_time_timestamp - target_time_timestamp % int(interval.total_seconds() * 1000)
+        end_time_timestamp = int((target_time + interval / 2).timestamp() * 1000)
 
-        data = self._client.get_historical_klines(symbol, self._client.KLINE_INTERVAL_1MINUTE,
-                                                  start_time_timestamp,
-                                                  end_time_timestamp)
+        data = self._client.get_historical_klines(symbol, resolution, start_time_timestamp, end_time_timestamp)
 
         if not data:
             raise self.ConversionError
-        kline = data[0]
-        average = (Decimal(kline[1]) + Decimal(kline[4])) * Decimal(0.5)
-        return average
+        return self._to_klines(data)
 
-    def get_conversion_rate(self, first: str, second: str, date: datetime) -> Decimal:
-        return self._conversion(self.Pair(first + second, self._get_coin(first), self._get_coin(second)), date)
+    def _get_kline_range(self, symbol: str, resolution: str, start_timestamp: int, end_timestamp: int) -> List[Kline]:
+        return self._to_klines(self._client.get_historical_klines(symbol, resolution, start_timestamp, end_timestamp))
 
-    def _conversion(self, pair: Pair, date: datetime, force_search: bool = False) -> Decimal:
+    @staticmethod
+    def _to_klines(data) -> List[Kline]:
+        return [Kline(int(kline[0]), int(kline[6]), Decimal(kline[1]), Decimal(kline[4])) for kline in data]
+
+    def get_conversion_rate(self, first: str, second: str, date: datetime,
+                            resolution: str = Resolution.M1) -> Decimal:
+        return self._conversion(self.Pair(first + second, self._get_coin(first), self._get_coin(second)), date,
+                                resolution=resolution)
+
+    def get_daily_conversion_rates(self, first: str, second: str, start: date, days: int) -> List[Optional[Decimal]]:
+        pair = self.Pair(first + second, self._get_coin(first), self._get_coin(second))
+        return self._daily_conversion(pair, start, days)
+
+    def _daily_conversion(self, pair: Pair, start: date, days: int) -> List[Optional[Decimal]]:
+        coin = pair.first
+        if pair.symbol in coin.coin_pairs:
+            return self._price_history_db.get_daily_prices(coin.coin_pairs[pair.symbol], start, days)
+        elif pair.inv_symbol in coin.coin_pairs:
+            prices = self._price_history_db.get_daily_prices(coin.coin_pairs[pair.inv_symbol], start, days)
+            return [None if not x else Decimal(1) / x for x in prices]
+
+        for possible in self._pairs_priority:
+            if pair.first.coin_tick + possible in coin.coin_pairs:
+                first_leg = self._price_history_db.get_daily_prices(coin.coin_pairs[pair.first.coin_tick + possible],
+                                                                    start, days)
+                second_leg = self._daily_conversion(self.Pair(possible + pair.second.coin_tick,
+                                                              self._get_coin(possible), pair.second), start, days)
+                return [None if x is None or y is None else x * y for x, y in zip(first_leg, second_leg)]
+        raise ValueError(f"Not conversion found for {pair.first.coin_tick} and {pair.second.coin_tick}")
+
+    def get_current_conversion_rates(self, coins: Iterable[str], second: str) -> Dict[str, Decimal]:
+        """Current rates from a single request of the prices of every symbol."""
+        prices = {x['symbol']: Decimal(x['price']) for x in self._client.get_all_tickers()}
+        rates = {}
+        for coin_tick in coins:
+            rate = self._ticker_conversion(prices, coin_tick, second, set())
+            if rate is not None:
+                rates[coin_tick] = rate
+        return rates
+
+    def _ticker_conversion(self, prices: Dict[str, Decimal], first: str, second: str,
+                           visited: Set[str]) -> Optional[Decimal]:
+        if first == second:
+            return Decimal(1)
+        # Symbols not trading have a price of 0, they are skipped like the missing ones
+        if prices.get(first + second):
+            return prices[first + second]
+        if prices.get(second + first):
+            return Decimal(1) / prices[second + first]
+
+        # Through the same intermediate coins as _conversion_backtracking
+        visited = visited | {first}
+        for possible in self._pairs_priority:
+            if possible in visited or not prices.get(first + possible):
+                continue
+            rate = self._ticker_conversion(prices, possible, second, visited)
+            if rate is not None:
+                return prices[first + possible] * rate
+        return None
+
+    def _conversion(self, pair: Pair, date: datetime, force_search: bool = False,
+                    resolution: str = Resolution.M1) -> Decimal:
         coin = pair.first
         symbol = pair.symbol
         inv_symbol = pair.inv_symbol
         # TODO crec que aixo es pot fer un refactor
         if force_search:
-            return self._conversion_backtracking(coin, pair, date)
+            return self._conversion_backtracking(coin, pair, date, resolution)
 
         if symbol in coin.coin_pairs:
             try:
-                return self._get_conversion(coin.coin_pairs[symbol], date)
+                return self._get_conversion(coin.coin_pairs[symbol], date, resolution)
             except self.ConversionError:
-                return self._conversion(pair, date, force_search=True)
+                return self._conversion(pair, date, force_search=True, resolution=resolution)
         elif inv_symbol in coin.coin_pairs:
             try:
-                return Decimal(1) / self._get_conversion(coin.coin_pairs[inv_symbol], date)
+                return Decimal(1) / self._get_conversion(coin.coin_pairs[inv_symbol], date, resolution)
             except self.ConversionError:
-                return self._conversion(pair, date, force_search=True)
+                return self._conversion(pair, date, force_search=True, resolution=resolution)
         else:
-            return self._conversion_backtracking(coin, pair, date)
+            return self._conversion_backtracking(coin, pair, date, resolution)
 
-    def _conversion_backtracking(self, coin: Coin, pair: Pair, date: datetime):
+    def _conversion_backtracking(self, coin: Coin, pair: Pair, date: datetime, resolution: str = Resolution.M1):
         for possible in self._pairs_priority:
             try:
                 if pair.first.coin_tick + possible in coin.coin_pairs:
-                    return self._get_conversion(coin.coin_pairs[pair.first.coin_tick + possible], date) * \
+                    return self._get_conversion(coin.coin_pairs[pair.first.coin_tick + possible], date, resolution) * \
                            self._conversion(self.Pair(possible + pair.second.coin_tick, self._get_coin(possible),
                                                       pair.second),
-                                            date)
+                                            date, resolution=resolution)
             except self.ConversionError:
                 pass
         raise ValueError(f"Not conversion found for {pair.first.coin_tick} and {pair.second.coin_tick}")
 
+    def get_quantity_precision(self, coin_tick: str) -> int:
+        try:
+            return self._get_coin(coin_tick).precision
+        except KeyError:
+            return DEFAULT_SCALE
+
     def _get_coin(self, coin_name: str) -> Coin:
         try:
             return self._coin_dict[coin_name]
         except KeyError:
             raise KeyError(f"The coin {coin_name} doesn't exist in any pair")
 
-    def _get_conversion(self, symbol: Pair, date) -> Decimal:
-        return self._price_history_db.get_price(symbol, date)
+    def _get_conversion(self, symbol: Pair, date, resolution: str = Resolution.M1) -> Decimal:
+        return self._price_history_db.get_price(symbol, date, resolution)
 
     def _check_cache_folder(self, folder_path: Path):
         if not folder_path.exists():
             raise FileNotFoundError("Cache folder doesn't exist")
 
-    def _check_pairs_cache(self, pairs_path: Path) -> pd.DataFrame:
+    def _check_pairs_cache(self, pairs_path: Path) -> 'pd.DataFrame':
         if pairs_path.exists() and self._cache_is_valid(pairs_path):
-            print("Loading cached pairs data")
             pairs_dataframe = self._load_pair_data(pairs_path)
+            logger.info("Loaded %d cached pairs from %s", len(pairs_dataframe), pairs_path)
         else:
-            print("Retrieving pairs data")
             pairs_dataframe = self._retrieve_pairs_data()
+            logger.info("Retrieved %d pairs from the exchange", len(pairs_dataframe))
             self._save_pair_data(pairs_dataframe, pairs_path)
         return pairs_dataframe
 
@@ -234,25 +301,29 @@ class BinanceAPI(APIBase):
                 return False
         return True
 
-    def _retrieve_pairs_data(self) -> pd.DataFrame:
+    def _retrieve_pairs_data(self) -> 'pd.DataFrame':
+        import pandas as pd
         data = self._client.get_exchange_info()
 
         symbols_list = data['symbols']
 
         dataframe_temp_list = []
+        for symbol in symbols_list:
+            dataframe_temp_list.append((symbol['symbol'], symbol['baseAsset'], symbol['quoteAsset'],
+                                        symbol.get('baseAssetPrecision', DEFAULT_SCALE),
+                                        symbol.get('quoteAssetPrecision', DEFAULT_SCALE)))
 
-        number_of_symbols = len(symbols_list)
-        for idx, symbol in enumerate(symbols_list):
-            if idx % 100 == 0:
-                print(f"Adding symbol {idx} of {number_of_symbols}")
-            dataframe_temp_list.append((symbol['symbol'], symbol['baseAsset'], symbol['quoteAsset']))
-
-        return pd.DataFrame(dataframe_temp_list, columns=['Symbol', 'First', 'Second'])
+        return pd.DataFrame(dataframe_temp_list,
+                            columns=['Symbol', 'First', 'Second', 'FirstPrecision', 'SecondPrecision'])
 
-    def _build_pairs(self, symbols_dataframe: pd.DataFrame):
+    def _build_pairs(self, symbols_dataframe: 'pd.DataFrame'):
+        has_precision = 'FirstPrecision' in symbols_dataframe.columns
         for _, row in symbols_dataframe.iterrows():
             coin_first = self._get_or_create_coin(row['First'])
             coin_second = self._get_or_create_coin(row['Second'])
+            if has_precision:
+                coin_first.precision = int(row['FirstPrecision'])
+                coin_second.precision = int(row['SecondPrecision'])
             pair = self.Pair(row['Symbol'], coin_first, coin_second)
             coin_first.coin_pairs[pair.symbol] = pair
             coin_second.coin_pairs[pair.symbol] = pair
@@ -265,12 +336,13 @@ class BinanceAPI(APIBase):
             coin = self._coin_dict[coin_name]
         return coin
 
-    def _save_pair_data(self, symbols_dataframe: pd.DataFrame, path: Path):
+    def _save_pair_data(self, symbols_dataframe: 'pd.DataFrame', path: Path):
         with path.open('w') as fp:
             fp.write(f'{datetime.now().strftime("%Y%m%d")}\n')
             symbols_dataframe.to_csv(fp)
 
-    def _load_pair_data(self, path: Path) -> pd.DataFrame:
+    def _load_pair_data(self, path: Path) -> 'pd.DataFrame':
+        import pandas as pd
         with path.open('r') as fp:
             _ = fp.readline()
             return pd.read_csv(fp)
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from enum import Enum
 from decimal import Decimal
 from datetime import datetime
@@ -60,8 +60,25 @@ class Transaction:
         return self.id
 
 
+@dataclass(frozen=True, eq=False)
+class AggregatedTransaction(Transaction):
+    """Sum of several transactions of the same coin, operation type and account.
+
+    `source_ids` keeps the ids of the folded transactions, the aggregate id is derived from the first of them.
+    """
+    source_ids: Tuple[str, ...] = ()
+
+    def __post_init__(self):
+        if not self.source_ids:
+            raise ValueError("An aggregated transaction needs the ids of at least one source transaction")
+        object.__setattr__(self, 'id', 'agg_' + self.source_ids[0])
+
+
 def _generateId(transaction: Transaction):
-    time = str(hex(int(transaction.UTC_Time.strftime('%Y%m%d%H%M%S%f'))))
+    # Same digits as int(UTC_Time.strftime('%Y%m%d%H%M%S%f')), without formatting a string for every transaction
+    utc_time = transaction.UTC_Time
+    time = hex(((((utc_time.year * 100 + utc_time.month) * 100 + utc_time.day) * 100 + utc_time.hour) * 100 +
+                utc_time.minute) * 100000000 + utc_time.second * 1000000 + utc_time.microsecond)
     operation_type = hex(transaction.operation_type.value)
     coin_tick = transaction.coin.coin_info.tick
     return time + '_' + str(operation_type) + '_' + coin_tick + '_' + str(transaction.quantity).replace('.',
@@ -151,6 +168,49 @@ class CoinData:
         print(f"Total realized value: {self.total_realized_value}")
 
 
+@dataclass(frozen=True)
+class HoldingSnapshot:
+    coin: Coin
+    date: datetime
+    transactions_count: int
+    spot_quantity: Decimal
+    earn_quantity: Decimal
+    earn_coins_quantity: Decimal
+    open_lots_quantity: Decimal
+    cost_basis: Decimal
+    realized_value: Decimal
+    realized_gains: Decimal
+
+
+@dataclass(frozen=True)
+class ValidationReport:
+    negative_in_transactions: List[Transaction] = field(default_factory=list)
+    positive_out_transactions: List[Transaction] = field(default_factory=list)
+    import_duplicates: Dict[str, List[Transaction]] = field(default_factory=dict)
+    database_duplicates: List[Transaction] = field(default_factory=list)
+
+    def is_valid(self) -> bool:
+        return not (self.negative_in_transactions or self.positive_out_transactions or self.import_duplicates or
+                    self.database_duplicates)
+
+    def __str__(self):
+        lines = []
+        if self.negative_in_transactions:
+            lines.append(f"Enter operations must be positive ({len(self.negative_in_transactions)}):")
+            lines.extend(f" {x}" for x in self.negative_in_transactions)
+        if self.positive_out_transactions:
+            lines.append(f"Exit operations must be negative ({len(self.positive_out_transactions)}):")
+            lines.extend(f" {x}" for x in self.positive_out_transactions)
+        if self.import_duplicates:
+            lines.append(f"Duplicated transactions in the import list ({len(self.import_duplicates)}):")
+            for duplicates in self.import_duplicates.values():
+                lines.extend(f" {x}" for x in duplicates)
+        if self.database_duplicates:
+            lines.append(f"Transactions duplicated in the database ({len(self.database_duplicates)}):")
+            lines.extend(f" {x}" for x in self.database_duplicates)
+        return '\n'.join(lines)
+
+
 @dataclass
 class Amortization:
     quantity: Decimal
@@ -185,6 +245,16 @@ class CoinEarn:
     def add_amortized(self, quantity: Decimal, total_value: Decimal):
         self.amortized_quantities.append(Amortization(quantity, total_value))
 
+    def copy(self, conversion_rate: Optional[Decimal] = None) -> 'CoinEarn':
+        """Independent copy, at `conversion_rate` when given."""
+        coin_earn = CoinEarn(self.coin, self.total_earn_quantity)
+        coin_earn.amortized_quantities = list(self.amortized_quantities)
+        if conversion_rate is not None:
+            coin_earn.current_conversion_rate = conversion_rate
+        elif hasattr(self, 'current_conversion_rate'):
+            coin_earn.current_conversion_rate = self.current_conversion_rate
+        return coin_earn
+
     @property
     def total_current_value(self):
         return self.current_conversion_rate * self.total_earn_quantity
@@ -210,6 +280,11 @@ class FeeData:
     def create_fee_transaction(self, transaction, cost_per_unit):
         self.transactions_list.append(FeeTransaction(transaction, cost_per_unit))
 
+    def copy(self) -> 'FeeData':
+        fees_data = FeeData()
+        fees_data.transactions_list = list(self.transactions_list)
+        return fees_data
+
     @property
     def total_quantity(self):
         return sum(x.transaction.quantity for x in self.transactions_list)
@@ -1,3 +1,10 @@
 from .Dataclasses import Coin, CoinInfo, Transaction, TransactionType
 from .database import DataBaseAPI, TransactionValidator
-from .CoinAPIExternal import BinanceAPI
+
+
+def __getattr__(name):
+    # BinanceAPI needs pandas and binance, import them only when it is used
+    if name == 'BinanceAPI':
+        from .CoinAPIExternal import BinanceAPI
+        return BinanceAPI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
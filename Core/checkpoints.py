@@ -0,0 +1,136 @@
+from bisect import bisect_right
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, List, Optional
+
+from .Dataclasses import Coin, HoldingSnapshot, Transaction
+from .operations import EARN_OPERATIONS, INTEREST_OPERATIONS
+
+
+class HoldingsState:
+    """Holdings of a coin after replaying its first `position` transactions in time order.
+
+    Buys open lots at the conversion rate of their date and sells consume them first in, first out, the same way
+    `CoinDataProcessor.compute_gains` does. Sells without open lots are taken from the earn coins, selling more than
+    them raises the same `ValueError` as `compute_gains`.
+    """
+
+    def __init__(self):
+        self.position = 0
+        self.spot_quantity = Decimal(0)
+        self.earn_quantity = Decimal(0)
+        self.earn_coins_quantity = Decimal(0)
+        self.realized_value = Decimal(0)
+        self.realized_gains = Decimal(0)
+        self.lots: List[List[Decimal]] = []
+        self._first_open_lot = 0
+
+    def copy(self) -> 'HoldingsState':
+        state = HoldingsState()
+        state.position = self.position
+        state.spot_quantity = self.spot_quantity
+        state.earn_quantity = self.earn_quantity
+        state.earn_coins_quantity = self.earn_coins_quantity
+        state.realized_value = self.realized_value
+        state.realized_gains = self.realized_gains
+        state.lots = [list(x) for x in self.lots[self._first_open_lot:]]
+        return state
+
+    @property
+    def open_lots_quantity(self) -> Decimal:
+        return sum((x[0] for x in self.lots[self._first_open_lot:]), Decimal(0))
+
+    @property
+    def cost_basis(self) -> Decimal:
+        return sum((x[0] * x[1] for x in self.lots[self._first_open_lot:]), Decimal(0))
+
+    def apply(self, transaction: Transaction, conversion_callback: Callable[[str, datetime], Decimal]):
+        self.position += 1
+        self.spot_quantity += transaction.quantity
+        if transaction.operation_type in EARN_OPERATIONS:
+            self.earn_quantity -= transaction.quantity
+        if transaction.operation_type in INTEREST_OPERATIONS:
+            self.earn_coins_quantity += transaction.quantity
+
+        if transaction.operation_type is Transaction.TransactionType.BUY:
+            cost_per_unit = conversion_callback(transaction.coin.coin_info.tick, transaction.UTC_Time)
+            self.lots.append([transaction.quantity, cost_per_unit])
+        elif transaction.operation_type is Transaction.TransactionType.SELL:
+            sell_value = conversion_callback(transaction.coin.coin_info.tick, transaction.UTC_Time)
+            self._sell(transaction, -transaction.quantity if transaction.quantity < 0 else transaction.quantity,
+                       sell_value)
+
+    def _sell(self, transaction: Transaction, sell_quantity: Decimal, sell_value: Decimal):
+        while sell_quantity > 0 and self._first_open_lot < len(self.lots):
+            lot = self.lots[self._first_open_lot]
+            amortized = min(sell_quantity, lot[0])
+            lot[0] -= amortized
+            sell_quantity -= amortized
+            self.realized_value += amortized * sell_value
+            self.realized_gains += amortized * sell_value - amortized * lot[1]
+            if not lot[0] > 0:
+                self._first_open_lot += 1
+
+        if sell_quantity > 0:
+            if sell_quantity > self.earn_coins_quantity:
+                raise ValueError(f"Not enough earn coins {transaction.coin.coin_info.tick} to sell")
+            self.earn_coins_quantity -= sell_quantity
+            self.realized_value += sell_quantity * sell_value
+            self.realized_gains += sell_quantity * sell_value
+
+    def get_snapshot(self, coin: Coin, date: datetime) -> HoldingSnapshot:
+        return HoldingSnapshot(coin=coin, date=date, transactions_count=self.position,
+                               spot_quantity=self.spot_quantity, earn_quantity=self.earn_quantity,
+                               earn_coins_quantity=self.earn_coins_quantity,
+                               open_lots_quantity=self.open_lots_quantity, cost_basis=self.cost_basis,
+                               realized_value=self.realized_value, realized_gains=self.realized_gains)
+
+
+class CheckpointPolicy:
+
+    def __init__(self, monthly: bool = True, every: Optional[int] = None):
+        self.monthly = monthly
+        self.every = every
+
+    def is_checkpoint(self, position: int, transaction: Transaction, next_transaction: Optional[Transaction]):
+        if self.every and position % self.every == 0:
+            return True
+        if self.monthly and next_transaction is not None:
+            current = transaction.UTC_Time
+            following = next_transaction.UTC_Time
+            return (current.year, current.month) != (following.year, following.month)
+        return False
+
+
+class HoldingsCheckpoints:
+    """Saved `HoldingsState` copies of a coin, ordered by the number of transactions they include."""
+
+    def __init__(self, transactions_count: int):
+        self.transactions_count = transactions_count
+        self._positions: List[int] = []
+        self._states: List[HoldingsState] = []
+
+    def __len__(self):
+        return len(self._states)
+
+    def add(self, state: HoldingsState):
+        self._positions.append(state.position)
+        self._states.append(state.copy())
+
+    def get_closest(self, position: int) -> HoldingsState:
+        idx = bisect_right(self._positions, position)
+        if idx == 0:
+            return HoldingsState()
+        return self._states[idx - 1].copy()
+
+    @classmethod
+    def build(cls, transactions: List[Transaction], policy: CheckpointPolicy,
+              conversion_callback: Callable[[str, datetime], Decimal]) -> 'HoldingsCheckpoints':
+        checkpoints = cls(len(transactions))
+        state = HoldingsState()
+        for idx, transaction in enumerate(transactions):
+            state.apply(transaction, conversion_callback)
+            next_transaction = transactions[idx + 1] if idx + 1 < len(transactions) else None
+            if policy.is_checkpoint(state.position, transaction, next_transaction):
+                checkpoints.add(state)
+        return checkpoints
@@ -0,0 +1,22 @@
+import json
+
+_MISSING = object()
+
+
+class Config:
+    """Values of a JSON config file, shared by the GUI and the command line."""
+
+    def __init__(self, config_path):
+        self._config_path = config_path
+        with open(config_path) as f:
+            self._config_data = json.load(f)
+
+    def get_config_value(self, name, default=_MISSING):
+        if default is _MISSING:
+            return self._config_data[name]
+        return self._config_data.get(name, default)
+
+    def update_config_value(self, name, value):
+        self._config_data[name] = value
+        with open(self._config_path, 'w') as f:
+            json.dump(self._config_data, f)
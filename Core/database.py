@@ -1,52 +1,45 @@
-from typing import Dict, List, Optional, Iterable, Set, Callable
+import copy
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Executor, as_completed, wait
+from typing import Dict, List, Optional, Iterable, Iterator, Set, Callable, Tuple
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime, timedelta
+
+import numpy as np
 
 from .Dataclasses import Coin, Transaction, CoinData, CoinEarn, BuyTransactionData, Amortization, FeeData
 from .CoinAPIExternal import CoinAPI, APIBase
-from .Dataclasses import ProtoTransaction
-
-SPOT_OPERATIONS = (Transaction.TransactionType.SAVING_REDEMPTION,
-                   Transaction.TransactionType.SAVING_INTEREST,
-                   Transaction.TransactionType.POS_REDEMPTION,
-                   Transaction.TransactionType.POS_INTEREST,
-                   Transaction.TransactionType.BUY,
-                   Transaction.TransactionType.DEPOSIT,
-                   Transaction.TransactionType.FEE,
-                   Transaction.TransactionType.SELL,
-                   Transaction.TransactionType.SAVING_PURCHASE,
-                   Transaction.TransactionType.POS_PURCHASE,
-                   Transaction.TransactionType.LIQUID_SWAP_ADD,
-                   Transaction.TransactionType.LIQUID_SWAP_REDEMPTION)
-
-IN_SPOT_OPERATIONS = (Transaction.TransactionType.SAVING_REDEMPTION,
-                      Transaction.TransactionType.SAVING_INTEREST,
-                      Transaction.TransactionType.POS_REDEMPTION,
-                      Transaction.TransactionType.POS_INTEREST,
-                      Transaction.TransactionType.BUY,
-                      Transaction.TransactionType.DEPOSIT,
-                      Transaction.TransactionType.LIQUID_SWAP_REDEMPTION)
-OUT_SPOT_OPERATIONS = (Transaction.TransactionType.FEE,
-                       Transaction.TransactionType.SELL,
-                       Transaction.TransactionType.SAVING_PURCHASE,
-                       Transaction.TransactionType.POS_PURCHASE,
-                       Transaction.TransactionType.LIQUID_SWAP_ADD)
-
-EARN_OPERATIONS = (Transaction.TransactionType.SAVING_PURCHASE, Transaction.TransactionType.POS_PURCHASE,
-                   Transaction.TransactionType.LIQUID_SWAP_ADD,
-                   Transaction.TransactionType.SAVING_REDEMPTION, Transaction.TransactionType.POS_REDEMPTION,
-                   Transaction.TransactionType.LIQUID_SWAP_REDEMPTION)
+from .Dataclasses import ProtoTransaction, HoldingSnapshot, ValidationReport, AggregatedTransaction
+from .transactionTable import TransactionTable
+from .transactionIndex import TransactionIndex
+from .fixedPoint import FixedPointEngine
+from .checkpoints import CheckpointPolicy, HoldingsCheckpoints, HoldingsState
+from .timeSeries import PortfolioTimeSeries, PortfolioValueSeries
+from .metrics import MetricsRegistry
+from .operations import (SPOT_OPERATIONS, IN_SPOT_OPERATIONS, OUT_SPOT_OPERATIONS, EARN_OPERATIONS,
+                         INTEREST_OPERATIONS)
+
+logger = logging.getLogger(__name__)
 
 
 class _BuyTransaction:
 
-    def __init__(self, transaction: Transaction, cost_per_unit: Decimal, current_value_callback: callable):
+    def __init__(self, transaction: Transaction, cost_per_unit: Decimal, current_value_callback: callable,
+                 lot_engine: Optional[FixedPointEngine] = None):
         self._current_value_per_unit_callback = current_value_callback
         self.transaction = transaction
         self.cost_per_unit = cost_per_unit
         self.cost = self.transaction.quantity * self.cost_per_unit
         self.amortized_quantities: List[Amortization] = []
 
+        self._lot_engine = lot_engine
+        if lot_engine is not None:
+            self._lot = lot_engine.add_lot(transaction.quantity, cost_per_unit)
+
     @property
     def current_value_per_unit(self):
         return self._current_value_per_unit_callback()
@@ -136,6 +129,14 @@ class _BuyTransaction:
 
     def add_amortized(self, quantity: Decimal, total_value: Decimal):
         self.amortized_quantities.append(Amortization(quantity, total_value))
+        if self._lot_engine is not None:
+            self._lot_engine.add_amortization(self._lot, quantity, total_value)
+
+    def pinned(self, current_value_per_unit: Decimal) -> '_BuyTransaction':
+        """Copy valued at `current_value_per_unit` instead of the current rate."""
+        buy_transaction = copy.copy(self)
+        buy_transaction._current_value_per_unit_callback = lambda: current_value_per_unit
+        return buy_transaction
 
     def get_frozen_data(self, full=True):
         return BuyTransactionData(transaction=self.transaction,
@@ -162,50 +163,76 @@ class _BuyTransaction:
 
 class _CoinData:
 
-    def __init__(self, coin: Coin, current_value_per_unit_callback: Callable[['_CoinData'], Decimal]):
+    def __init__(self, coin: Coin, transaction_table: TransactionTable, transaction_index: TransactionIndex,
+                 current_value_per_unit_callback: Callable[['_CoinData'], Decimal],
+                 lot_engine_factory: Callable[[str], Optional[FixedPointEngine]] = lambda coin_tick: None):
         self._coin: Coin = coin
+        self._transaction_table = transaction_table
+        self._transaction_index = transaction_index
+        self._lot_engine_factory = lot_engine_factory
 
         self.spot_quantity: Optional[Decimal] = None
         self.earn_quantity: Optional[Decimal] = None
 
-        self._transactions_groups: Dict[Transaction.TransactionType, List[Transaction]] = self._group_transactions()
-
         self.buy_transactions: List[_BuyTransaction] = []
+        self.lot_engine: Optional[FixedPointEngine] = None
+        self.checkpoints: Optional[HoldingsCheckpoints] = None
         self.coin_earn: Optional[CoinEarn] = None
         self.fees_data: FeeData = FeeData()
 
         self.current_value_per_unit_callback = current_value_per_unit_callback
 
-    def _group_transactions(self):
-        transactions_groups = {x: [] for x in Transaction.TransactionType}
-
-        for trans in self._coin.transactions:
-            transactions_groups[trans.operation_type].append(trans)
-        return transactions_groups
-
     def get_coin_tick(self):
         return self._coin.coin_info.tick
 
     def get_current_value_per_unit(self) -> Decimal:
         return self.current_value_per_unit_callback(self)
 
+    def get_transaction_table(self) -> TransactionTable:
+        return self._transaction_table
+
     def get_transactions(self, type_filter: Optional[Iterable[Transaction.TransactionType]] = None):
         if type_filter is None:
             return self._coin.transactions
         else:
-            trans_list = []
-            for current_type in type_filter:
-                trans_list.extend(self._transactions_groups[current_type])
-            return trans_list
+            return self._transaction_index.query(self.get_coin_tick(), types=type_filter)
+
+    def get_time_ordered_transactions(self) -> List[Transaction]:
+        return self._transaction_index.query(self.get_coin_tick())
+
+    def get_holdings_snapshot(self, date: datetime,
+                              conversion_callback: Callable[[str, datetime], Decimal]) -> HoldingSnapshot:
+        coin_tick = self.get_coin_tick()
+        position = self._transaction_index.position(coin_tick, date)
+        if self.checkpoints is not None and \
+                self.checkpoints.transactions_count == self._transaction_index.count(coin_tick):
+            state = self.checkpoints.get_closest(position)
+        else:
+            state = HoldingsState()
+
+        for transaction in self._transaction_index.get_range(coin_tick, state.position, position):
+            state.apply(transaction, conversion_callback)
+        return state.get_snapshot(self._coin, date)
 
     def get_buy_sell_transactions(self):
-        buy_sell_trans = self.get_transactions((Transaction.TransactionType.BUY, Transaction.TransactionType.SELL))
-        buy_sell_trans.sort(key=lambda x: x.UTC_Time)
-        return buy_sell_trans
+        return self._transaction_index.query(self.get_coin_tick(), types=(Transaction.TransactionType.BUY,
+                                                                          Transaction.TransactionType.SELL))
 
     def create_coin_earn(self):
         return CoinEarn(self._coin, Decimal(0))
 
+    def create_lot_engine(self) -> Optional[FixedPointEngine]:
+        return self._lot_engine_factory(self.get_coin_tick())
+
+    def pinned(self, current_value_per_unit: Decimal) -> '_CoinData':
+        """Copy valued at `current_value_per_unit`, with its own lots, earnings and fees."""
+        coin_data = copy.copy(self)
+        coin_data.current_value_per_unit_callback = lambda x: current_value_per_unit
+        coin_data.buy_transactions = [x.pinned(current_value_per_unit) for x in self.buy_transactions]
+        coin_data.coin_earn = self.coin_earn.copy(current_value_per_unit) if self.coin_earn is not None else None
+        coin_data.fees_data = self.fees_data.copy()
+        return coin_data
+
     def get_frozen_coin_data(self, full=True) -> CoinData:
         return CoinData(coin=self._coin, spot_quantity=self.spot_quantity, earn_quantity=self.earn_quantity,
                         current_value_per_unit=self.get_current_value_per_unit(),
@@ -222,38 +249,135 @@ class _CoinData:
     def _get_current_average_cost(self):
         if not self.buy_transactions:
             return Decimal(0.0)
+        if self.lot_engine is not None:
+            return self._get_total_current_cost() / self.lot_engine.total_spot_quantity()
         return self._get_total_current_cost() / sum(trans.spot_quantity for trans in self.buy_transactions)
 
     def _get_total_costs(self):
+        if self.lot_engine is not None:
+            return self.lot_engine.total_costs()
         return sum(trans.cost for trans in self.buy_transactions)
 
     def _get_total_current_cost(self):
+        if self.lot_engine is not None:
+            return self.lot_engine.total_current_cost()
         return sum(trans.current_cost for trans in self.buy_transactions)
 
     def _get_total_unrealized_gains(self):
+        if self.lot_engine is not None:
+            return self.lot_engine.total_unrealized_gains(self.get_current_value_per_unit())
         return sum(trans.unrealized_gains for trans in self.buy_transactions)
 
     def _get_current_total_value(self):
+        if self.lot_engine is not None:
+            return self.lot_engine.current_total_value(self.get_current_value_per_unit())
         return sum(trans.unrealized_total_value for trans in self.buy_transactions)
 
     def _get_total_realized_gains(self):
+        if self.lot_engine is not None:
+            return self.lot_engine.total_realized_gains()
         return sum(trans.realized_gains for trans in self.buy_transactions)
 
     def _get_total_realized_value(self):
+        if self.lot_engine is not None:
+            return self.lot_engine.total_realized_value()
         return sum(trans.total_amortized_value for trans in self.buy_transactions)
 
     def _freeze_buy_transactions(self, full):
         return [trans.get_frozen_data(full) for trans in self.buy_transactions]
 
 
+class CoinSnapshot:
+    """Processed data of a coin as published at the end of its processing, or by a revaluation.
+
+    A snapshot never changes once published, every value of it is computed at the same `current_value_per_unit`,
+    taken when it is first needed unless the snapshot comes from a revaluation. The frozen `CoinData` is built on the
+    first read and kept, the lots are frozen only when requested. Nothing is locked, two readers building the same
+    value at once keep the first one stored.
+
+    `version` orders the snapshots as published, `generation` as the processing that computed their data started, a
+    revalued snapshot keeps the generation of its data.
+    """
+
+    def __init__(self, version: int, generation: int, coin_data: _CoinData,
+                 current_value_per_unit: Optional[Decimal] = None):
+        self._version = version
+        self._generation = generation
+        self._coin_data = coin_data
+        self._values: Dict = {}
+        if current_value_per_unit is not None:
+            self._values['rate'] = current_value_per_unit
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @property
+    def current_value_per_unit(self) -> Decimal:
+        rate = self._values.get('rate')
+        if rate is None:
+            rate = self._values.setdefault('rate', self._coin_data.get_current_value_per_unit())
+        return rate
+
+    def is_open(self) -> bool:
+        return bool(self._coin_data.spot_quantity or self._coin_data.earn_quantity)
+
+    def revalued(self, version: int, current_value_per_unit: Decimal) -> 'CoinSnapshot':
+        return CoinSnapshot(version, self._generation, self._coin_data, current_value_per_unit)
+
+    def get_coin_data(self, full: bool = False) -> CoinData:
+        coin_data = self._values.get(('coin_data', full))
+        if coin_data is None:
+            coin_data = self._values.setdefault(('coin_data', full), self._pinned().get_frozen_coin_data(full))
+        return coin_data
+
+    def count_lots(self) -> int:
+        return len(self._coin_data.buy_transactions)
+
+    def get_lots(self, start: int = 0, count: Optional[int] = None, full: bool = False) -> List[BuyTransactionData]:
+        buy_transactions = self._coin_data.buy_transactions
+        end = len(buy_transactions) if count is None else start + count
+        rate = self.current_value_per_unit
+        return [x.pinned(rate).get_frozen_data(full) for x in buy_transactions[start:end]]
+
+    def iter_lots(self, full: bool = False) -> Iterator[BuyTransactionData]:
+        rate = self.current_value_per_unit
+        for buy_transaction in self._coin_data.buy_transactions:
+            yield buy_transaction.pinned(rate).get_frozen_data(full)
+
+    def _pinned(self) -> _CoinData:
+        coin_data = self._values.get('pinned')
+        if coin_data is None:
+            coin_data = self._values.setdefault('pinned', self._coin_data.pinned(self.current_value_per_unit))
+        return coin_data
+
+
 class DataBase:
     name: str
     holdings: Dict[str, Coin]
     holdings_data: Dict[str, _CoinData]
+    # Last published snapshot of every processed coin
+    snapshots: Dict[str, CoinSnapshot]
+    transaction_tables: Dict[str, TransactionTable]
+    transaction_index: TransactionIndex
     transactions: Dict[str, Transaction]
 
 
 class TransactionValidator:
+    """Parses imported transactions and validates them as a batch.
+
+    Every violation found in the import is collected in a `ValidationReport`, raised inside a `ValidationError`.
+    """
+
+    class ValidationError(ValueError):
+
+        def __init__(self, report: ValidationReport):
+            super().__init__(str(report))
+            self.report = report
 
     def __init__(self, database: 'DataBaseAPI', duplicates_cache_path: str = None):
         self._duplicate_ids = self._acknowledge_duplicates(duplicates_cache_path)
@@ -267,61 +391,81 @@ class TransactionValidator:
         with open(path, 'r') as f:
             return set(line.strip() for line in f.readlines())
 
-    def validate_and_parse_transactions(self, list_transactions: List[ProtoTransaction]) -> List[Transaction]:
-        new_transactions = []
-        for proto_transaction in list_transactions:
-            transaction = self._parse_proto_transaction(proto_transaction)
-            self._validate_quantity(transaction)
-            new_transactions.append(transaction)
+    _OPERATION_TYPES = {x.value: x for x in Transaction.TransactionType}
 
-        valid_transactions = self._clean_duplicates_imports(new_transactions)
-        self._check_duplicate_in_database(valid_transactions)
+    def validate_and_parse_transactions(self, list_transactions: List[ProtoTransaction]) -> List[Transaction]:
+        count = len(list_transactions)
+        # Decimal has no numpy dtype, the signs are read in a single pass and every check runs on the columns
+        values = [x.value for x in list_transactions]
+        zero = np.fromiter(map(Decimal.is_zero, values), dtype=bool, count=count)
+        negative = np.fromiter(map(Decimal.is_signed, values), dtype=bool, count=count) & ~zero
+        positive = ~negative & ~zero
+        types = self._operation_types(list_transactions, negative, positive)
+
+        coins: Dict[str, Coin] = {}
+        new_transactions = [self._parse_proto_transaction(x, self._OPERATION_TYPES[operation_type], coins)
+                            for x, operation_type in zip(list_transactions, types.tolist())]
+
+        negative_in, positive_out = self._validate_quantities(types, negative, positive)
+        negative_in = [new_transactions[x] for x in negative_in]
+        positive_out = [new_transactions[x] for x in positive_out]
+        valid_transactions, import_duplicates = self._clean_duplicates_imports(new_transactions)
+        existing_ids = self._database_api.existing_transaction_ids(x.id for x in valid_transactions)
+
+        report = ValidationReport(negative_in_transactions=negative_in, positive_out_transactions=positive_out,
+                                  import_duplicates=import_duplicates,
+                                  database_duplicates=[x for x in valid_transactions if x.id in existing_ids])
+        if not report.is_valid():
+            raise self.ValidationError(report)
 
         return valid_transactions
 
     @staticmethod
-    def _validate_quantity(transaction: Transaction):
-        if transaction.operation_type in IN_SPOT_OPERATIONS:
-            assert transaction.quantity >= 0, "Enter operations must be positive"
-        if transaction.operation_type in OUT_SPOT_OPERATIONS:
-            assert transaction.quantity <= 0, "Exit operations must be negative"
+    def _operation_types(list_transactions: List[ProtoTransaction], negative: np.ndarray,
+                         positive: np.ndarray) -> np.ndarray:
+        """Operation type codes, with negative buys turned into sells and positive sells into buys."""
+        types = np.fromiter((x.operation_type.value for x in list_transactions), dtype=np.int8,
+                            count=len(list_transactions))
+        buy, sell = Transaction.TransactionType.BUY.value, Transaction.TransactionType.SELL.value
+        to_sell = (types == buy) & negative
+        to_buy = (types == sell) & positive
+        types[to_sell] = sell
+        types[to_buy] = buy
+        return types
 
-    def _check_duplicate_in_database(self, list_transactions: List[Transaction]):
-        for transaction in list_transactions:
-            self._database_api.exists_transaction(transaction)
+    @staticmethod
+    def _validate_quantities(types: np.ndarray, negative: np.ndarray,
+                             positive: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of the enter operations with negative quantity and of the exit operations, fees included, with
+        positive quantity."""
+        negative_in = np.isin(types, [x.value for x in IN_SPOT_OPERATIONS]) & negative
+        positive_out = np.isin(types, [x.value for x in OUT_SPOT_OPERATIONS]) & positive
+        return np.flatnonzero(negative_in), np.flatnonzero(positive_out)
+
+    def _clean_duplicates_imports(self, list_transactions: List[Transaction]) \
+            -> Tuple[List[Transaction], Dict[str, List[Transaction]]]:
+        counts = Counter(x.id for x in list_transactions)
+        duplicated_ids = {x for x, count in counts.items() if count > 1} - self._duplicate_ids
 
-    def _clean_duplicates_imports(self, list_transactions: List[Transaction]) -> List[Transaction]:
         seen = set()
-
         valid_transactions = []
+        import_duplicates: Dict[str, List[Transaction]] = {}
         for transaction in list_transactions:
-            if transaction.id in seen:
-                if transaction.id in self._duplicate_ids:
-                    continue
-                self._raise_duplicated(list_transactions, transaction)
+            if transaction.id in duplicated_ids:
+                import_duplicates.setdefault(transaction.id, []).append(transaction)
+            if transaction.id not in seen:
+                seen.add(transaction.id)
+                valid_transactions.append(transaction)
 
-            seen.add(transaction.id)
-            valid_transactions.append(transaction)
-
-        return valid_transactions
+        return valid_transactions, import_duplicates
 
-    @staticmethod
-    def _raise_duplicated(list_transactions: List[Transaction], transaction: Transaction):
-        found_duplicates = []
-        for duplicated_candidate in list_transactions:
-            if duplicated_candidate == transaction:
-                found_duplicates.append(duplicated_candidate)
-        raise ValueError(f"Duplicated transactions in the import list\n " + '\n'.join(str(x) for x in found_duplicates))
-
-    def _parse_proto_transaction(self, proto: ProtoTransaction) -> Transaction:
-        coin = self._get_database_coin(proto)
-
-        if proto.operation_type is Transaction.TransactionType.BUY and proto.value < 0:
-            operation_type = Transaction.TransactionType.SELL
-        elif proto.operation_type is Transaction.TransactionType.SELL and proto.value > 0:
-            operation_type = Transaction.TransactionType.BUY
-        else:
-            operation_type = proto.operation_type
+    def _parse_proto_transaction(self, proto: ProtoTransaction, operation_type: Transaction.TransactionType,
+                                 coins: Dict[str, Coin]) -> Transaction:
+        try:
+            coin = coins[proto.coin_name]
+        except KeyError:
+            coin = self._get_database_coin(proto)
+            coins[proto.coin_name] = coin
 
         return Transaction(proto.value, coin, operation_type, proto.UTC_Time, proto.account)
 
@@ -334,23 +478,18 @@ class TransactionValidator:
 
 class CoinDataProcessor:
 
-    def __init__(self, conversion_callback):
+    def __init__(self, conversion_callback, checkpoint_policy: Optional[CheckpointPolicy] = None):
         self._conversion_callback = conversion_callback
+        self._checkpoint_policy = checkpoint_policy if checkpoint_policy is not None else CheckpointPolicy()
 
     @staticmethod
     def compute_spot_quantities(coin_data: _CoinData):
-        value = Decimal(0)
-        for trans in coin_data.get_transactions():
-            value += trans.quantity
-        coin_data.spot_quantity = value
+        coin_data.spot_quantity = coin_data.get_transaction_table().sum_quantity()
 
     @staticmethod
     def compute_earn_quantities(coin_data: _CoinData):
-        value = Decimal(0)
-        for trans in coin_data.get_transactions():
-            if trans.operation_type in EARN_OPERATIONS:
-                value -= trans.quantity
-        coin_data.earn_quantity = value
+        table = coin_data.get_transaction_table()
+        coin_data.earn_quantity = -table.sum_quantity(table.mask(EARN_OPERATIONS))
 
     def compute_fees_quantities(self, coin_data: _CoinData):
         for trans in coin_data.get_transactions((Transaction.TransactionType.FEE,)):
@@ -359,23 +498,22 @@ class CoinDataProcessor:
 
     @staticmethod
     def compute_earnings(coin_data: _CoinData):
-        list_trans_to_process = coin_data.get_transactions((Transaction.TransactionType.POS_INTEREST,
-                                                            Transaction.TransactionType.SAVING_INTEREST))
+        table = coin_data.get_transaction_table()
         coin_earn = coin_data.create_coin_earn()
-        for trans in list_trans_to_process:
-            coin_earn.total_earn_quantity += trans.quantity
+        coin_earn.total_earn_quantity += table.sum_quantity(table.mask(INTEREST_OPERATIONS))
 
         coin_earn.update_current_conversion_rate(coin_data.get_current_value_per_unit())
         coin_data.coin_earn = coin_earn
 
     def compute_gains(self, coin_data: _CoinData):
         buy_transactions: List[_BuyTransaction] = []
+        lot_engine = coin_data.create_lot_engine()
 
         list_trans_to_process = coin_data.get_buy_sell_transactions()
 
         for trans in list_trans_to_process:
             if trans.operation_type is Transaction.TransactionType.BUY:
-                buy_transactions.append(self._create_buy_transaction(coin_data, trans))
+                buy_transactions.append(self._create_buy_transaction(coin_data, trans, lot_engine))
             elif trans.operation_type is Transaction.TransactionType.SELL:
                 sell_quantity = trans.quantity
                 # We want to be positive
@@ -397,6 +535,11 @@ class CoinDataProcessor:
 
         if buy_transactions:
             coin_data.buy_transactions = buy_transactions
+            coin_data.lot_engine = lot_engine
+
+    def compute_checkpoints(self, coin_data: _CoinData):
+        coin_data.checkpoints = HoldingsCheckpoints.build(coin_data.get_time_ordered_transactions(),
+                                                          self._checkpoint_policy, self._conversion_callback)
 
     def _amortize_earn_coins(self, coin_data: _CoinData, sell_quantity: Decimal, trans: Transaction):
         if not coin_data.coin_earn:
@@ -411,10 +554,11 @@ class CoinDataProcessor:
         sell_value = self._conversion_callback(trans.coin.coin_info.tick, trans.UTC_Time)
         buy_transaction.add_amortized(sell_quantity, sell_value * sell_quantity)
 
-    def _create_buy_transaction(self, coin_data: _CoinData, trans: Transaction):
+    def _create_buy_transaction(self, coin_data: _CoinData, trans: Transaction,
+                                lot_engine: Optional[FixedPointEngine] = None):
         cost = self._conversion_callback(trans.coin.coin_info.tick, trans.UTC_Time)
         return _BuyTransaction(transaction=trans, cost_per_unit=cost,
-                               current_value_callback=coin_data.get_current_value_per_unit)
+                               current_value_callback=coin_data.get_current_value_per_unit, lot_engine=lot_engine)
 
 
 class DataBaseAPI:
@@ -429,15 +573,34 @@ class DataBaseAPI:
     COMPUTE_FEES_QUANTITIES = True
     COMPUTE_EARNINGS = True
     COMPUTE_GAINS = True
+    COMPUTE_CHECKPOINTS = False
+
+    USE_FIXED_POINT_ENGINE = False
+
+    _PRECISION_LENGTHS = {Precision.M1: timedelta(minutes=1), Precision.M15: timedelta(minutes=15),
+                          Precision.M30: timedelta(minutes=30), Precision.H1: timedelta(hours=1)}
 
     def __init__(self, database: DataBase, external_api: APIBase, return_fiat='EUR',
-                 now_precision: Precision = Precision.M15):
+                 now_precision: Precision = Precision.M15, checkpoint_policy: Optional[CheckpointPolicy] = None,
+                 metrics: Optional[MetricsRegistry] = None):
         self._database = database
         self._external_api = external_api
         self._return_fiat = return_fiat
         self._now_precision = now_precision
-
-        self._coin_data_processor = CoinDataProcessor(self._get_conversion_rate_callback)
+        # Share the registry with the external API to see its cache hits next to the stage times
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+
+        self._coin_data_processor = CoinDataProcessor(self._get_conversion_rate_callback, checkpoint_policy)
+        # Current rates of the coins fetched in bulk by revalue_open_positions, valid during their time bucket
+        self._current_rates: Dict[str, Decimal] = {}
+        self._current_rates_time: Optional[datetime] = None
+        # Snapshots are published by one writer at a time, readers never take it
+        self._publish_lock = threading.Lock()
+        self._versions = itertools.count(1)
+        # Taken when a processing or a revaluation starts, what started before a published snapshot is dropped
+        self._generations = itertools.count(1)
+        self._value_series = PortfolioTimeSeries(return_fiat, self.get_coin_list, self._get_transaction_table,
+                                                 self._external_api.get_daily_conversion_rates)
 
     @property
     def active_processes(self) -> List[Callable[[_CoinData], None]]:
@@ -452,6 +615,8 @@ class DataBaseAPI:
             active.append(self._coin_data_processor.compute_earnings)
         if self.COMPUTE_GAINS:
             active.append(self._coin_data_processor.compute_gains)
+        if self.COMPUTE_CHECKPOINTS:
+            active.append(self._coin_data_processor.compute_checkpoints)
         return active
 
     @staticmethod
@@ -461,6 +626,9 @@ class DataBaseAPI:
         db.holdings = {}
         db.transactions = {}
         db.holdings_data = {}
+        db.snapshots = {}
+        db.transaction_tables = {}
+        db.transaction_index = TransactionIndex()
         return db
 
     def print_coin_data(self, coin_tick):
@@ -478,6 +646,8 @@ class DataBaseAPI:
         new_coin = Coin(coin_info, [])
 
         self._database.holdings[coin_name] = new_coin
+        self._database.transaction_tables[coin_name] = TransactionTable(
+            self._external_api.get_quantity_precision(coin_name))
         return new_coin
 
     def remove_coin(self, coin_name: str, force: bool = False):
@@ -492,12 +662,18 @@ class DataBaseAPI:
         if len(coin.transactions) > 1:
             for transaction in coin.transactions:
                 del self._database.transactions[transaction.id]
+                if isinstance(transaction, AggregatedTransaction):
+                    for source_id in transaction.source_ids:
+                        del self._database.transactions[source_id]
 
         del self._database.holdings[coin_name]
-        try:
-            del self._database.holdings_data[coin_name]
-        except KeyError:
-            pass
+        del self._database.transaction_tables[coin_name]
+        self._database.transaction_index.remove_coin(coin_name)
+        self._database.holdings_data.pop(coin_name, None)
+        self._database.snapshots.pop(coin_name, None)
+
+    def get_return_fiat(self) -> str:
+        return self._return_fiat
 
     def get_coin_list(self) -> List[str]:
         return list(x for x in self._database.holdings.keys() if x not in ('EUR',))
@@ -508,19 +684,50 @@ class DataBaseAPI:
     def get_coin(self, coin_name: str) -> Coin:
         return self._database.holdings[coin_name]
 
+    def get_snapshot(self, coin_name: str) -> CoinSnapshot:
+        """Last published snapshot of a processed coin, it is not changed by any later processing."""
+        return self._database.snapshots[coin_name]
+
     def get_coin_data(self, coin_name: str, full: bool = False) -> CoinData:
-        return self._database.holdings_data[coin_name].get_frozen_coin_data(full)
+        return self.get_snapshot(coin_name).get_coin_data(full)
+
+    def count_lots(self, coin_name: str) -> int:
+        return self.get_snapshot(coin_name).count_lots()
+
+    def get_lots(self, coin_name: str, start: int = 0, count: Optional[int] = None,
+                 full: bool = False) -> List[BuyTransactionData]:
+        """Frozen data of the buy lots of a coin from `start`, at most `count` of them.
+
+        Only the requested lots are frozen, so a page of a coin with many lots costs the same as a coin with few."""
+        return self.get_snapshot(coin_name).get_lots(start, count, full)
+
+    def iter_lots(self, coin_name: str, full: bool = False) -> Iterator[BuyTransactionData]:
+        return self.get_snapshot(coin_name).iter_lots(full)
 
     def _get_coin_data(self, coin_name: str) -> _CoinData:
         return self._database.holdings_data[coin_name]
 
+    def _get_transaction_table(self, coin_name: str) -> TransactionTable:
+        return self._database.transaction_tables[coin_name]
+
     def add_transaction(self, transaction: [Transaction, List[Transaction]]):
         if isinstance(transaction, list):
+            transactions_by_coin: Dict[str, List[Transaction]] = {}
             for element in transaction:
-                self.add_transaction(element)
+                self._register_transaction(element)
+                transactions_by_coin.setdefault(element.coin.coin_info.tick, []).append(element)
+
+            for coin_tick, coin_transactions in transactions_by_coin.items():
+                self._database.transaction_tables[coin_tick].extend(coin_transactions)
+            self._database.transaction_index.add(transaction)
 
             return None
 
+        self._register_transaction(transaction)
+        self._database.transaction_tables[transaction.coin.coin_info.tick].append(transaction)
+        self._database.transaction_index.add(transaction)
+
+    def _register_transaction(self, transaction: Transaction):
         if transaction.coin.coin_info.tick not in self._database.holdings:
             coin = self.add_coin(transaction.coin.coin_info.tick)
         else:
@@ -528,6 +735,33 @@ class DataBaseAPI:
 
         coin.transactions.append(transaction)
         self._database.transactions[transaction.id] = transaction
+        if isinstance(transaction, AggregatedTransaction):
+            # Keep the folded ids registered so importing them again is detected as duplicated
+            for source_id in transaction.source_ids:
+                self._database.transactions[source_id] = transaction
+
+    def query_transactions(self, coin_tick: Optional[str] = None,
+                           types: Optional[Iterable[Transaction.TransactionType]] = None,
+                           accounts: Optional[Iterable[str]] = None,
+                           start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Transaction]:
+        return self._database.transaction_index.query(coin_tick, types, accounts, start, end)
+
+    def count_transactions(self, coin_tick: str, types: Optional[Iterable[Transaction.TransactionType]] = None,
+                           start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+        return self._database.transaction_index.count(coin_tick, types, start, end)
+
+    def get_holdings_as_of(self, coin_tick: str, date: datetime) -> HoldingSnapshot:
+        coin_data = self._get_or_create_coin_data(coin_tick)
+        return coin_data.get_holdings_snapshot(date, self._get_conversion_rate_callback)
+
+    def get_portfolio_as_of(self, date: datetime) -> Dict[str, HoldingSnapshot]:
+        return {coin_tick: self.get_holdings_as_of(coin_tick, date) for coin_tick in self.get_coin_list()}
+
+    def get_value_series(self, end: Optional[date] = None) -> PortfolioValueSeries:
+        return self._value_series.get_series(end)
+
+    def existing_transaction_ids(self, transaction_ids: Iterable[str]) -> Set[str]:
+        return self._database.transactions.keys() & set(transaction_ids)
 
     def exists_transaction(self, transaction: Transaction):
         if transaction.id in self._database.transactions:
@@ -546,38 +780,171 @@ class DataBaseAPI:
         elif self._now_precision == self.Precision.M1:
             return datetime(now_full.year, now_full.month, now_full.day, now_full.hour, now_full.minute)
 
+    def get_next_revaluation_time(self) -> datetime:
+        """Start of the next `now_precision` bucket, when the current values can change."""
+        return self._get_now_time() + self._PRECISION_LENGTHS[self._now_precision]
+
+    def revalue_open_positions(self) -> Dict[str, CoinData]:
+        """Revalues the processed coins still held at the rates of the current time bucket.
+
+        The rates of all of them are fetched with a single bulk request, and only the current values are updated, the
+        lots and the earnings are not computed again. Returns the data of the coins whose rate changed. Coins processed
+        again after the rates were requested keep their own, newer, rate.
+        """
+        generation = next(self._generations)
+        now = self._get_now_time()
+        open_coins = [coin_tick for coin_tick, snapshot in dict(self._database.snapshots).items()
+                      if snapshot.is_open()]
+        if not open_coins:
+            return {}
+
+        with self.metrics.timer('revaluation'):
+            rates = self._external_api.get_current_conversion_rates(open_coins, self._return_fiat)
+        previous_rates = self._current_rates if self._current_rates_time is not None else {}
+        self._current_rates = rates
+        self._current_rates_time = now
+
+        revalued = {}
+        for coin_tick in open_coins:
+            rate = rates.get(coin_tick)
+            if rate is None or rate == previous_rates.get(coin_tick):
+                continue
+            with self._publish_lock:
+                # The coin may have been processed again while the rates were requested, revalue the last snapshot
+                # unless its processing started after the request
+                snapshot = self._database.snapshots[coin_tick]
+                if snapshot.generation > generation:
+                    continue
+                snapshot = snapshot.revalued(next(self._versions), rate)
+                self._database.snapshots[coin_tick] = snapshot
+            revalued[coin_tick] = snapshot.get_coin_data()
+        return revalued
+
     def process_coin_data(self, coin_tick: Optional[str] = None):
         if coin_tick is None:
             self.process_all_coins_data()
         else:
-            coin_data = self._get_or_create_coin_data(coin_tick)
+            self._process_coin(coin_tick)
+
+    def _process_coin(self, coin_tick: str, should_stop: Callable[[], bool] = lambda: False) -> bool:
+        """Processes and publishes a coin, returns False when `should_stop` ended it before it was published."""
+        # Processed from scratch out of sight of the readers, they keep the previous snapshot until it ends
+        generation = next(self._generations)
+        coin_data = self._create_coin_data(coin_tick)
+        with self.metrics.timer(f"process_coin.{coin_tick}"):
             for process in self.active_processes:
-                process(coin_data)
+                if should_stop():
+                    return False
+                with self.metrics.timer(f"stage.{process.__name__}.{coin_tick}"):
+                    process(coin_data)
+        if should_stop():
+            return False
+        self._publish(coin_tick, coin_data, generation)
+        return True
 
     def process_all_coins_data(self, update_status_callback: callable = None):
         coins_list = list(self._database.holdings.keys())
         number_of_coins = len(coins_list)
+        conversions = self._conversions_count()
+        start = time.perf_counter()
         for i, coin_tick in enumerate(coins_list):
 
-            status_message = f"Processing coin {coin_tick}, {i}/{number_of_coins}"
             if update_status_callback is not None:
-                update_status_callback(status_message)
-            print(status_message)
+                update_status_callback(f"Processing coin {coin_tick}, {i}/{number_of_coins}")
+            logger.debug("Processing coin %s, %d/%d", coin_tick, i, number_of_coins)
             if coin_tick in ('EUR',):
                 continue
             self.process_coin_data(coin_tick)
 
+        logger.info("Processed %d coins in %.3f s with %d conversion rate requests", number_of_coins,
+                    time.perf_counter() - start, self._conversions_count() - conversions)
+
+    def process_coins(self, coins: Optional[Iterable[str]] = None, executor: Optional[Executor] = None,
+                      should_stop: Optional[Callable[[], bool]] = None) -> Iterator[Tuple[str, CoinData]]:
+        """Processes the coins and yields the data of each one as soon as it is ready.
+
+        Without an executor the coins are processed one after the other in the given order. With one, every coin is
+        a task of the executor and they are yielded in the order they finish, so several callers can share the same
+        pool of price requests. `should_stop` is checked before every coin and every stage, when it returns True the
+        coin being processed is not published, the rest are skipped and the iteration ends. Closing the iterator
+        early stops the coins the same way. Once the iteration ends no task of it is running, so the transactions can
+        be changed right after.
+        """
+        coins = self.get_coin_list() if coins is None else [x for x in coins if x not in ('EUR',)]
+        should_stop = should_stop if should_stop is not None else (lambda: False)
+
+        if executor is None:
+            for coin_tick in coins:
+                if not self._process_coin(coin_tick, should_stop):
+                    return None
+                yield coin_tick, self.get_coin_data(coin_tick)
+            return None
+
+        stopped = threading.Event()
+
+        def stop() -> bool:
+            return stopped.is_set() or should_stop()
+
+        def process(coin_tick: str) -> Optional[CoinData]:
+            if not self._process_coin(coin_tick, stop):
+                return None
+            return self.get_coin_data(coin_tick)
+
+        futures = {executor.submit(process, x): x for x in coins}
+        try:
+            for future in as_completed(futures):
+                coin_data = future.result()
+                if should_stop():
+                    return None
+                if coin_data is not None:
+                    yield futures[future], coin_data
+        finally:
+            # The tasks already running can't be cancelled, they stop at their next check and are waited for
+            stopped.set()
+            for future in futures:
+                future.cancel()
+            wait(futures)
+
+    def _conversions_count(self) -> int:
+        return sum(x.count for x in (self.metrics.get_timer('conversion'), self.metrics.get_timer('conversion_now'))
+                   if x is not None)
+
     def _get_or_create_coin_data(self, coin_tick: str):
         try:
             coin_data = self._get_coin_data(coin_tick)
         except KeyError:
-            coin_data = _CoinData(self.get_coin(coin_tick), self._get_conversion_rate_now_callback)
+            coin_data = self._create_coin_data(coin_tick)
             self._database.holdings_data[coin_tick] = coin_data
         return coin_data
 
+    def _create_coin_data(self, coin_tick: str) -> _CoinData:
+        return _CoinData(self.get_coin(coin_tick), self._database.transaction_tables[coin_tick],
+                         self._database.transaction_index, self._get_conversion_rate_now_callback,
+                         self._create_lot_engine)
+
+    def _publish(self, coin_tick: str, coin_data: _CoinData, generation: int):
+        with self._publish_lock:
+            current = self._database.snapshots.get(coin_tick)
+            if current is not None and current.generation > generation:
+                # A processing started later, with newer transactions or rates, already published the coin
+                logger.debug("Dropped the data of %s from generation %d, %d is published", coin_tick, generation,
+                             current.generation)
+                return None
+            self._database.holdings_data[coin_tick] = coin_data
+            self._database.snapshots[coin_tick] = CoinSnapshot(next(self._versions), generation, coin_data)
+
+    def _create_lot_engine(self, coin_tick: str) -> Optional[FixedPointEngine]:
+        if not self.USE_FIXED_POINT_ENGINE:
+            return None
+        return FixedPointEngine(self._external_api.get_quantity_precision(coin_tick))
+
     def _get_conversion_rate_callback(self, coin_tick: str, date: datetime):
-        return self._external_api.get_conversion_rate(coin_tick, self._return_fiat, date)
+        with self.metrics.timer('conversion'):
+            return self._external_api.get_conversion_rate(coin_tick, self._return_fiat, date)
 
     def _get_conversion_rate_now_callback(self, coin_data: _CoinData):
-        return self._external_api.get_conversion_rate(coin_data.get_coin_tick(), self._return_fiat,
-                                                      self._get_now_time())
+        now = self._get_now_time()
+        if now == self._current_rates_time and coin_data.get_coin_tick() in self._current_rates:
+            return self._current_rates[coin_data.get_coin_tick()]
+        with self.metrics.timer('conversion_now'):
+            return self._external_api.get_conversion_rate(coin_data.get_coin_tick(), self._return_fiat, now)
@@ -0,0 +1,117 @@
+import math
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+Points = Tuple[np.ndarray, np.ndarray]
+
+
+def _bucket_edges(start: int, end: int, buckets: int) -> np.ndarray:
+    return np.linspace(start, end, buckets + 1).astype(np.int64)
+
+
+def min_max_downsample(x: np.ndarray, y: np.ndarray, points: int) -> Points:
+    """Keeps the minimum and the maximum of `points / 2` buckets of consecutive points, in their original order.
+
+    Peaks and drops survive, so a line drawn from the result covers the same vertical range as the original one.
+    """
+    if len(x) <= points or points < 2:
+        return x, y
+
+    edges = _bucket_edges(0, len(x), points // 2)
+    keep = np.empty(2 * (len(edges) - 1), dtype=np.int64)
+    for idx, (start, end) in enumerate(zip(edges[:-1], edges[1:])):
+        bucket = y[start:end]
+        first, second = start + np.argmin(bucket), start + np.argmax(bucket)
+        keep[2 * idx], keep[2 * idx + 1] = min(first, second), max(first, second)
+    keep = np.unique(keep)
+    return x[keep], y[keep]
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> Points:
+    """Largest triangle three buckets, keeps the points that best preserve the visual shape of the line.
+
+    The first and last points are always kept, every bucket in between keeps the point forming the largest triangle
+    with the point kept in the previous bucket and the average of the next one.
+    """
+    if len(x) <= points or points < 3:
+        return x, y
+
+    xf = x.astype(np.float64)
+    yf = y.astype(np.float64)
+    edges = _bucket_edges(1, len(x) - 1, points - 2)
+    keep = np.empty(points, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = len(x) - 1
+
+    previous = 0
+    for idx in range(points - 2):
+        start, end = edges[idx], edges[idx + 1]
+        if idx + 2 < len(edges):
+            next_start, next_end = edges[idx + 1], edges[idx + 2]
+        else:
+            next_start, next_end = len(x) - 1, len(x)
+        average_x = xf[next_start:next_end].mean()
+        average_y = yf[next_start:next_end].mean()
+
+        areas = np.abs((xf[previous] - average_x) * (yf[start:end] - yf[previous]) -
+                       (xf[previous] - xf[start:end]) * (average_y - yf[previous]))
+        previous = start + int(np.argmax(areas))
+        keep[idx + 1] = previous
+    return x[keep], y[keep]
+
+
+class LevelOfDetailSeries:
+    """A series downsampled to the detail needed to draw a range of it with a given number of points.
+
+    Level `k` keeps about `len / factor ** k` points of the whole series. It is computed the first time a range
+    needs it and cached, so zooming back to a level and panning only slice arrays already built. Points with NaN
+    values are dropped.
+    """
+
+    METHODS: Dict[str, Callable[[np.ndarray, np.ndarray, int], Points]] = {'minmax': min_max_downsample,
+                                                                            'lttb': lttb}
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, method: str = 'minmax', factor: int = 2):
+        valid = ~np.isnan(y)
+        self._x = np.asarray(x)[valid]
+        self._y = np.asarray(y, dtype=np.float64)[valid]
+        self._downsample = self.METHODS[method]
+        self._factor = factor
+        self._levels: Dict[int, Points] = {0: (self._x, self._y)}
+
+    def __len__(self):
+        return len(self._x)
+
+    @property
+    def x(self) -> np.ndarray:
+        return self._x
+
+    @property
+    def y(self) -> np.ndarray:
+        return self._y
+
+    @property
+    def cached_levels(self) -> Tuple[int, ...]:
+        return tuple(sorted(self._levels))
+
+    def get_level(self, level: int) -> Points:
+        points = self._levels.get(level)
+        if points is None:
+            points = self._downsample(self._x, self._y, max(math.ceil(len(self._x) / self._factor ** level), 3))
+            self._levels[level] = points
+        return points
+
+    def get(self, start, end, max_points: int) -> Points:
+        """Points between `start` and `end`, plus the one at each side to draw the line up to the borders."""
+        first, last = np.searchsorted(self._x, [start, end], side='left')
+        count = last - first
+        level = 0
+        if count > max_points > 0:
+            level = math.ceil(math.log(count / max_points, self._factor))
+
+        x, y = self.get_level(level)
+        first, last = np.searchsorted(x, [start, end], side='left')
+        first = max(first - 1, 0)
+        last = min(last + 1, len(x))
+        return x[first:last], y[first:last]
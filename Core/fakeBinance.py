@@ -0,0 +1,178 @@
+import math
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_SYMBOLS = (('BTC', 'EUR'), ('ETH', 'EUR'), ('BNB', 'EUR'), ('USDT', 'EUR'), ('BTC', 'USDT'),
+                   ('ETH', 'USDT'), ('BNB', 'USDT'), ('ETH', 'BTC'), ('BNB', 'BTC'), ('ADA', 'BTC'), ('ADA', 'USDT'),
+                   ('DOT', 'USDT'), ('DOT', 'BNB'), ('FTM', 'USDT'), ('FTM', 'BNB'))
+
+
+class FakeBinanceClient:
+    """Offline stand-in for `binance.client.Client` serving deterministic synthetic market data.
+
+    Implements the calls `BinanceAPI` uses, `ping`, `get_exchange_info` and `get_historical_klines`, plus the ticker
+    calls. Prices follow a smooth daily and yearly cycle around a base price derived from the symbol name, so the same
+    symbol and time always give the same candle. Every request waits `latency` seconds and is charged its Binance
+    request weight; when the weight used in the last minute would exceed `weight_limit` the request waits for the
+    window to free, or raises `RateLimitError` if `wait_on_limit` is False. Requests and weights are counted per
+    endpoint so the effect of caching can be measured.
+    """
+
+    KLINE_INTERVAL_1MINUTE = '1m'
+    KLINE_INTERVAL_1HOUR = '1h'
+    KLINE_INTERVAL_1DAY = '1d'
+
+    _INTERVAL_MS = {'1m': 60 * 1000, '3m': 3 * 60 * 1000, '5m': 5 * 60 * 1000, '15m': 15 * 60 * 1000,
+                    '30m': 30 * 60 * 1000, '1h': 60 * 60 * 1000, '2h': 2 * 60 * 60 * 1000,
+                    '4h': 4 * 60 * 60 * 1000, '1d': 24 * 60 * 60 * 1000, '1w': 7 * 24 * 60 * 60 * 1000}
+    _KLINES_PAGE = 1000
+    _WEIGHTS = {'ping': 1, 'exchange_info': 10, 'klines': 2, 'ticker': 2, 'all_tickers': 4}
+    # First kline served for every symbol
+    _LISTING_TIME = int(datetime(2017, 7, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+    class RateLimitError(Exception):
+        pass
+
+    class InvalidSymbolError(Exception):
+        pass
+
+    def __init__(self, symbols: Iterable[Tuple[str, str]] = DEFAULT_SYMBOLS, latency: float = 0.,
+                 weight_limit: int = 1200, wait_on_limit: bool = True, now: Optional[datetime] = None,
+                 sleep: Callable[[float], None] = time.sleep, clock: Callable[[], float] = time.monotonic):
+        self._symbols = {base + quote: (base, quote) for base, quote in symbols}
+        self._latency = latency
+        self._weight_limit = weight_limit
+        self._wait_on_limit = wait_on_limit
+        self._now = now
+        self._sleep = sleep
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._window = deque()
+        self._window_weight = 0
+        self.requests_by_endpoint = Counter()
+        self.weight_by_endpoint = Counter()
+
+    @property
+    def request_count(self) -> int:
+        return sum(self.requests_by_endpoint.values())
+
+    @property
+    def used_weight(self) -> int:
+        return sum(self.weight_by_endpoint.values())
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests_by_endpoint.clear()
+            self.weight_by_endpoint.clear()
+
+    def ping(self) -> Dict:
+        self._request('ping')
+        return {}
+
+    def get_exchange_info(self) -> Dict:
+        self._request('exchange_info')
+        return {'symbols': [{'symbol': symbol, 'baseAsset': base, 'quoteAsset': quote, 'baseAssetPrecision': 8,
+                             'quoteAssetPrecision': 8} for symbol, (base, quote) in self._symbols.items()]}
+
+    def get_historical_klines(self, symbol: str, interval: str, start_str=None, end_str=None,
+                              limit: Optional[int] = None, **kwargs) -> List[List]:
+        """Same paging as the real client: one request for the first valid time, then pages of 1000 klines."""
+        self._check_symbol(symbol)
+        interval_ms = self._INTERVAL_MS[interval]
+        now = self._now_ms()
+
+        start = None if start_str is None else int(start_str)
+        end = now if end_str is None else min(int(end_str), now)
+        if start is not None:
+            self._request('klines')
+            start = max(start, self._LISTING_TIME)
+            if end_str is not None and end <= start:
+                return []
+        else:
+            start = self._LISTING_TIME
+
+        first_open = -(-start // interval_ms) * interval_ms
+        open_times = range(first_open, end + 1, interval_ms)
+        if limit is not None:
+            open_times = open_times[:limit]
+
+        # One page at least, even when it comes back empty
+        for _ in range(max(1, math.ceil(len(open_times) / self._KLINES_PAGE))):
+            self._request('klines')
+        return [self._kline(symbol, x, interval_ms) for x in open_times]
+
+    def get_symbol_ticker(self, symbol: Optional[str] = None):
+        if symbol is None:
+            self._request('all_tickers')
+            return [self._ticker(x) for x in self._symbols]
+        self._check_symbol(symbol)
+        self._request('ticker')
+        return self._ticker(symbol)
+
+    def get_all_tickers(self) -> List[Dict]:
+        return self.get_symbol_ticker()
+
+    def price(self, symbol: str, timestamp: int) -> Decimal:
+        """Deterministic price of the symbol at the epoch-ms time."""
+        base = self._base_price(symbol)
+        days = timestamp / self._INTERVAL_MS['1d']
+        cycle = 1 + 0.05 * math.sin(2 * math.pi * days) + 0.3 * math.sin(2 * math.pi * days / 365)
+        return Decimal(base * cycle).quantize(Decimal('0.00000001'))
+
+    def _kline(self, symbol: str, open_time: int, interval_ms: int) -> List:
+        close_time = open_time + interval_ms - 1
+        open_price = self.price(symbol, open_time)
+        close_price = self.price(symbol, close_time)
+        high = max(open_price, close_price)
+        low = min(open_price, close_price)
+        return [open_time, str(open_price), str(high), str(low), str(close_price), '1000.00000000', close_time,
+                str(close_price * 1000), 100, '500.00000000', str(close_price * 500), '0']
+
+    def _ticker(self, symbol: str) -> Dict:
+        return {'symbol': symbol, 'price': str(self.price(symbol, self._now_ms()))}
+
+    def _base_price(self, symbol: str) -> float:
+        # Stable across runs, unlike hash()
+        return 0.01 * 10 ** (zlib.crc32(symbol.encode()) % 700 / 100)
+
+    def _check_symbol(self, symbol: str):
+        if symbol not in self._symbols:
+            raise self.InvalidSymbolError(f"Invalid symbol: {symbol}")
+
+    def _now_ms(self) -> int:
+        now = self._now if self._now is not None else datetime.now(timezone.utc)
+        return int(now.timestamp() * 1000)
+
+    def _request(self, endpoint: str):
+        weight = self._WEIGHTS[endpoint]
+        while True:
+            with self._lock:
+                wait = self._reserve(weight)
+                if wait is None:
+                    self.requests_by_endpoint[endpoint] += 1
+                    self.weight_by_endpoint[endpoint] += weight
+                    break
+            if not self._wait_on_limit:
+                raise self.RateLimitError(f"Request weight limit of {self._weight_limit} per minute exceeded")
+            self._sleep(wait)
+
+        if self._latency:
+            self._sleep(self._latency)
+
+    def _reserve(self, weight: int) -> Optional[float]:
+        """Charges the weight to the last minute window, or returns the seconds to wait until it fits."""
+        now = self._clock()
+        while self._window and now - self._window[0][0] >= 60:
+            self._window_weight -= self._window.popleft()[1]
+
+        if self._window_weight + weight > self._weight_limit and self._window:
+            return 60 - (now - self._window[0][0])
+        self._window.append((now, weight))
+        self._window_weight += weight
+        return None
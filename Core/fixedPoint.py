@@ -0,0 +1,376 @@
+from decimal import Decimal, Context, MAX_PREC, MAX_EMAX, MIN_EMIN, getcontext
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+DEFAULT_SCALE = 8
+
+INT64_MAX = np.iinfo(np.int64).max
+_EXACT_CONTEXT = Context(prec=MAX_PREC, Emax=MAX_EMAX, Emin=MIN_EMIN)
+
+
+def decimal_digits(value: Decimal) -> int:
+    exponent = value.as_tuple().exponent
+    if not isinstance(exponent, int):
+        raise ValueError(f"Value {value} is not a finite number")
+    return -exponent if exponent < 0 else 0
+
+
+def to_scaled(value: Decimal, scale: int) -> int:
+    scaled = value.scaleb(scale, context=_EXACT_CONTEXT)
+    integer = int(scaled)
+    if integer != scaled:
+        raise ValueError(f"Value {value} needs more than {scale} decimal digits")
+    return integer
+
+
+def from_scaled(integer: int, scale: int, digits: Optional[int] = None) -> Decimal:
+    value = Decimal(integer).scaleb(-scale, context=_EXACT_CONTEXT)
+    if digits is not None:
+        value = value.quantize(Decimal(1).scaleb(-digits), context=_EXACT_CONTEXT)
+    return value
+
+
+def rescale(values: np.ndarray, from_scale: int, to_scale: int) -> np.ndarray:
+    if to_scale == from_scale:
+        return values
+    factor = 10 ** (to_scale - from_scale)
+    if values.dtype != object and len(values) and \
+            (factor > INT64_MAX or int(np.abs(values).max()) > INT64_MAX // factor):
+        values = values.astype(object)
+    return values * factor
+
+
+def exact_sum(values: np.ndarray) -> int:
+    if not len(values):
+        return 0
+    if values.dtype == object:
+        return int(sum(values.tolist()))
+    if int(np.abs(values).max()) > INT64_MAX // len(values):
+        return sum(values.tolist())
+    return int(values.sum())
+
+
+def exact_dot(first: np.ndarray, second: np.ndarray) -> int:
+    if not len(first):
+        return 0
+    if first.dtype != object and second.dtype != object:
+        bound = int(np.abs(first).max()) * int(np.abs(second).max()) * len(first)
+        if bound <= INT64_MAX:
+            return int(np.dot(first, second))
+    return sum(x * y for x, y in zip(first.tolist(), second.tolist()))
+
+
+def _max_digits(digits: np.ndarray) -> int:
+    return int(digits.max()) if len(digits) else 0
+
+
+def fits_context(magnitude: int, scale: int, digits: int) -> bool:
+    """Whether `Decimal` arithmetic keeps every digit of values up to `magnitude`.
+
+    Values are scaled by 10**scale and have at most `digits` decimal digits, the current context rounds them when
+    their coefficient has more than its precision digits.
+    """
+    return magnitude < 10 ** (getcontext().prec + scale - digits)
+
+
+class FixedPointColumn:
+    """Growable column of decimals stored as integers scaled by 10**scale.
+
+    The scale grows when a value with more decimal digits is stored and the storage falls back to Python integers
+    when int64 would overflow. The decimal digits of every row are kept so results can be converted back to exactly
+    the `Decimal` that the equivalent `Decimal` arithmetic produces.
+    """
+
+    _INITIAL_CAPACITY = 16
+
+    def __init__(self, scale: int = DEFAULT_SCALE):
+        self._size = 0
+        self._scale = scale
+        self._values = np.zeros(self._INITIAL_CAPACITY, dtype=np.int64)
+        self._digits = np.zeros(self._INITIAL_CAPACITY, dtype=np.int16)
+        self._decimals: Optional[List[Decimal]] = None
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def scale(self) -> int:
+        return self._scale
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values[:self._size]
+
+    @property
+    def digits(self) -> np.ndarray:
+        return self._digits[:self._size]
+
+    def at_scale(self, scale: int) -> np.ndarray:
+        return rescale(self.values, self._scale, scale)
+
+    def get(self, index: int) -> Decimal:
+        return from_scaled(int(self._values[index]), self._scale, int(self._digits[index]))
+
+    def decimals(self) -> List[Decimal]:
+        """Values of every row, kept until the column changes."""
+        if self._decimals is None:
+            self._decimals = [self.get(x) for x in range(self._size)]
+        return self._decimals
+
+    def append(self, value: Decimal) -> int:
+        self.insert(self._size, value)
+        return self._size - 1
+
+    def insert(self, position: int, value: Decimal):
+        digits = decimal_digits(value)
+        self._ensure_scale(digits)
+        self._ensure_capacity(self._size + 1)
+
+        size = self._size
+        if position < size:
+            self._values[position + 1:size + 1] = self._values[position:size]
+            self._digits[position + 1:size + 1] = self._digits[position:size]
+        self._write(position, [to_scaled(value, self._scale)])
+        self._digits[position] = digits
+        self._size += 1
+
+    def extend(self, values: Iterable[Decimal]):
+        values = list(values)
+        if not values:
+            return None
+
+        digits = np.fromiter((decimal_digits(x) for x in values), dtype=np.int16, count=len(values))
+        self._ensure_scale(int(digits.max()))
+        self._ensure_capacity(self._size + len(values))
+
+        self._write(self._size, [to_scaled(x, self._scale) for x in values])
+        self._digits[self._size:self._size + len(values)] = digits
+        self._size += len(values)
+
+    def add(self, index: int, value: Decimal):
+        """Adds `value` to a row, rounded by the current `Decimal` context like the `Decimal` addition."""
+        digits = decimal_digits(value)
+        self._ensure_scale(digits)
+        total = int(self._values[index]) + to_scaled(value, self._scale)
+        digits = max(int(self._digits[index]), digits)
+        if not fits_context(abs(total), self._scale, digits):
+            rounded = self.get(index) + value
+            total, digits = to_scaled(rounded, self._scale), decimal_digits(rounded)
+        self._write(index, [total])
+        self._digits[index] = digits
+
+    def permute(self, order: np.ndarray):
+        self._decimals = None
+        self._values[:self._size] = self._values[:self._size][order]
+        self._digits[:self._size] = self._digits[:self._size][order]
+
+    def sum(self, mask: Optional[np.ndarray] = None) -> Decimal:
+        """Sum of the rows in `mask`, rounded by the current `Decimal` context like a `Decimal` loop over them."""
+        values = self.values
+        digits = self.digits
+        if mask is not None:
+            values = values[mask]
+            digits = digits[mask]
+
+        if not len(values):
+            return Decimal(0)
+        if not fits_context(exact_sum(np.abs(values)), self._scale, _max_digits(digits)):
+            decimals = self.decimals()
+            return sum(decimals if mask is None else (x for x, selected in zip(decimals, mask) if selected))
+        return from_scaled(exact_sum(values), self._scale, _max_digits(digits))
+
+    def _write(self, start: int, values: List[int]):
+        self._decimals = None
+        if self._values.dtype != object and any(abs(x) > INT64_MAX for x in values):
+            self._values = self._values.astype(object)
+        self._values[start:start + len(values)] = values
+
+    def _ensure_scale(self, digits: int):
+        if digits <= self._scale:
+            return None
+
+        if self._size:
+            rescaled = rescale(self.values, self._scale, digits)
+            if rescaled.dtype == object:
+                self._values = self._values.astype(object)
+            self._values[:self._size] = rescaled
+        self._scale = digits
+
+    def _ensure_capacity(self, required: int):
+        capacity = len(self._values)
+        if required <= capacity:
+            return None
+
+        while capacity < required:
+            capacity *= 2
+        self._values = np.resize(self._values, capacity)
+        self._digits = np.resize(self._digits, capacity)
+
+
+class FixedPointEngine:
+    """Fixed-point bookkeeping of the buy lots of a coin.
+
+    Mirrors the quantities, costs and amortizations of the `_BuyTransaction` objects of a `_CoinData` so the
+    aggregates shown in `CoinData` are computed with integer array reductions. Results are converted back to
+    `Decimal` and match the `Decimal` computation digit by digit: when a product or a partial sum has more digits
+    than the current `Decimal` context keeps, as with the rates of inverse pairs, the aggregate is computed lot by
+    lot with `Decimal` so it is rounded at the same steps.
+    """
+
+    def __init__(self, scale: int = DEFAULT_SCALE):
+        self._quantities = FixedPointColumn(scale)
+        self._costs_per_unit = FixedPointColumn(scale)
+        self._amortized_quantities = FixedPointColumn(scale)
+        self._amortized_values = FixedPointColumn(scale)
+        self._amortized_count = np.zeros(FixedPointColumn._INITIAL_CAPACITY, dtype=np.int32)
+
+    def __len__(self):
+        return len(self._quantities)
+
+    def add_lot(self, quantity: Decimal, cost_per_unit: Decimal) -> int:
+        lot = self._quantities.append(quantity)
+        self._costs_per_unit.append(cost_per_unit)
+        self._amortized_quantities.append(Decimal(0))
+        self._amortized_values.append(Decimal(0))
+        if lot >= len(self._amortized_count):
+            self._amortized_count = np.resize(self._amortized_count, 2 * len(self._amortized_count))
+        self._amortized_count[lot] = 0
+        return lot
+
+    def add_amortization(self, lot: int, quantity: Decimal, total_value: Decimal):
+        self._amortized_quantities.add(lot, quantity)
+        self._amortized_values.add(lot, total_value)
+        self._amortized_count[lot] += 1
+
+    def total_costs(self) -> Decimal:
+        quantities = self._quantities
+        costs = self._costs_per_unit
+        if not len(self):
+            return Decimal(0)
+
+        scale = quantities.scale + costs.scale
+        digits = _max_digits(quantities.digits + costs.digits)
+        if not fits_context(exact_dot(np.abs(quantities.values), np.abs(costs.values)), scale, digits):
+            return sum(x * y for x, y in zip(quantities.decimals(), costs.decimals()))
+        return from_scaled(exact_dot(quantities.values, costs.values), scale, digits)
+
+    def total_current_cost(self) -> Decimal:
+        spot, spot_scale, spot_digits = self._spot_quantities()
+        costs = self._costs_per_unit
+        if not len(spot):
+            return Decimal(0)
+
+        scale = spot_scale + costs.scale
+        digits = _max_digits(spot_digits + costs.digits)
+        if not self._spot_fits_context(spot_scale, spot_digits) or \
+                not fits_context(exact_dot(np.abs(spot), np.abs(costs.values)), scale, digits):
+            return sum(x * y for x, y in zip(self._spot_decimals(), costs.decimals()))
+        return from_scaled(exact_dot(spot, costs.values), scale, digits)
+
+    def total_spot_quantity(self) -> Decimal:
+        spot, scale, digits = self._spot_quantities()
+        if not len(spot):
+            return Decimal(0)
+
+        if not self._spot_fits_context(scale, digits) or \
+                not fits_context(exact_sum(np.abs(spot)), scale, _max_digits(digits)):
+            return sum(self._spot_decimals())
+        return from_scaled(exact_sum(spot), scale, _max_digits(digits))
+
+    def current_total_value(self, current_value_per_unit: Decimal) -> Decimal:
+        spot, spot_scale, spot_digits = self._spot_quantities()
+        positive = spot > 0
+        if not positive.any():
+            return Decimal(0)
+
+        current_digits = decimal_digits(current_value_per_unit)
+        current = to_scaled(current_value_per_unit, current_digits)
+        quantity = exact_sum(spot[positive])
+        scale = spot_scale + current_digits
+        digits = _max_digits(spot_digits[positive]) + current_digits
+        if not self._spot_fits_context(spot_scale, spot_digits) or \
+                not fits_context(quantity * abs(current), scale, digits):
+            return sum(x * current_value_per_unit if x > 0 else Decimal(0) for x in self._spot_decimals())
+        return from_scaled(quantity * current, scale, digits)
+
+    def total_unrealized_gains(self, current_value_per_unit: Decimal) -> Decimal:
+        spot, spot_scale, spot_digits = self._spot_quantities()
+        positive = spot > 0
+        if not positive.any():
+            return Decimal(0)
+
+        current_digits = decimal_digits(current_value_per_unit)
+        cost_scale = self._costs_per_unit.scale
+        scale = max(current_digits, cost_scale)
+        current = to_scaled(current_value_per_unit, scale)
+        costs = self._costs_per_unit.at_scale(scale)[positive]
+        quantity = exact_sum(spot[positive])
+        value = quantity * current
+        cost = exact_dot(spot[positive], costs)
+
+        cost_digits = self._costs_per_unit.digits[positive]
+        digits = _max_digits(spot_digits[positive] + np.maximum(cost_digits, current_digits))
+        magnitude = quantity * abs(current) + exact_dot(spot[positive], np.abs(costs))
+        if not self._spot_fits_context(spot_scale, spot_digits) or \
+                not fits_context(magnitude, spot_scale + scale, digits):
+            return sum((x * current_value_per_unit) - (x * y) if x > 0 else Decimal(0)
+                       for x, y in zip(self._spot_decimals(), self._costs_per_unit.decimals()))
+        return from_scaled(value - cost, spot_scale + scale, digits)
+
+    def total_realized_value(self) -> Decimal:
+        amortized = self._amortized_mask()
+        values = self._amortized_values
+        if not len(self):
+            return Decimal(0)
+
+        digits = _max_digits(values.digits[amortized])
+        if not fits_context(exact_sum(np.abs(values.values[amortized])), values.scale, digits):
+            return sum(x if is_amortized else Decimal(0) for x, is_amortized in zip(values.decimals(), amortized))
+        return from_scaled(exact_sum(values.values[amortized]), values.scale, digits)
+
+    def total_realized_gains(self) -> Decimal:
+        amortized = self._amortized_mask()
+        if not amortized.any():
+            return Decimal(0)
+
+        values = self._amortized_values
+        quantities = self._amortized_quantities
+        costs = self._costs_per_unit
+        scale = max(values.scale, quantities.scale + costs.scale)
+        factor = 10 ** (scale - quantities.scale - costs.scale)
+        amortized_values = values.at_scale(scale)[amortized]
+        value = exact_sum(amortized_values)
+        cost = exact_dot(quantities.values[amortized], costs.values[amortized]) * factor
+
+        digits = _max_digits(np.maximum(values.digits[amortized],
+                                        quantities.digits[amortized] + costs.digits[amortized]))
+        magnitude = exact_sum(np.abs(amortized_values)) + \
+            exact_dot(np.abs(quantities.values[amortized]), np.abs(costs.values[amortized])) * factor
+        if not fits_context(magnitude, scale, digits):
+            return sum(x - (y * z) if is_amortized else Decimal(0) for x, y, z, is_amortized in
+                       zip(values.decimals(), quantities.decimals(), costs.decimals(), amortized))
+        return from_scaled(value - cost, scale, digits)
+
+    def _amortized_mask(self) -> np.ndarray:
+        return self._amortized_count[:len(self)] > 0
+
+    def _spot_quantities(self):
+        """Quantity left in every lot, with the digits the `Decimal` subtraction would keep."""
+        amortized = self._amortized_mask()
+        scale = max(self._quantities.scale, self._amortized_quantities.scale)
+        spot = self._quantities.at_scale(scale) - self._amortized_quantities.at_scale(scale)
+        digits = np.where(amortized, np.maximum(self._quantities.digits, self._amortized_quantities.digits),
+                          self._quantities.digits)
+        return spot, scale, digits
+
+    def _spot_fits_context(self, scale: int, digits: np.ndarray) -> bool:
+        """Whether the subtractions of `_spot_quantities` are exact in the current `Decimal` context."""
+        magnitude = int(np.abs(self._quantities.at_scale(scale)).max()) + \
+            int(np.abs(self._amortized_quantities.at_scale(scale)).max())
+        return fits_context(magnitude, scale, _max_digits(digits))
+
+    def _spot_decimals(self) -> List[Decimal]:
+        """`Decimal` quantity left in every lot, computed like `_BuyTransaction.spot_quantity`."""
+        return [x - y if is_amortized else x for x, y, is_amortized in
+                zip(self._quantities.decimals(), self._amortized_quantities.decimals(), self._amortized_mask())]
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from .Dataclasses import AggregatedTransaction, Transaction
+from .operations import INTEREST_OPERATIONS
+
+# A Monday, so weekly buckets start on Mondays
+_ORIGIN = datetime(1970, 1, 5)
+
+
+class InterestAggregator:
+    """Folds the interest transactions of every coin into one `AggregatedTransaction` per time bucket.
+
+    Earn products credit interest every day, so those rows are most of an import while only their sum is used. The
+    transactions of a bucket are grouped by coin, operation type and account; the aggregate takes the time of the
+    last one so holdings never include interest before it was received. Groups of a single transaction and any other
+    operation type are returned untouched, in the original order.
+    """
+
+    def __init__(self, bucket: timedelta = timedelta(days=1),
+                 operations: Iterable[Transaction.TransactionType] = INTEREST_OPERATIONS):
+        if bucket <= timedelta(0):
+            raise ValueError(f"Bucket {bucket} must be positive")
+        self._bucket = bucket
+        self._operations = frozenset(operations)
+
+    def aggregate(self, list_transactions: List[Transaction]) -> List[Transaction]:
+        groups: Dict[Tuple, List[Transaction]] = {}
+        # Every group is emitted at the position of its first transaction
+        output: List = []
+        for transaction in list_transactions:
+            if transaction.operation_type not in self._operations:
+                output.append(transaction)
+                continue
+
+            key = (transaction.coin.coin_info.tick, transaction.operation_type, transaction.account,
+                   (transaction.UTC_Time - _ORIGIN) // self._bucket)
+            group = groups.get(key)
+            if group is None:
+                group = []
+                groups[key] = group
+                output.append(group)
+            group.append(transaction)
+
+        return [self._fold(x) if isinstance(x, list) else x for x in output]
+
+    @staticmethod
+    def _fold(group: List[Transaction]) -> Transaction:
+        if len(group) == 1:
+            return group[0]
+
+        first = group[0]
+        return AggregatedTransaction(sum((x.quantity for x in group), Decimal(0)), first.coin, first.operation_type,
+                                     max(x.UTC_Time for x in group), first.account,
+                                     source_ids=tuple(x.id for x in group))
@@ -0,0 +1,106 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+
+class TimerStats:
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.
+        self.min = float('inf')
+        self.max = 0.
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.
+
+    def to_dict(self) -> Dict[str, float]:
+        return {'count': self.count, 'total': self.total, 'mean': self.mean,
+                'min': self.min if self.count else 0., 'max': self.max}
+
+
+class MetricsRegistry:
+    """Counters and timers of the processing, cheap enough to be always on.
+
+    Names are dotted paths like ``stage.compute_gains.BTC``. Timers keep the count, total, minimum and maximum of the
+    recorded durations, not every sample, so their memory does not grow with the number of calls. Hooks are called
+    with the name and the duration of every timed section, to forward them to a profiler or a log.
+    The registry can be shared by several objects and threads, `to_json` exports everything recorded so far.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._timers: Dict[str, TimerStats] = {}
+        self._hooks: List[Callable[[str, float], None]] = []
+
+    def add_hook(self, hook: Callable[[str, float], None]):
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[str, float], None]):
+        self._hooks.remove(hook)
+
+    def increment(self, name: str, value: int = 1):
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def record(self, name: str, seconds: float):
+        if not self.enabled:
+            return None
+        with self._lock:
+            stats = self._timers.get(name)
+            if stats is None:
+                stats = self._timers[name] = TimerStats()
+            stats.add(seconds)
+        for hook in self._hooks:
+            hook(name, seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        if not self.enabled:
+            yield
+            return None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def get_counter(self, name: str) -> int:
+        return self._counters.get(name, 0)
+
+    def get_timer(self, name: str) -> Optional[TimerStats]:
+        return self._timers.get(name)
+
+    def ratio(self, name: str, other: str) -> float:
+        """Share of `name` in the sum of both counters, like the hits over hits and misses."""
+        count = self.get_counter(name)
+        total = count + self.get_counter(other)
+        return count / total if total else 0.
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+    def to_dict(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {'counters': dict(self._counters),
+                    'timers': {name: stats.to_dict() for name, stats in self._timers.items()}}
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
@@ -0,0 +1,35 @@
+from .Dataclasses import Transaction
+
+SPOT_OPERATIONS = (Transaction.TransactionType.SAVING_REDEMPTION,
+                   Transaction.TransactionType.SAVING_INTEREST,
+                   Transaction.TransactionType.POS_REDEMPTION,
+                   Transaction.TransactionType.POS_INTEREST,
+                   Transaction.TransactionType.BUY,
+                   Transaction.TransactionType.DEPOSIT,
+                   Transaction.TransactionType.FEE,
+                   Transaction.TransactionType.SELL,
+                   Transaction.TransactionType.SAVING_PURCHASE,
+                   Transaction.TransactionType.POS_PURCHASE,
+                   Transaction.TransactionType.LIQUID_SWAP_ADD,
+                   Transaction.TransactionType.LIQUID_SWAP_REDEMPTION)
+
+IN_SPOT_OPERATIONS = (Transaction.TransactionType.SAVING_REDEMPTION,
+                      Transaction.TransactionType.SAVING_INTEREST,
+                      Transaction.TransactionType.POS_REDEMPTION,
+                      Transaction.TransactionType.POS_INTEREST,
+                      Transaction.TransactionType.BUY,
+                      Transaction.TransactionType.DEPOSIT,
+                      Transaction.TransactionType.LIQUID_SWAP_REDEMPTION)
+OUT_SPOT_OPERATIONS = (Transaction.TransactionType.FEE,
+                       Transaction.TransactionType.SELL,
+                       Transaction.TransactionType.SAVING_PURCHASE,
+                       Transaction.TransactionType.POS_PURCHASE,
+                       Transaction.TransactionType.LIQUID_SWAP_ADD)
+
+EARN_OPERATIONS = (Transaction.TransactionType.SAVING_PURCHASE, Transaction.TransactionType.POS_PURCHASE,
+                   Transaction.TransactionType.LIQUID_SWAP_ADD,
+                   Transaction.TransactionType.SAVING_REDEMPTION, Transaction.TransactionType.POS_REDEMPTION,
+                   Transaction.TransactionType.LIQUID_SWAP_REDEMPTION)
+
+INTEREST_OPERATIONS = (Transaction.TransactionType.POS_INTEREST,
+                       Transaction.TransactionType.SAVING_INTEREST)
@@ -0,0 +1,438 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Kline:
+    open_time: int
+    close_time: int
+    open: Decimal
+    close: Decimal
+
+    @property
+    def average(self) -> Decimal:
+        return (self.open + self.close) * Decimal(0.5)
+
+
+class _KlineSeries:
+    """Klines of a symbol and interval sorted by open time."""
+
+    def __init__(self):
+        self.open_times: List[int] = []
+        self.klines: List[Kline] = []
+
+    def add(self, kline: Kline):
+        idx = bisect_right(self.open_times, kline.open_time)
+        if idx and self.open_times[idx - 1] == kline.open_time:
+            self.klines[idx - 1] = kline
+        else:
+            self.open_times.insert(idx, kline.open_time)
+            self.klines.insert(idx, kline)
+
+    def get_range(self, start: int, end: int) -> List[Kline]:
+        """Klines opened in ``start <= open_time < end``."""
+        return self.klines[bisect_left(self.open_times, start):bisect_left(self.open_times, end)]
+
+    def find(self, timestamp: int, tolerance: int) -> Optional[Kline]:
+        """Kline containing the timestamp, or the closest one at most `tolerance` ms away from it."""
+        idx = bisect_right(self.open_times, timestamp) - 1
+        before = self.klines[idx] if idx >= 0 else None
+        if before is not None and timestamp <= before.close_time:
+            return before
+
+        after = self.klines[idx + 1] if idx + 1 < len(self.klines) else None
+        candidates = []
+        if before is not None:
+            candidates.append((timestamp - before.close_time, before))
+        if after is not None:
+            candidates.append((after.open_time - timestamp, after))
+        distance, kline = min(candidates, key=lambda x: x[0], default=(None, None))
+        return kline if distance is not None and distance <= tolerance else None
+
+
+class _PendingRequest:
+    """Result of a request shared by every caller that missed the same cache key while it was running."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class Resolution:
+    M1 = '1m'
+    H1 = '1h'
+    D1 = '1d'
+
+
+# From the finest to the coarsest
+_RESOLUTIONS = (Resolution.M1, Resolution.H1, Resolution.D1)
+_INTERVAL_MS = {Resolution.M1: 60 * 1000, Resolution.H1: 60 * 60 * 1000, Resolution.D1: 24 * 60 * 60 * 1000}
+
+
+def _kline_line(symbol: str, interval: str, kline: Kline) -> str:
+    return f"{symbol}_{interval}_{kline.open_time};{kline.close_time};{kline.open};{kline.close}\n"
+
+
+def _cache_id_order(cached_id: str):
+    symbol, _, timestamp = cached_id.rpartition('_')
+    return symbol, int(timestamp) if timestamp.isdigit() else 0, cached_id
+
+
+class PriceHistoryDatabase:
+    """Prices requested to the exchange, cached in memory and in an append only file.
+
+    The cache can be used from several threads. A lock protects the cached prices and the pending file writes, and
+    requests are done outside of it. Concurrent misses of the same key share a single request, the first caller does it
+    and the others wait for its result.
+
+    Klines are kept whole at three resolutions, minute, hour and day, and every query asks for the coarsest one that
+    is precise enough for it. A time inside a cached candle of that resolution, or at most `tolerance` away from one,
+    is answered without a request. Hour and day candles whose finer candles are all cached are rolled up from them,
+    and otherwise a cached finer candle is used before requesting the coarse one. A price kept for a time without any
+    candle around it is stored with its resolution too. Cache files written before klines were stored, with one
+    minute price per line, are still read for minute queries.
+
+    New prices are written to the file in batches, when `flush_every` lines are pending or `flush_interval` seconds
+    passed since the last write, and when `flush` or `close` are called. With `sync_on_flush` every write is also
+    synced to disk. A torn last line, left by a crash in the middle of a write, is dropped when the file is loaded.
+
+    Days that `get_daily_prices` requested without getting a closed candle, before the listing of the symbol or the
+    current day, are not written to the file. They are answered from memory for `missing_day_ttl` before they are
+    requested again.
+
+    Hits and misses of `get_price` and of the days of `get_daily_prices`, and the time spent in requests, are counted
+    in `metrics`.
+    """
+
+    def __init__(self, path: Path, request_callback: Callable[[str, datetime, str], List[Kline]], verbose: bool,
+                 range_request_callback: Callable[[str, str, int, int], List[Kline]] = None,
+                 flush_every: int = 64, flush_interval: Optional[float] = 5., sync_on_flush: bool = False,
+                 tolerance: timedelta = timedelta(0), missing_day_ttl: timedelta = timedelta(minutes=15),
+                 metrics: Optional[MetricsRegistry] = None):
+        self._cache_path = path
+        self._cached_data = {}
+        self._klines: Dict[Tuple[str, str], _KlineSeries] = {}
+        self._tolerance = int(tolerance.total_seconds() * 1000)
+        self._missing_day_ttl = missing_day_ttl.total_seconds()
+        # (symbol, open time) of the days not cached by the last range request, with their price and expiry
+        self._missing_days: Dict[Tuple[str, int], Tuple[Optional[Decimal], float]] = {}
+        self._request_price = request_callback
+        self._request_price_range = range_request_callback
+        # Verbose raises the per price messages from debug to info
+        self._log_level = logging.INFO if verbose else logging.DEBUG
+        self._flush_every = flush_every
+        self._flush_interval = flush_interval
+        self._sync_on_flush = sync_on_flush
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+
+        self._lock = threading.RLock()
+        self._in_flight: Dict[str, _PendingRequest] = {}
+        self._pending_lines: List[str] = []
+        self._last_flush = time.monotonic()
+
+        self._load_cached_data()
+
+        self.file_handler = self._cache_path.open('a')
+
+    def __del__(self):
+        self.close()
+
+    def _load_cached_data(self):
+        if not self._cache_path.exists():
+            return None
+
+        with self._cache_path.open('r') as f:
+            logger.log(self._log_level, "Loading price cache from %s", self._cache_path)
+            content = f.read()
+
+        complete, _, torn = content.rpartition('\n')
+        if torn:
+            logger.warning("Dropping torn line from price cache: %r", torn)
+            self._truncate(len(complete.encode()) + 1 if complete else 0)
+
+        invalid = 0
+        for row in complete.splitlines():
+            try:
+                self._load_row(row.split(';'))
+            except (ValueError, ArithmeticError):
+                invalid += 1
+                logger.debug("Skipping invalid price cache line: %r", row)
+        if invalid:
+            logger.warning("Skipped %d invalid lines of the price cache %s", invalid, self._cache_path)
+
+    def _load_row(self, fields: List[str]):
+        if len(fields) == 2:
+            id, value = fields
+            Decimal(value)
+            self._cached_data[id] = value
+        elif len(fields) == 4:
+            id, close_time, open_price, close_price = fields
+            symbol, interval, open_time = id.rsplit('_', 2)
+            kline = Kline(int(open_time), int(close_time), Decimal(open_price), Decimal(close_price))
+            self._get_series(symbol, interval).add(kline)
+        else:
+            raise ValueError(f"Unexpected number of fields: {len(fields)}")
+
+    def _get_series(self, symbol: str, interval: str) -> _KlineSeries:
+        try:
+            return self._klines[(symbol, interval)]
+        except KeyError:
+            series = _KlineSeries()
+            self._klines[(symbol, interval)] = series
+            return series
+
+    def _truncate(self, size: int):
+        with self._cache_path.open('r+b') as f:
+            f.truncate(size)
+
+    def _add_to_cache(self, cached_id: str, value: Decimal):
+        with self._lock:
+            self._cached_data[cached_id] = value
+            self._add_line(f"{cached_id};{value}\n")
+
+    def _add_kline(self, symbol: str, interval: str, kline: Kline):
+        with self._lock:
+            self._get_series(symbol, interval).add(kline)
+            self._add_line(_kline_line(symbol, interval, kline))
+
+    def _add_line(self, line: str):
+        with self._lock:
+            self._pending_lines.append(line)
+            if len(self._pending_lines) >= self._flush_every or (
+                    self._flush_interval is not None and time.monotonic() - self._last_flush >= self._flush_interval):
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending_lines or self.file_handler.closed:
+                return None
+            self.file_handler.writelines(self._pending_lines)
+            self.file_handler.flush()
+            if self._sync_on_flush:
+                os.fsync(self.file_handler.fileno())
+            self._pending_lines.clear()
+
+    def compact(self):
+        """Rewrites the cache file without duplicated lines, sorted by symbol and time.
+
+        The new file is written next to the old one and replaces it atomically, so a crash keeps one of them whole.
+        """
+        with self._lock:
+            self.flush()
+            temporary_path = self._cache_path.with_name(self._cache_path.name + '.compact')
+            # Single prices and candles can share an id, both are kept
+            lines = {(x, False): f"{x};{value}\n" for x, value in self._cached_data.items()}
+            for (symbol, interval), series in self._klines.items():
+                lines.update(((f"{symbol}_{interval}_{x.open_time}", True), _kline_line(symbol, interval, x))
+                             for x in series.klines)
+            with temporary_path.open('w') as f:
+                f.writelines(lines[x] for x in sorted(lines, key=lambda x: (_cache_id_order(x[0]), x[1])))
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.file_handler.close()
+            os.replace(temporary_path, self._cache_path)
+            self.file_handler = self._cache_path.open('a')
+
+    def close(self):
+        file_handler = getattr(self, 'file_handler', None)
+        if file_handler is None:
+            return None
+        with self._lock:
+            self.flush()
+            file_handler.close()
+
+    def _get_cached(self, cached_id: str) -> Optional[Decimal]:
+        with self._lock:
+            value = self._cached_data.get(cached_id)
+        return None if value is None else Decimal(value)
+
+    def _single_flight(self, key: str, request: Callable[[], object]):
+        """Runs the request once for all the callers asking for the same key at the same time."""
+        with self._lock:
+            pending = self._in_flight.get(key)
+            owner = pending is None
+            if owner:
+                pending = _PendingRequest()
+                self._in_flight[key] = pending
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = request()
+            return pending.value
+        except BaseException as error:
+            pending.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            pending.done.set()
+
+    def _find_cached_price(self, symbol: str, timestamp: int, resolution: str) -> Optional[Decimal]:
+        value = self._get_cached(f"{symbol}_{resolution}_{timestamp}")
+        if value is None and resolution == Resolution.M1:
+            # Files written before the resolutions only have minute prices, without resolution in the key
+            value = self._get_cached(f"{symbol}_{timestamp}")
+        if value is not None:
+            return value
+
+        # The candle of the requested resolution first, so every time inside it gets the same price
+        with self._lock:
+            kline = self._find_kline(symbol, resolution, timestamp)
+            if kline is None:
+                interval = _INTERVAL_MS[resolution]
+                kline = self._roll_up(symbol, resolution, timestamp // interval * interval)
+            for finer in reversed(_RESOLUTIONS[:_RESOLUTIONS.index(resolution)]):
+                if kline is not None:
+                    break
+                kline = self._find_kline(symbol, finer, timestamp)
+        return None if kline is None else kline.average
+
+    def _find_kline(self, symbol: str, resolution: str, timestamp: int) -> Optional[Kline]:
+        series = self._klines.get((symbol, resolution))
+        return None if series is None else series.find(timestamp, self._tolerance)
+
+    def _roll_up(self, symbol: str, resolution: str, open_time: int) -> Optional[Kline]:
+        """Builds the candle opened at `open_time` from the finer candles, when all of them are cached."""
+        interval = _INTERVAL_MS[resolution]
+        for finer in reversed(_RESOLUTIONS[:_RESOLUTIONS.index(resolution)]):
+            series = self._klines.get((symbol, finer))
+            if series is None:
+                continue
+            klines = series.get_range(open_time, open_time + interval)
+            if len(klines) == interval // _INTERVAL_MS[finer]:
+                kline = Kline(open_time, klines[-1].close_time, klines[0].open, klines[-1].close)
+                self._add_kline(symbol, resolution, kline)
+                return kline
+        return None
+
+    def get_price(self, symbol, date: datetime, resolution: str = Resolution.M1) -> Decimal:
+        timestamp = int(date.timestamp() * 1000)
+        value = self._find_cached_price(symbol.symbol, timestamp, resolution)
+        if value is not None:
+            self.metrics.increment('price_cache.hit')
+            logger.log(self._log_level, "Using cache: %s_%d", symbol.symbol, timestamp)
+            return value
+
+        self.metrics.increment('price_cache.miss')
+        # Misses inside the same candle share its request
+        flight_id = f"{symbol.symbol}_{resolution}_{timestamp // _INTERVAL_MS[resolution]}"
+        return self._single_flight(flight_id,
+                                   lambda: self._request_and_cache(symbol.symbol, date, timestamp, resolution))
+
+    def _request_and_cache(self, symbol: str, date: datetime, timestamp: int, resolution: str) -> Decimal:
+        # Another caller may have finished the same request between the cache check and the single flight
+        value = self._find_cached_price(symbol, timestamp, resolution)
+        if value is not None:
+            return value
+
+        logger.log(self._log_level, "Requesting price: %s_%s_%d", symbol, resolution, timestamp)
+        with self.metrics.timer('price_cache.request'):
+            klines = self._request_price(symbol, date, resolution)
+
+        fetched = _KlineSeries()
+        for kline in klines:
+            fetched.add(kline)
+        self._add_closed_klines(symbol, resolution, klines)
+
+        kline = fetched.find(timestamp, self._tolerance)
+        if kline is not None:
+            return kline.average
+
+        # No candle around the time, keep the closest price found for this exact time and resolution
+        value = klines[0].average
+        self._add_to_cache(f"{symbol}_{resolution}_{timestamp}", value)
+        return value
+
+    def _request_range(self, symbol: str, resolution: str, start: int, end: int) -> List[Kline]:
+        with self.metrics.timer('price_cache.range_request'):
+            return self._request_price_range(symbol, resolution, start, end)
+
+    def _add_closed_klines(self, symbol: str, resolution: str, klines: List[Kline]):
+        # The candle of the current interval is still open, it can change
+        now = int(datetime.now(timezone.utc).timestamp() * 1000)
+        for kline in klines:
+            if kline.close_time < now:
+                self._add_kline(symbol, resolution, kline)
+
+    def _find_cached_day(self, symbol: str, open_time: int) -> Optional[Decimal]:
+        value = self._get_cached(f"{symbol}_{Resolution.D1}_{open_time}")
+        if value is not None:
+            return value
+
+        with self._lock:
+            series = self._klines.get((symbol, Resolution.D1))
+            klines = [] if series is None else series.get_range(open_time, open_time + 1)
+            kline = klines[0] if klines else self._roll_up(symbol, Resolution.D1, open_time)
+        return None if kline is None else kline.average
+
+    def _find_missing_day(self, symbol: str, open_time: int) -> Tuple[bool, Optional[Decimal]]:
+        """Whether the day was requested less than `missing_day_ttl` ago, and the open candle price it got."""
+        with self._lock:
+            missing = self._missing_days.get((symbol, open_time))
+            if missing is None:
+                return False, None
+            if missing[1] <= time.monotonic():
+                del self._missing_days[(symbol, open_time)]
+                return False, None
+            return True, missing[0]
+
+    def get_daily_prices(self, symbol, start: date, days: int) -> List[Optional[Decimal]]:
+        """Average price of the daily candles starting at ``start``, missing candles are None.
+
+        Prices not cached yet are requested in a single range request. The candle of the current day is still
+        open, so it is returned but only kept in memory, like the days without candle, for `missing_day_ttl`."""
+        open_times = [int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() * 1000)
+                      for day in (start + timedelta(days=x) for x in range(days))]
+
+        prices: List[Optional[Decimal]] = [self._find_cached_day(symbol.symbol, x) for x in open_times]
+        missing = []
+        for idx, price in enumerate(prices):
+            if price is not None:
+                continue
+            recent, prices[idx] = self._find_missing_day(symbol.symbol, open_times[idx])
+            if not recent:
+                missing.append(idx)
+        self.metrics.increment('price_cache.daily_hit', days - len(missing))
+        self.metrics.increment('price_cache.daily_miss', len(missing))
+
+        if missing:
+            logger.log(self._log_level, "Requesting %d daily prices: %s", len(missing), symbol.symbol)
+            first, last = open_times[missing[0]], open_times[missing[-1]]
+            range_id = f"{symbol.symbol}_{Resolution.D1}_{first}_{last}"
+            # Up to the close of the last candle, the client returns nothing when both ends are equal
+            klines = self._single_flight(range_id, lambda: self._request_range(
+                symbol.symbol, Resolution.D1, first, last + _INTERVAL_MS[Resolution.D1] - 1))
+            self._add_closed_klines(symbol.symbol, Resolution.D1, klines)
+
+            fetched = {x.open_time: x for x in klines}
+            now = int(datetime.now(timezone.utc).timestamp() * 1000)
+            expiry = time.monotonic() + self._missing_day_ttl
+            for idx in missing:
+                kline = fetched.get(open_times[idx])
+                if kline is not None:
+                    prices[idx] = kline.average
+                # Closed candles are cached, the others are asked again once they expire
+                if kline is None or kline.close_time >= now:
+                    with self._lock:
+                        self._missing_days[(symbol.symbol, open_times[idx])] = (prices[idx], expiry)
+        return prices
@@ -1,3 +1,4 @@
+import tempfile
 from datetime import datetime
 from unittest import TestCase
 from unittest import mock
@@ -25,7 +26,7 @@ def _create_fake_pairs(self, path):
                         )
 
 
-def _mock_get_conversion(self, symbol, date):
+def _mock_get_conversion(self, symbol, date, resolution=None):
     return Decimal(10)
 
 
@@ -36,8 +37,14 @@ def _mock_get_conversion(self, symbol, date):
 @mock.patch.object(BinanceAPI, "_get_conversion", new=_mock_get_conversion)
 class TestBinanceAPI(TestCase):
 
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._folder.cleanup()
+
     def _create_api(self):
-        return BinanceAPI("", "")
+        return BinanceAPI("", self._folder.name)
 
     def test_createBinanceAPI(self, *mocked_methods):
         self._create_api()
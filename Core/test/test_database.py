@@ -1,4 +1,8 @@
-from datetime import datetime, timedelta
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 from typing import Dict
 from unittest import TestCase
@@ -7,6 +11,7 @@ from freezegun import freeze_time
 
 from ..Dataclasses import Coin, ProtoTransaction, Transaction
 from ..database import DataBase, DataBaseAPI, APIBase, TransactionValidator
+from ..interestAggregator import InterestAggregator
 
 
 class MockExternalAPI(APIBase):
@@ -26,6 +31,26 @@ class MockExternalAPI(APIBase):
         return self._cached_data[cached_id]
 
 
+class SlowExternalAPI(MockExternalAPI):
+    """Takes `delays` seconds, 0.2 by default, to answer every rate of a coin."""
+
+    def __init__(self, delays: Dict[str, float]):
+        super().__init__()
+        self._delays = delays
+        self._lock = threading.Lock()
+        self.running = 0
+
+    def get_conversion_rate(self, first: str, second: str, date: datetime = None) -> Decimal:
+        with self._lock:
+            self.running += 1
+        try:
+            time.sleep(self._delays.get(first, 0.2))
+            return super().get_conversion_rate(first, second, date)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
 @freeze_time("2021-01-01 00:00:00")
 class TestDataBaseAPI(TestCase):
 
@@ -123,18 +148,32 @@ class TestDataBaseAPI(TestCase):
         assert trans.coin.coin_info.tick == 'BTC'
         assert trans.quantity == Decimal(10)
 
+    def test_trades_follow_the_sign_of_the_quantity(self):
+        time = datetime.now()
+        proto_list = [ProtoTransaction(Decimal(-2), 'BTC', ProtoTransaction.TransactionType.BUY, time, 'test'),
+                      ProtoTransaction(Decimal(3), 'BTC', ProtoTransaction.TransactionType.SELL, time, 'test'),
+                      ProtoTransaction(Decimal('-0'), 'BTC', ProtoTransaction.TransactionType.BUY, time, 'test'),
+                      ProtoTransaction(Decimal(-1), 'BTC', ProtoTransaction.TransactionType.FEE, time, 'test')]
+
+        transactions = self.validator.validate_and_parse_transactions(proto_list)
+
+        assert [x.operation_type for x in transactions] == [Transaction.TransactionType.SELL,
+                                                            Transaction.TransactionType.BUY,
+                                                            Transaction.TransactionType.BUY,
+                                                            Transaction.TransactionType.FEE]
+
     def test_invalid_value_in_transaction(self):
         time = datetime.now()
         proto_list = [ProtoTransaction(Decimal(-10), 'BTC', ProtoTransaction.TransactionType.DEPOSIT, time, 'test')]
 
-        with self.assertRaises(AssertionError):
+        with self.assertRaises(TransactionValidator.ValidationError):
             self.validator.validate_and_parse_transactions(proto_list)
 
     def test_invalid_value_out_transaction(self):
         time = datetime.now()
         proto_list = [ProtoTransaction(Decimal(10), 'BTC', ProtoTransaction.TransactionType.POS_PURCHASE, time, 'test')]
 
-        with self.assertRaises(AssertionError):
+        with self.assertRaises(TransactionValidator.ValidationError):
             self.validator.validate_and_parse_transactions(proto_list)
 
     def test_duplicate_transaction(self):
@@ -145,6 +184,39 @@ class TestDataBaseAPI(TestCase):
         with self.assertRaises(ValueError):
             self.validator.validate_and_parse_transactions(proto_list)
 
+    def test_validation_report_collects_all_violations(self):
+        time = datetime.now()
+        stored = self.validator.validate_and_parse_transactions(
+            [ProtoTransaction(Decimal(5), 'BTC', ProtoTransaction.TransactionType.DEPOSIT, time, 'test')])
+        self.api.add_transaction(stored)
+
+        proto_list = [ProtoTransaction(Decimal(-10), 'BTC', ProtoTransaction.TransactionType.DEPOSIT, time, 'test'),
+                      ProtoTransaction(Decimal(10), 'BTC', ProtoTransaction.TransactionType.FEE, time, 'test'),
+                      ProtoTransaction(Decimal(2), 'ETH', ProtoTransaction.TransactionType.BUY, time, 'test'),
+                      ProtoTransaction(Decimal(2), 'ETH', ProtoTransaction.TransactionType.BUY, time, 'test'),
+                      ProtoTransaction(Decimal(5), 'BTC', ProtoTransaction.TransactionType.DEPOSIT, time, 'test')]
+
+        with self.assertRaises(TransactionValidator.ValidationError) as context:
+            self.validator.validate_and_parse_transactions(proto_list)
+
+        report = context.exception.report
+        assert [x.quantity for x in report.negative_in_transactions] == [Decimal(-10)]
+        assert [x.quantity for x in report.positive_out_transactions] == [Decimal(10)]
+        assert [len(x) for x in report.import_duplicates.values()] == [2]
+        assert report.database_duplicates == stored
+
+    def test_aggregated_interest_detects_duplicates(self):
+        time = datetime(2020, 12, 1)
+        proto_list = [ProtoTransaction(Decimal('0.1'), 'BTC', ProtoTransaction.TransactionType.POS_INTEREST,
+                                       time + timedelta(hours=x), 'test') for x in range(3)]
+        transactions = self.validator.validate_and_parse_transactions(proto_list)
+        self.api.add_transaction(InterestAggregator().aggregate(transactions))
+
+        assert len(self.api.get_coin('BTC').transactions) == 1
+        assert self.api.existing_transaction_ids(x.id for x in transactions) == {x.id for x in transactions}
+        with self.assertRaises(TransactionValidator.ValidationError):
+            self.validator.validate_and_parse_transactions(proto_list[1:])
+
     def test_duplicate_transaction_whitelist(self):
         time = datetime.now()
         proto_list = [ProtoTransaction(Decimal(10), 'BTC', ProtoTransaction.TransactionType.BUY, time, 'test'),
@@ -181,6 +253,174 @@ class TestDataBaseAPI(TestCase):
         assert coin_data
         assert coin_data.coin.coin_info.tick == 'BTC'
 
+    def test_stage_metrics(self):
+        time = datetime.now()
+        proto = self._create_buy_proto_transaction('BTC', 'EUR', Decimal(10), time, Decimal(1))
+        self.api.add_transaction(self.validator.validate_and_parse_transactions([proto]))
+        self.api.process_coin_data('BTC')
+
+        metrics = self.api.metrics.to_dict()['timers']
+        for process in self.api.active_processes:
+            assert metrics[f"stage.{process.__name__}.BTC"]['count'] == 1
+        assert metrics['process_coin.BTC']['count'] == 1
+        assert metrics['conversion']['count'] >= 1
+
+    def _add_BTC_and_ETH(self):
+        time = datetime.now()
+        proto_list = [self._create_buy_proto_transaction('BTC', 'EUR', Decimal(10), time, Decimal(1)),
+                      self._create_buy_proto_transaction('ETH', 'EUR', Decimal(5), time, Decimal(2))]
+        self.api.add_transaction(self.validator.validate_and_parse_transactions(proto_list))
+
+    def test_process_coins(self):
+        self._add_BTC_and_ETH()
+
+        processed = {coin_tick: coin_data for coin_tick, coin_data in self.api.process_coins()}
+
+        assert list(processed) == ['BTC', 'ETH']
+        assert processed['ETH'].current_total_value == Decimal(10)
+
+        with ThreadPoolExecutor(2) as executor:
+            processed = dict(self.api.process_coins(['ETH', 'BTC'], executor))
+        assert set(processed) == {'BTC', 'ETH'}
+        assert processed['BTC'].current_total_value == Decimal(10)
+
+    def test_process_coins_stops(self):
+        self._add_BTC_and_ETH()
+        processed = []
+
+        for coin_tick, _ in self.api.process_coins(should_stop=lambda: len(processed) > 0):
+            processed.append(coin_tick)
+
+        assert processed == ['BTC']
+        with ThreadPoolExecutor(1) as executor:
+            assert list(self.api.process_coins(executor=executor, should_stop=lambda: True)) == []
+
+    def test_process_coins_cancelled_publishes_nothing_after(self):
+        self.external_api = SlowExternalAPI({'BTC': 0.})
+        self.api = DataBaseAPI(self.db, self.external_api)
+        self.validator = TransactionValidator(self.api)
+        time = datetime.now()
+        proto_list = [self._create_buy_proto_transaction(x, 'EUR', Decimal(1), time, Decimal(1))
+                      for x in ('BTC', 'ETH', 'DOGE', 'BNB')]
+        self.api.add_transaction(self.validator.validate_and_parse_transactions(proto_list))
+
+        with ThreadPoolExecutor(4) as executor:
+            iterator = self.api.process_coins(executor=executor)
+            assert next(iterator)[0] == 'BTC'
+            iterator.close()
+            # The other coins were running, they are waited for and stop without publishing
+            assert set(self.db.snapshots) == {'BTC'}
+            assert self.external_api.running == 0
+
+    def test_revalue_open_positions(self):
+        self._add_BTC_and_ETH()
+        self.api.process_all_coins_data()
+        self.external_api.add_fake_cache_data('BTCEUR', datetime.now(), Decimal(3))
+
+        revalued = self.api.revalue_open_positions()
+
+        assert set(revalued) == {'BTC', 'ETH'}
+        assert revalued['BTC'].current_total_value == Decimal(30)
+        assert self.api.get_coin_data('BTC').current_total_value == Decimal(30)
+        assert self.api.revalue_open_positions() == {}
+        assert self.api.get_next_revaluation_time() == datetime(2021, 1, 1, 0, 15)
+
+    def test_revaluation_started_before_a_processing(self):
+        self._add_BTC_and_ETH()
+        self.api.process_all_coins_data()
+        requested = threading.Event()
+        release = threading.Event()
+
+        def get_current_conversion_rates(coins, second):
+            requested.set()
+            release.wait(5)
+            return {x: Decimal(3) for x in coins}
+
+        self.external_api.get_current_conversion_rates = get_current_conversion_rates
+        with ThreadPoolExecutor(1) as executor:
+            revaluation = executor.submit(self.api.revalue_open_positions)
+            requested.wait(5)
+            fee = self._create_BTC_fee_proto(Decimal(-1), datetime.now())
+            self.api.add_transaction(self.validator.validate_and_parse_transactions([fee]))
+            self.api.process_coin_data('BTC')
+            processed = self.api.get_snapshot('BTC')
+            release.set()
+            revalued = revaluation.result()
+
+        # The rates were requested before the processing started, only the coin not processed again is revalued
+        assert set(revalued) == {'ETH'}
+        assert self.api.get_snapshot('BTC') is processed
+        assert self.api.get_coin_data('ETH').current_total_value == Decimal(15)
+
+    def test_processing_started_before_another_one(self):
+        self._add_BTC_and_ETH()
+        started = threading.Event()
+        release = threading.Event()
+
+        def should_stop() -> bool:
+            started.set()
+            release.wait(5)
+            return False
+
+        with ThreadPoolExecutor(1) as executor:
+            first = executor.submit(lambda: list(self.api.process_coins(['BTC'], should_stop=should_stop)))
+            started.wait(5)
+            self.api.process_coin_data('BTC')
+            processed = self.api.get_snapshot('BTC')
+            release.set()
+            first.result()
+
+        # The data of the processing started first is dropped instead of replacing the newer one
+        assert self.api.get_snapshot('BTC') is processed
+
+    def test_lot_pages(self):
+        start = datetime.now() - timedelta(days=5)
+        self.external_api.add_fake_cache_data('BTCEUR', datetime.now(), Decimal(10))
+        proto_list = []
+        for day in range(5):
+            proto_list.append(self._create_buy_proto_transaction('BTC', 'EUR', Decimal(day + 1),
+                                                                 start + timedelta(days=day), Decimal(day + 1)))
+        self.api.add_transaction(self.validator.validate_and_parse_transactions(proto_list))
+        self.api.process_coin_data('BTC')
+
+        assert self.api.count_lots('BTC') == 5
+        page = self.api.get_lots('BTC', 1, 2)
+        assert [x.cost for x in page] == [Decimal(4), Decimal(9)]
+        assert page[0].current_value == Decimal(20)
+        assert page[0].amortized is None
+        assert self.api.get_lots('BTC', 4, 10, full=True)[0].amortized == []
+        assert self.api.get_lots('BTC', 5, 10) == []
+        assert list(self.api.iter_lots('BTC')) == self.api.get_lots('BTC')
+        assert self.api.get_lots('BTC') == self.api.get_coin_data('BTC').buy_transactions_data
+
+    def test_snapshots(self):
+        self._add_BTC_and_ETH()
+        self.api.process_all_coins_data()
+        first = self.api.get_snapshot('BTC')
+        coin_data = self.api.get_coin_data('BTC')
+        assert self.api.get_coin_data('BTC') is coin_data
+        assert coin_data.coin_earn is not self.api._get_coin_data('BTC').coin_earn
+        assert coin_data.fees_data is not self.api._get_coin_data('BTC').fees_data
+
+        fee = self._create_BTC_fee_proto(Decimal(-1), datetime.now())
+        self.api.add_transaction(self.validator.validate_and_parse_transactions([fee]))
+        self.api.process_coin_data('BTC')
+        self.api.process_coin_data('BTC')
+        second = self.api.get_snapshot('BTC')
+
+        assert second.version > first.version
+        assert first.get_coin_data() is coin_data
+        assert coin_data.fees_data.total_cost == 0
+        assert second.get_coin_data().fees_data.total_cost == Decimal(-1)
+
+        self.external_api.add_fake_cache_data('BTCEUR', datetime.now(), Decimal(3))
+        self.api.revalue_open_positions()
+
+        assert self.api.get_snapshot('BTC').version > second.version
+        assert self.api.get_coin_data('BTC').coin_earn.current_conversion_rate == Decimal(3)
+        assert second.get_coin_data().coin_earn.current_conversion_rate == Decimal(1)
+        assert second.get_lots()[0].current_value_per_unit == Decimal(1)
+
     def test_coin_data_group_transactions(self):
         time_start = datetime.now() - timedelta(days=10)
         self.external_api.add_fake_cache_data('BTCEUR', time_start, Decimal(10))
@@ -607,3 +847,210 @@ class TestDataBaseAPI(TestCase):
         assert buy_transaction.realized_gains_change_percentage_str == "150.00%"
 
         self.assertAlmostEqual(float(coin_data.current_average_cost), 20)
+
+    def _process_gains_scenario(self, use_fixed_point, rates=('10.5', '20.25', '30.125', '15', '50.00')):
+        db = DataBaseAPI.create_new_database('test')
+        api = DataBaseAPI(db, self.external_api)
+        api.USE_FIXED_POINT_ENGINE = use_fixed_point
+        validator = TransactionValidator(api)
+
+        time_start = datetime.now() - timedelta(days=10)
+        rates = [x if isinstance(x, Decimal) else Decimal(x) for x in rates]
+        for days, rate in enumerate(rates[:-1]):
+            self.external_api.add_fake_cache_data('BTCEUR', time_start + timedelta(days=days), rate)
+        self.external_api.add_fake_cache_data('BTCEUR', datetime.now(), rates[-1])
+        proto_list = [self._create_BTC_buy_proto(Decimal('10.10'), time_start),
+                      self._create_BTC_buy_proto(Decimal('5.001'), time_start + timedelta(days=1)),
+                      self._create_BTC_sell_proto(Decimal('-12.5'), time_start + timedelta(days=2)),
+                      self._create_BTC_buy_proto(Decimal('0.00000001'), time_start + timedelta(days=3))]
+
+        api.add_transaction(validator.validate_and_parse_transactions(proto_list))
+        api.COMPUTE_FEES_QUANTITIES = False
+        api.COMPUTE_EARNINGS = False
+        api.process_coin_data('BTC')
+        return api.get_coin_data('BTC')
+
+    def _assert_fixed_point_matches_decimal(self, **kwargs):
+        decimal_data = self._process_gains_scenario(use_fixed_point=False, **kwargs)
+        fixed_point_data = self._process_gains_scenario(use_fixed_point=True, **kwargs)
+
+        for field_name in ('current_average_cost', 'total_costs', 'total_current_cost', 'total_unrealized_gains',
+                           'current_total_value', 'total_realized_gains', 'total_realized_value'):
+            assert str(getattr(fixed_point_data, field_name)) == str(getattr(decimal_data, field_name)), field_name
+
+    def test_fixed_point_engine_matches_decimal(self):
+        self._assert_fixed_point_matches_decimal()
+
+    def test_fixed_point_engine_matches_decimal_with_inverse_pair_rates(self):
+        # Rates of inverse pairs are 1 / price, with every digit the Decimal context keeps
+        self._assert_fixed_point_matches_decimal(rates=[Decimal(1) / Decimal(x) for x in
+                                                        ('3', '7', '0.0000312', '13', '0.00002089')])
+
+    def test_query_transactions(self):
+        time_start = datetime.now() - timedelta(days=10)
+        proto_list = [self._create_BTC_sell_proto(Decimal(-2), time_start + timedelta(days=2)),
+                      self._create_BTC_buy_proto(Decimal(10), time_start),
+                      self._create_BTC_pos_int_proto(Decimal(1), time_start + timedelta(days=1)),
+                      self._create_BTC_buy_proto(Decimal(5), time_start + timedelta(days=3))]
+        self.api.add_transaction(self.validator.validate_and_parse_transactions(proto_list))
+
+        result = self.api.query_transactions('BTC', types=(Transaction.TransactionType.BUY,
+                                                           Transaction.TransactionType.SELL))
+        assert [x.quantity for x in result] == [Decimal(10), Decimal(-2), Decimal(5)]
+
+        result = self.api.query_transactions('BTC', start=time_start + timedelta(days=1),
+                                             end=time_start + timedelta(days=3))
+        assert [x.quantity for x in result] == [Decimal(1), Decimal(-2)]
+        assert self.api.count_transactions('BTC', (Transaction.TransactionType.BUY,)) == 2
+
+    def _create_history(self, time_start):
+        prices = ((0, Decimal(10)), (40, Decimal(20)), (70, Decimal(30)), (80, Decimal(40)))
+        for days, price in prices:
+            self.external_api.add_fake_cache_data('BTCEUR', time_start + timedelta(days=days), price)
+        self.external_api.add_fake_cache_data('BTCEUR', datetime.now(), Decimal(50))
+        proto_list = [self._create_BTC_buy_proto(Decimal(10), time_start),
+                      self._create_BTC_pos_int_proto(Decimal(1), time_start + timedelta(days=31)),
+                      self._create_BTC_sell_proto(Decimal(-4), time_start + timedelta(days=40)),
+                      self._create_BTC_buy_proto(Decimal(5), time_start + timedelta(days=70)),
+                      self._create_BTC_sell_proto(Decimal(-8), time_start + timedelta(days=80))]
+        self.api.add_transaction(self.validator.validate_and_parse_transactions(proto_list))
+
+    def test_holdings_as_of(self):
+        time_start = datetime.now() - timedelta(days=100)
+        self._create_history(time_start)
+
+        snapshot = self.api.get_holdings_as_of('BTC', time_start - timedelta(days=1))
+        assert snapshot.transactions_count == 0
+        assert snapshot.spot_quantity == Decimal(0)
+
+        snapshot = self.api.get_holdings_as_of('BTC', time_start + timedelta(days=50))
+        assert snapshot.spot_quantity == Decimal(7)
+        assert snapshot.earn_coins_quantity == Decimal(1)
+        assert snapshot.open_lots_quantity == Decimal(6)
+        assert snapshot.cost_basis == Decimal(60)
+        assert snapshot.realized_value == Decimal(80)
+        assert snapshot.realized_gains == Decimal(40)
+
+        snapshot = self.api.get_portfolio_as_of(time_start + timedelta(days=90))['BTC']
+        assert snapshot.spot_quantity == Decimal(4)
+        assert snapshot.cost_basis == Decimal(90)
+        assert snapshot.realized_value == Decimal(400)
+        assert snapshot.realized_gains == Decimal(240)
+
+    def test_holdings_as_of_with_checkpoints(self):
+        time_start = datetime.now() - timedelta(days=100)
+        self._create_history(time_start)
+        dates = [time_start + timedelta(days=x) for x in range(-1, 95, 7)]
+        expected = [self.api.get_holdings_as_of('BTC', date) for date in dates]
+
+        self.api.COMPUTE_CHECKPOINTS = True
+        self.api.process_coin_data('BTC')
+        checkpoints = self.api._get_coin_data('BTC').checkpoints
+        assert len(checkpoints) == 3
+
+        assert [self.api.get_holdings_as_of('BTC', date) for date in dates] == expected
+
+    def test_holdings_as_of_oversell(self):
+        time_start = datetime.now() - timedelta(days=100)
+        self._create_history(time_start)
+        self.external_api.add_fake_cache_data('BTCEUR', time_start + timedelta(days=90), Decimal(40))
+        # 3 coins left in the lots and 1 earn coin
+        oversell = self._create_BTC_sell_proto(Decimal(-5), time_start + timedelta(days=90))
+        self.api.add_transaction(self.validator.validate_and_parse_transactions([oversell]))
+        message = "Not enough earn coins BTC to sell"
+
+        assert self.api.get_holdings_as_of('BTC', time_start + timedelta(days=85)).spot_quantity == Decimal(4)
+        with self.assertRaisesRegex(ValueError, message):
+            self.api.get_holdings_as_of('BTC', time_start + timedelta(days=95))
+        with self.assertRaisesRegex(ValueError, message):
+            self.api.process_coin_data('BTC')
+
+        # The checkpoints replay the same sells, they fail like the full replay and compute_gains
+        self.api.COMPUTE_GAINS = False
+        self.api.COMPUTE_CHECKPOINTS = True
+        with self.assertRaisesRegex(ValueError, message):
+            self.api.process_coin_data('BTC')
+
+    def test_value_series(self):
+        today = datetime.now()
+        buy_time = today - timedelta(days=3) + timedelta(hours=12)
+        sell_time = today - timedelta(days=1) + timedelta(hours=8)
+        self.external_api.add_fake_cache_data('BTCEUR', buy_time, Decimal(1))
+        for days, price in ((3, Decimal(1)), (2, Decimal(2)), (1, Decimal(3)), (0, Decimal(4))):
+            self.external_api.add_fake_cache_data('BTCEUR', today - timedelta(days=days), price)
+        proto_list = [self._create_BTC_buy_proto(Decimal(10), buy_time),
+                      self._create_BTC_sell_proto(Decimal(-4), sell_time)]
+        self.api.add_transaction(self.validator.validate_and_parse_transactions(proto_list))
+
+        series = self.api.get_value_series()
+
+        assert [str(x) for x in series.days] == ['2020-12-29', '2020-12-30', '2020-12-31', '2021-01-01']
+        assert list(series.holdings['BTC']) == [10, 10, 6, 6]
+        assert list(series.values['BTC']) == [10, 20, 18, 24]
+        assert list(series.total) == [10, 20, 18, 24]
+        assert self.api.get_value_series() is series
+
+        series = self.api.get_value_series(today.date() + timedelta(days=1))
+        assert len(series.days) == 5
+        assert series.holdings['BTC'][-1] == 6
+        assert series.values['BTC'][-1] != series.values['BTC'][-1]
+
+    def test_value_series_from_several_threads(self):
+        external_api = SlowExternalAPI({'BTC': 0.05})
+        requests = []
+        get_daily_conversion_rates = external_api.get_daily_conversion_rates
+        external_api.get_daily_conversion_rates = lambda *args: requests.append(args) or \
+            get_daily_conversion_rates(*args)
+        api = DataBaseAPI(DataBaseAPI.create_new_database('threads'), external_api)
+        time_start = datetime(2020, 12, 25)
+        for days in range(8):
+            external_api.add_fake_cache_data('BTCEUR', time_start + timedelta(days=days), Decimal(days + 1))
+        api.add_transaction(TransactionValidator(api).validate_and_parse_transactions(
+            [self._create_BTC_buy_proto(Decimal(10), time_start)]))
+
+        with ThreadPoolExecutor(4) as executor:
+            series = list(executor.map(lambda _: api.get_value_series(date(2020, 12, 31)), range(4)))
+
+        # The first thread computes the series, the others wait for it and get the cached one
+        assert len(requests) == 1
+        assert all(x is series[0] for x in series)
+        assert list(series[0].values['BTC']) == [10 * (x + 1) for x in range(7)]
+
+    def test_value_series_before_the_first_transaction(self):
+        time = datetime(2020, 12, 20)
+        self.external_api.add_fake_cache_data('BTCEUR', time, Decimal(1))
+        self.api.add_transaction(self.validator.validate_and_parse_transactions(
+            [self._create_BTC_buy_proto(Decimal(10), time)]))
+
+        series = self.api.get_value_series(date(2020, 12, 1))
+        assert len(series.days) == 0
+        assert len(series.total) == 0
+
+        assert list(self.api.get_value_series(date(2020, 12, 20)).holdings['BTC']) == [10]
+
+    def test_value_series_days_are_utc_days(self):
+        # Late in the UTC day, already the next day east of Greenwich and still the same day west of it
+        times = [datetime(2020, 12, 30, 23), datetime(2020, 12, 31, 1)]
+        for day in (30, 31):
+            self.external_api.add_fake_cache_data('BTCEUR', datetime(2020, 12, day), Decimal(1))
+        self.external_api.add_fake_cache_data('BTCEUR', times[0], Decimal(1))
+        self.external_api.add_fake_cache_data('BTCEUR', times[1], Decimal(1))
+
+        previous = os.environ.get('TZ')
+        try:
+            for name in ('Asia/Tokyo', 'America/New_York'):
+                os.environ['TZ'] = name
+                time.tzset()
+                api = DataBaseAPI(DataBaseAPI.create_new_database(name), self.external_api)
+                api.add_transaction(TransactionValidator(api).validate_and_parse_transactions(
+                    [self._create_BTC_buy_proto(Decimal(x + 1), times[x]) for x in range(2)]))
+
+                series = api.get_value_series(date(2020, 12, 31))
+                assert [str(x) for x in series.days] == ['2020-12-30', '2020-12-31'], name
+                assert list(series.holdings['BTC']) == [1, 3], name
+        finally:
+            if previous is None:
+                os.environ.pop('TZ', None)
+            else:
+                os.environ['TZ'] = previous
+            time.tzset()
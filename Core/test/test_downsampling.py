@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+import numpy as np
+
+from ..downsampling import LevelOfDetailSeries, lttb, min_max_downsample
+
+
+class TestDownsampling(TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x = np.arange(10000, dtype=np.int64)
+        self.y = np.cumsum(rng.normal(size=10000))
+
+    def test_min_max_keeps_extremes(self):
+        x, y = min_max_downsample(self.x, self.y, 100)
+
+        assert len(x) <= 100
+        assert np.all(np.diff(x) > 0)
+        assert y.max() == self.y.max()
+        assert y.min() == self.y.min()
+        assert np.array_equal(self.y[x], y)
+
+    def test_lttb(self):
+        x, y = lttb(self.x, self.y, 100)
+
+        assert len(x) == 100
+        assert x[0] == 0 and x[-1] == 9999
+        assert np.all(np.diff(x) > 0)
+        assert np.array_equal(self.y[x], y)
+
+    def test_short_series_are_unchanged(self):
+        for method in (min_max_downsample, lttb):
+            x, y = method(self.x[:50], self.y[:50], 100)
+            assert np.array_equal(x, self.x[:50])
+            assert len(y) == 50
+
+    def test_level_of_detail(self):
+        y = self.y.copy()
+        y[5] = np.nan
+        series = LevelOfDetailSeries(self.x, y)
+        assert len(series) == 9999
+
+        x, _ = series.get(0, 10000, 500)
+        assert len(x) <= 500
+        assert series.cached_levels == (0, 5)
+
+        # Zooming in uses a finer level, the range is kept with one point more at each side
+        x, _ = series.get(1000, 1200, 500)
+        assert x[0] == 999 and x[-1] == 1200
+        assert series.cached_levels == (0, 5)
+
+        level = series.get_level(5)
+        assert series.get_level(5) is level
+
+    def test_lttb_level_of_detail(self):
+        series = LevelOfDetailSeries(self.x, self.y, 'lttb')
+        x, y = series.get(2000, 8000, 300)
+
+        assert len(x) <= 302
+        assert x[0] < 2000 <= x[1]
@@ -0,0 +1,116 @@
+import tempfile
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from unittest import TestCase
+
+from ..CoinAPIExternal import BinanceAPI
+from ..fakeBinance import FakeBinanceClient
+
+
+class _ManualClock:
+
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestFakeBinanceClient(TestCase):
+
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self.now = datetime(2021, 6, 1, tzinfo=timezone.utc)
+        self.client = FakeBinanceClient(now=self.now)
+
+    def tearDown(self):
+        self._folder.cleanup()
+
+    def _create_api(self) -> BinanceAPI:
+        return BinanceAPI(None, self._folder.name, client=self.client)
+
+    def test_klines_are_deterministic(self):
+        start = int(datetime(2021, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+        first = self.client.get_historical_klines('BTCEUR', '1h', start, start + 3 * 3600 * 1000 - 1)
+        second = FakeBinanceClient(now=self.now).get_historical_klines('BTCEUR', '1h', start,
+                                                                       start + 3 * 3600 * 1000 - 1)
+
+        assert first == second
+        assert [x[0] for x in first] == [start, start + 3600 * 1000, start + 2 * 3600 * 1000]
+        assert first[0][6] == start + 3600 * 1000 - 1
+
+    def test_request_weights_are_counted(self):
+        start = int(datetime(2021, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+        self.client.get_exchange_info()
+        self.client.get_historical_klines('BTCEUR', '1m', start, start + 2500 * 60 * 1000 - 1)
+
+        # First valid time request and three pages
+        assert self.client.requests_by_endpoint == {'exchange_info': 1, 'klines': 4}
+        assert self.client.used_weight == 10 + 4 * 2
+
+    def test_rate_limit(self):
+        clock = _ManualClock()
+        client = FakeBinanceClient(weight_limit=3, wait_on_limit=False, clock=clock, sleep=clock.sleep)
+        client.ping()
+        client.get_symbol_ticker('BTCEUR')
+        with self.assertRaises(FakeBinanceClient.RateLimitError):
+            client.ping()
+
+        waiting = FakeBinanceClient(weight_limit=3, clock=clock, sleep=clock.sleep)
+        for _ in range(4):
+            waiting.ping()
+        assert clock.now == 60
+
+    def test_binance_api_routes_and_caches_conversions(self):
+        api = self._create_api()
+        self.client.reset_counters()
+        time = datetime(2021, 3, 1, 12, 30, 10)
+
+        direct = api.get_conversion_rate('BTC', 'EUR', time)
+        inverse = api.get_conversion_rate('EUR', 'BTC', time)
+        through_usdt = api.get_conversion_rate('ADA', 'EUR', time)
+
+        assert inverse == Decimal(1) / direct
+        assert through_usdt > 0
+        requests = self.client.request_count
+
+        assert api.get_conversion_rate('BTC', 'EUR', datetime(2021, 3, 1, 12, 30, 50)) == direct
+        assert self.client.request_count == requests
+
+    def test_binance_api_daily_rates(self):
+        api = self._create_api()
+        self.client.reset_counters()
+
+        rates = api.get_daily_conversion_rates('BTC', 'EUR', date(2021, 1, 1), 1)
+        assert rates[0] is not None
+        assert api.get_daily_conversion_rates('BTC', 'EUR', date(2021, 1, 1), 31)[0] == rates[0]
+        assert self.client.requests_by_endpoint['klines'] == 4
+
+    def test_binance_api_current_rates_in_one_request(self):
+        api = self._create_api()
+        self.client.reset_counters()
+
+        rates = api.get_current_conversion_rates(['BTC', 'ADA', 'DOT', 'XXX'], 'EUR')
+
+        now = int(self.now.timestamp() * 1000)
+        assert set(rates) == {'BTC', 'ADA', 'DOT'}
+        assert rates['BTC'] == self.client.price('BTCEUR', now)
+        assert rates['ADA'] == self.client.price('ADABTC', now) * self.client.price('BTCEUR', now)
+        assert rates['DOT'] == self.client.price('DOTBNB', now) * self.client.price('BNBEUR', now)
+        assert self.client.requests_by_endpoint == {'all_tickers': 1}
+
+    def test_binance_api_current_rates_skip_symbols_not_trading(self):
+        api = self._create_api()
+        get_all_tickers = self.client.get_all_tickers
+        # Symbols not trading are listed with a price of 0
+        self.client.get_all_tickers = lambda: [dict(x, price='0') if x['symbol'] in ('BTCEUR', 'ADABTC') else x
+                                               for x in get_all_tickers()]
+
+        rates = api.get_current_conversion_rates(['BTC', 'ADA'], 'EUR')
+
+        now = int(self.now.timestamp() * 1000)
+        assert rates['BTC'] == self.client.price('BTCUSDT', now) * self.client.price('USDTEUR', now)
+        assert rates['ADA'] == self.client.price('ADAUSDT', now) * self.client.price('USDTEUR', now)
@@ -0,0 +1,75 @@
+from decimal import Decimal
+from unittest import TestCase
+
+import numpy as np
+
+from ..fixedPoint import FixedPointColumn, FixedPointEngine, to_scaled, from_scaled
+
+
+class TestFixedPoint(TestCase):
+
+    def test_scaled_round_trip(self):
+        assert to_scaled(Decimal('1.5'), 8) == 150000000
+        assert from_scaled(150000000, 8, 1) == Decimal('1.5')
+        assert str(from_scaled(150000000, 8, 1)) == '1.5'
+
+        with self.assertRaises(ValueError):
+            to_scaled(Decimal('0.001'), 2)
+
+    def test_column_grows_scale(self):
+        column = FixedPointColumn(2)
+        column.append(Decimal('1.25'))
+        column.append(Decimal('0.001'))
+
+        assert column.scale == 3
+        assert column.get(0) == Decimal('1.25')
+        assert str(column.sum()) == '1.251'
+
+    def test_column_overflow(self):
+        column = FixedPointColumn(8)
+        column.append(Decimal('100000000000'))
+        column.append(Decimal('100000000000'))
+
+        assert column.values.dtype == object
+        assert column.sum() == Decimal('200000000000')
+
+    def test_engine_lots(self):
+        engine = FixedPointEngine(8)
+        first = engine.add_lot(Decimal(10), Decimal('10'))
+        engine.add_lot(Decimal(5), Decimal('20'))
+        engine.add_amortization(first, Decimal(10), Decimal(300))
+
+        assert engine.total_costs() == Decimal(200)
+        assert engine.total_current_cost() == Decimal(100)
+        assert engine.total_spot_quantity() == Decimal(5)
+        assert engine.current_total_value(Decimal(50)) == Decimal(250)
+        assert engine.total_unrealized_gains(Decimal(50)) == Decimal(150)
+        assert engine.total_realized_value() == Decimal(300)
+        assert engine.total_realized_gains() == Decimal(200)
+
+    def test_engine_rounds_like_decimal(self):
+        quantities = [Decimal('1.23456789'), Decimal('0.5')]
+        costs = [Decimal(1) / 3, Decimal(1) / 7]
+        engine = FixedPointEngine(8)
+        for quantity, cost in zip(quantities, costs):
+            engine.add_lot(quantity, cost)
+
+        assert str(engine.total_costs()) == str(sum(x * y for x, y in zip(quantities, costs)))
+        assert str(engine.total_costs()) == '0.4829512014285714285714285714'
+
+        engine.add_amortization(0, Decimal('0.2'), Decimal('0.2') / 9)
+        engine.add_amortization(0, Decimal('0.3'), Decimal('1234.5678') / 11)
+        amortized_value = 0 + Decimal('0.2') / 9 + Decimal('1234.5678') / 11
+        assert str(engine.total_realized_value()) == str(amortized_value)
+        assert str(engine.total_realized_gains()) == str(amortized_value - (Decimal('0.5') * costs[0]))
+
+    def test_column_sum_rounds_like_decimal(self):
+        values = [Decimal('123456789012345678901.12345678'), Decimal('246913578024691357802.24691359'),
+                  Decimal('0.00000001')]
+        column = FixedPointColumn(8)
+        column.extend(values)
+
+        assert str(column.sum()) == str(sum(values))
+        assert str(column.sum()) == '370370367037037036703.3703704'
+        mask = np.array([True, False, True])
+        assert str(column.sum(mask)) == str(sum(x for x, selected in zip(values, mask) if selected))
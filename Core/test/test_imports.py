@@ -0,0 +1,25 @@
+import subprocess
+import sys
+from pathlib import Path
+from unittest import TestCase
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def _loaded_after_import(module: str):
+    code = (f"import sys, {module}; "
+            f"print(','.join(x for x in ('pandas', 'binance', 'PyQt5') if x in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [x for x in output.stdout.strip().split(',') if x]
+
+
+class TestLazyImports(TestCase):
+
+    def test_packages_do_not_load_heavy_dependencies(self):
+        for module in ('Core', 'Core.CoinAPIExternal', 'API', 'GUI'):
+            with self.subTest(module=module):
+                assert _loaded_after_import(module) == []
+
+    def test_dependencies_load_when_used(self):
+        assert _loaded_after_import('Core; Core.BinanceAPI') == []
+        assert _loaded_after_import('GUI; GUI.OverviewContext') == ['PyQt5']
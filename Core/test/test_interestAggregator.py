@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import TestCase
+
+from ..Dataclasses import AggregatedTransaction, Coin, CoinInfo, Transaction
+from ..interestAggregator import InterestAggregator
+
+
+class TestInterestAggregator(TestCase):
+
+    def setUp(self):
+        self.btc = Coin(CoinInfo('BTC', 'Bitcoin'), [])
+        self.eth = Coin(CoinInfo('ETH', 'Ethereum'), [])
+        self.time = datetime(2021, 1, 1)
+
+    def _create_interest(self, coin, quantity, hours, operation_type=Transaction.TransactionType.POS_INTEREST):
+        return Transaction(quantity, coin, operation_type, self.time + timedelta(hours=hours), 'Spot')
+
+    def test_daily_buckets_per_coin(self):
+        buy = Transaction(Decimal(1), self.btc, Transaction.TransactionType.BUY, self.time, 'Spot')
+        transactions = [self._create_interest(self.btc, Decimal('0.1'), 1), buy,
+                        self._create_interest(self.eth, Decimal('0.5'), 2),
+                        self._create_interest(self.btc, Decimal('0.2'), 3),
+                        self._create_interest(self.btc, Decimal('0.3'), 25)]
+
+        aggregated = InterestAggregator().aggregate(transactions)
+
+        assert len(aggregated) == 4
+        assert isinstance(aggregated[0], AggregatedTransaction)
+        assert aggregated[0].quantity == Decimal('0.3')
+        assert aggregated[0].UTC_Time == self.time + timedelta(hours=3)
+        assert aggregated[0].source_ids == (transactions[0].id, transactions[3].id)
+        assert aggregated[0].id == 'agg_' + transactions[0].id
+        assert aggregated[1] is buy
+        assert aggregated[2] is transactions[2]
+        assert aggregated[3] is transactions[4]
+
+    def test_aggregate_needs_sources(self):
+        with self.assertRaises(ValueError):
+            AggregatedTransaction(Decimal(1), self.btc, Transaction.TransactionType.POS_INTEREST, self.time, 'Spot')
+        with self.assertRaises(ValueError):
+            AggregatedTransaction(Decimal(1), self.btc, Transaction.TransactionType.POS_INTEREST, self.time, 'Spot',
+                                  source_ids=())
+
+    def test_operation_types_are_not_mixed(self):
+        transactions = [self._create_interest(self.btc, Decimal(1), 1),
+                        self._create_interest(self.btc, Decimal(2), 2, Transaction.TransactionType.SAVING_INTEREST)]
+
+        assert InterestAggregator().aggregate(transactions) == transactions
+
+    def test_configurable_bucket(self):
+        # 2021-01-04 is a Monday
+        transactions = [self._create_interest(self.btc, Decimal(1), 24 * (x + 3)) for x in range(14)]
+
+        aggregated = InterestAggregator(timedelta(days=7)).aggregate(transactions)
+
+        assert [x.quantity for x in aggregated] == [Decimal(7), Decimal(7)]
+        assert sum(len(x.source_ids) for x in aggregated) == 14
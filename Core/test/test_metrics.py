@@ -0,0 +1,69 @@
+import json
+from unittest import TestCase
+
+from ..metrics import MetricsRegistry
+
+
+class TestMetricsRegistry(TestCase):
+
+    def test_counters_and_ratio(self):
+        metrics = MetricsRegistry()
+        metrics.increment('cache.hit', 3)
+        metrics.increment('cache.miss')
+
+        assert metrics.get_counter('cache.hit') == 3
+        assert metrics.get_counter('missing') == 0
+        assert metrics.ratio('cache.hit', 'cache.miss') == 0.75
+        assert metrics.ratio('a', 'b') == 0.
+
+    def test_timers_keep_aggregates(self):
+        metrics = MetricsRegistry()
+        metrics.record('stage', 2.)
+        metrics.record('stage', 1.)
+        with metrics.timer('stage'):
+            pass
+
+        stats = metrics.get_timer('stage')
+        assert stats.count == 3
+        assert stats.max == 2.
+        assert stats.min < 1.
+        assert 3. <= stats.total < 3.1
+
+    def test_timer_records_on_error(self):
+        metrics = MetricsRegistry()
+        with self.assertRaises(KeyError):
+            with metrics.timer('failing'):
+                raise KeyError
+
+        assert metrics.get_timer('failing').count == 1
+
+    def test_hooks(self):
+        metrics = MetricsRegistry()
+        calls = []
+        hook = lambda name, seconds: calls.append((name, seconds))
+        metrics.add_hook(hook)
+        metrics.record('stage', 1.)
+        metrics.remove_hook(hook)
+        metrics.record('stage', 1.)
+
+        assert calls == [('stage', 1.)]
+
+    def test_disabled(self):
+        metrics = MetricsRegistry(enabled=False)
+        metrics.increment('cache.hit')
+        with metrics.timer('stage'):
+            pass
+
+        assert metrics.to_dict() == {'counters': {}, 'timers': {}}
+
+    def test_json_export(self):
+        metrics = MetricsRegistry()
+        metrics.increment('cache.hit')
+        metrics.record('stage', 0.5)
+
+        exported = json.loads(metrics.to_json())
+        assert exported['counters'] == {'cache.hit': 1}
+        assert exported['timers']['stage'] == {'count': 1, 'total': 0.5, 'mean': 0.5, 'min': 0.5, 'max': 0.5}
+
+        metrics.reset()
+        assert metrics.to_dict() == {'counters': {}, 'timers': {}}
@@ -0,0 +1,260 @@
+import tempfile
+import threading
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+from unittest import TestCase
+
+from ..priceHistory import Kline, PriceHistoryDatabase, Resolution, logger
+
+
+class _Symbol:
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+
+_INTERVALS = {Resolution.M1: 60 * 1000, Resolution.H1: 60 * 60 * 1000, Resolution.D1: 24 * 60 * 60 * 1000}
+
+
+class TestPriceHistoryDatabase(TestCase):
+
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self.path = Path(self._folder.name) / "price_history.txt"
+        self.requests = []
+
+    def tearDown(self):
+        self._folder.cleanup()
+
+    def _request_price(self, symbol, date, resolution=Resolution.M1):
+        self.requests.append((symbol, date, resolution))
+        interval = _INTERVALS[resolution]
+        open_time = int(date.timestamp() * 1000) // interval * interval
+        return [Kline(open_time, open_time + interval - 1, Decimal(9), Decimal(11))]
+
+    def _request_candle(self, symbol, date, resolution):
+        interval = _INTERVALS[resolution]
+        open_time = int(date.timestamp() * 1000) // interval * interval
+        return self._request_price_range(symbol, resolution, open_time, open_time)
+
+    def _request_price_range(self, symbol, resolution, start, end):
+        self.requests.append((symbol, start, end, resolution))
+        interval = _INTERVALS[resolution]
+        return [Kline(x, x + interval - 1, Decimal(x // interval), Decimal(x // interval + 2))
+                for x in range(start, end + 1, interval)]
+
+    def test_prices_are_flushed_in_batches(self):
+        database = PriceHistoryDatabase(self.path, self._request_price, False, flush_every=2)
+        database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1))
+        assert self.path.read_text() == ''
+
+        database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 2))
+        assert len(self.path.read_text().splitlines()) == 2
+
+        database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 3))
+        database.close()
+
+        reloaded = PriceHistoryDatabase(self.path, self._request_price, False)
+        assert reloaded.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 3)) == Decimal(10)
+        assert len(self.requests) == 3
+        reloaded.close()
+
+    def test_concurrent_misses_share_one_request(self):
+        release = threading.Event()
+
+        def slow_request(symbol, date, resolution):
+            release.wait(5)
+            return self._request_price(symbol, date, resolution)
+
+        database = PriceHistoryDatabase(self.path, slow_request, False)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1)))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        database.close()
+
+        assert results == [Decimal(10)] * 8
+        assert len(self.requests) == 1
+
+    def test_failed_request_is_raised_to_every_caller(self):
+        def failing_request(symbol, date, resolution):
+            raise KeyError(symbol)
+
+        database = PriceHistoryDatabase(self.path, failing_request, False)
+        with self.assertRaises(KeyError):
+            database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1))
+        with self.assertRaises(KeyError):
+            database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1))
+        database.close()
+
+    def test_torn_last_line_is_dropped(self):
+        self.path.write_text("BTCEUR_1000;10\nBTCEUR_2000;1")
+        with self.assertLogs(logger, 'WARNING') as logs:
+            database = PriceHistoryDatabase(self.path, self._request_price, False)
+        assert len(logs.records) == 1
+
+        assert database.get_price(_Symbol('BTCEUR'), datetime.fromtimestamp(1)) == Decimal(10)
+        database.get_price(_Symbol('BTCEUR'), datetime.fromtimestamp(2))
+        database.close()
+
+        assert len(self.requests) == 1
+        assert self.path.read_text() == "BTCEUR_1000;10\nBTCEUR_1m_0;59999;9;11\n"
+
+    def test_invalid_lines_are_summarized(self):
+        self.path.write_text("BTCEUR_1000;10\nBTCEUR_2000;x\nBTCEUR_3000;y\n")
+        with self.assertLogs(logger, 'WARNING') as logs:
+            database = PriceHistoryDatabase(self.path, self._request_price, False)
+        database.close()
+
+        assert len(logs.records) == 1
+        assert logs.records[0].args[0] == 2
+
+    def test_compact_removes_duplicates_and_sorts(self):
+        self.path.write_text("ETHEUR_1000;2\nBTCEUR_2000;5\nBTCEUR_1000;3\nBTCEUR_2000;5\n")
+        database = PriceHistoryDatabase(self.path, self._request_price, False)
+        database.get_price(_Symbol('BTCEUR'), datetime.fromtimestamp(3))
+
+        database.compact()
+        database.get_price(_Symbol('ETHEUR'), datetime.fromtimestamp(2))
+        database.close()
+
+        assert self.path.read_text().splitlines() == ['BTCEUR_1000;3', 'BTCEUR_2000;5', 'BTCEUR_1m_0;59999;9;11',
+                                                      'ETHEUR_1000;2', 'ETHEUR_1m_0;59999;9;11']
+
+    def test_prices_without_candle_are_kept_per_resolution(self):
+        def distant_request(symbol, date, resolution):
+            self.requests.append((symbol, date, resolution))
+            # The only candle found starts ten intervals after the time
+            interval = _INTERVALS[resolution]
+            open_time = int(date.timestamp() * 1000) // interval * interval + 10 * interval
+            return [Kline(open_time, open_time + interval - 1, Decimal(1), Decimal(3))]
+
+        self.path.write_text("ETHEUR_1609459200000;5\n")
+        database = PriceHistoryDatabase(self.path, distant_request, False)
+        time = datetime.fromtimestamp(1609459200)
+        assert database.get_price(_Symbol('BTCEUR'), time, Resolution.D1) == Decimal(2)
+        assert database.get_price(_Symbol('BTCEUR'), time, Resolution.D1) == Decimal(2)
+        assert len(self.requests) == 1
+
+        # A day price is not precise enough for a minute query
+        database.get_price(_Symbol('BTCEUR'), time)
+        assert len(self.requests) == 2
+
+        # Prices without resolution were requested at minutes
+        assert database.get_price(_Symbol('ETHEUR'), time) == Decimal(5)
+        database.get_price(_Symbol('ETHEUR'), time, Resolution.H1)
+        assert [x[2] for x in self.requests[2:]] == [Resolution.H1]
+        database.close()
+
+        reloaded = PriceHistoryDatabase(self.path, distant_request, False)
+        reloaded.get_price(_Symbol('BTCEUR'), time, Resolution.D1)
+        reloaded.get_price(_Symbol('BTCEUR'), time)
+        reloaded.close()
+        assert len(self.requests) == 3
+
+    def test_times_inside_a_cached_candle_reuse_it(self):
+        database = PriceHistoryDatabase(self.path, self._request_price, False)
+        for seconds in (0, 10, 59):
+            assert database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1, 0, 0, seconds)) == Decimal(10)
+        database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1, 0, 1, 0))
+        database.close()
+
+        assert len(self.requests) == 2
+
+        reloaded = PriceHistoryDatabase(self.path, self._request_price, False)
+        assert reloaded.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1, 0, 0, 30)) == Decimal(10)
+        assert len(self.requests) == 2
+        reloaded.close()
+
+    def test_tolerance_reuses_close_candles(self):
+        database = PriceHistoryDatabase(self.path, self._request_price, False, tolerance=timedelta(minutes=2))
+        database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1))
+        database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1, 0, 2, 30))
+        database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1, 0, 3, 30))
+        database.close()
+
+        assert len(self.requests) == 2
+
+    def test_hits_and_misses_are_counted(self):
+        database = PriceHistoryDatabase(self.path, self._request_price, False, self._request_price_range)
+        database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1))
+        database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1, 0, 0, 30))
+        database.get_daily_prices(_Symbol('BTCEUR'), date(2020, 12, 1), 2)
+        database.get_daily_prices(_Symbol('BTCEUR'), date(2020, 12, 2), 2)
+        database.close()
+
+        metrics = database.metrics
+        assert metrics.get_counter('price_cache.hit') == 1
+        assert metrics.get_counter('price_cache.miss') == 1
+        assert metrics.get_counter('price_cache.daily_hit') == 1
+        assert metrics.get_counter('price_cache.daily_miss') == 3
+        assert metrics.get_timer('price_cache.request').count == 1
+        assert metrics.get_timer('price_cache.range_request').count == 2
+
+    def test_coarse_resolution_requests_coarse_candles(self):
+        database = PriceHistoryDatabase(self.path, self._request_price, False)
+        database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1, 10, 5), Resolution.H1)
+        database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1, 10, 55), Resolution.H1)
+
+        # An hour candle is not precise enough for a minute query
+        database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1, 10, 5))
+        database.close()
+
+        assert [x[2] for x in self.requests] == [Resolution.H1, Resolution.M1]
+
+    def test_minute_candles_roll_up_to_hours(self):
+        database = PriceHistoryDatabase(self.path, self._request_candle, False)
+        for minute in range(60):
+            database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1, 10, minute))
+
+        # Open of the first minute and close of the last one
+        first_minute = int(datetime(2021, 1, 1, 10).timestamp()) // 60
+        assert database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1, 10, 30, 30), Resolution.H1) == \
+               (Decimal(first_minute) + Decimal(first_minute + 61)) * Decimal(0.5)
+
+        database.get_price(_Symbol('BTCEUR'), datetime(2021, 1, 1, 11, 30), Resolution.H1)
+        database.close()
+
+        assert len(self.requests) == 61
+        assert len([x for x in self.path.read_text().splitlines() if '_1h_' in x]) == 2
+
+    def test_daily_prices_from_day_candles(self):
+        database = PriceHistoryDatabase(self.path, self._request_price, False, self._request_price_range)
+        first = database.get_daily_prices(_Symbol('BTCEUR'), date(2020, 12, 1), 3)
+        second = database.get_daily_prices(_Symbol('BTCEUR'), date(2020, 12, 2), 3)
+        database.close()
+
+        day = int(datetime(2020, 12, 1, tzinfo=timezone.utc).timestamp()) // 86400
+        assert first == [Decimal(day + 1), Decimal(day + 2), Decimal(day + 3)]
+        assert second == [Decimal(day + 2), Decimal(day + 3), Decimal(day + 4)]
+        assert len(self.requests) == 2
+
+    def test_missing_days_are_not_requested_again(self):
+        def listed_request(symbol, resolution, start, end):
+            # No candles before 2020-12-03
+            return [x for x in self._request_price_range(symbol, resolution, start, end)
+                    if x.open_time >= listing]
+
+        listing = int(datetime(2020, 12, 3, tzinfo=timezone.utc).timestamp() * 1000)
+        database = PriceHistoryDatabase(self.path, self._request_price, False, listed_request)
+        first = database.get_daily_prices(_Symbol('BTCEUR'), date(2020, 12, 1), 4)
+        assert first[:2] == [None, None]
+        assert len(self.requests) == 1
+
+        assert database.get_daily_prices(_Symbol('BTCEUR'), date(2020, 12, 1), 4) == first
+        assert len(self.requests) == 1
+        database.close()
+
+        expiring = PriceHistoryDatabase(self.path, self._request_price, False, listed_request,
+                                        missing_day_ttl=timedelta(0))
+        expiring.get_daily_prices(_Symbol('BTCEUR'), date(2020, 12, 1), 4)
+        expiring.get_daily_prices(_Symbol('BTCEUR'), date(2020, 12, 1), 4)
+        expiring.close()
+        first_day = int(datetime(2020, 12, 1, tzinfo=timezone.utc).timestamp() * 1000)
+        second_day_close = first_day + 2 * _INTERVALS[Resolution.D1] - 1
+        assert [x[1:3] for x in self.requests[1:]] == [(first_day, second_day_close)] * 2
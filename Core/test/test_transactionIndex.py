@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import TestCase
+
+from ..Dataclasses import Coin, CoinInfo, Transaction
+from ..transactionIndex import TransactionIndex
+
+
+class TestTransactionIndex(TestCase):
+
+    def setUp(self):
+        self.btc = Coin(CoinInfo('BTC', 'Bitcoin'), [])
+        self.eth = Coin(CoinInfo('ETH', 'Ethereum'), [])
+        self.time = datetime(2021, 1, 1)
+        self.index = TransactionIndex()
+
+    def _create_transaction(self, coin, quantity, operation_type, days, account='Spot'):
+        return Transaction(Decimal(quantity), coin, operation_type, self.time + timedelta(days=days), account)
+
+    def test_query_is_time_ordered(self):
+        late = self._create_transaction(self.btc, 1, Transaction.TransactionType.BUY, 3)
+        early = self._create_transaction(self.btc, 2, Transaction.TransactionType.BUY, 1)
+        self.index.add([late, early])
+
+        assert self.index.query('BTC') == [early, late]
+        assert self.index.get_times('BTC') == sorted(self.index.get_times('BTC'))
+
+    def test_query_by_types_and_range(self):
+        transactions = [self._create_transaction(self.btc, x + 1, Transaction.TransactionType.BUY, x)
+                        for x in range(10)]
+        transactions += [self._create_transaction(self.btc, -1, Transaction.TransactionType.SELL, x + 0.5)
+                         for x in range(10)]
+        self.index.add(transactions)
+
+        result = self.index.query('BTC', types=(Transaction.TransactionType.SELL,),
+                                  start=self.time + timedelta(days=2), end=self.time + timedelta(days=5))
+        assert [x.UTC_Time for x in result] == [self.time + timedelta(days=x + 0.5) for x in (2, 3, 4)]
+
+        result = self.index.query('BTC', types=(Transaction.TransactionType.BUY, Transaction.TransactionType.SELL),
+                                  end=self.time + timedelta(days=2))
+        assert [x.operation_type for x in result] == [Transaction.TransactionType.BUY,
+                                                      Transaction.TransactionType.SELL] * 2
+        assert self.index.count('BTC', (Transaction.TransactionType.BUY,), start=self.time + timedelta(days=8)) == 2
+
+    def test_equal_times_follow_requested_types(self):
+        sell = self._create_transaction(self.btc, -1, Transaction.TransactionType.SELL, 0)
+        buy = self._create_transaction(self.btc, 1, Transaction.TransactionType.BUY, 0)
+        self.index.add([sell, buy])
+
+        assert self.index.query('BTC', types=(Transaction.TransactionType.BUY,
+                                              Transaction.TransactionType.SELL)) == [buy, sell]
+
+    def test_query_by_account_and_all_coins(self):
+        self.index.add([self._create_transaction(self.btc, 1, Transaction.TransactionType.DEPOSIT, 0, 'Card'),
+                        self._create_transaction(self.btc, 1, Transaction.TransactionType.DEPOSIT, 1, 'Spot'),
+                        self._create_transaction(self.eth, 1, Transaction.TransactionType.DEPOSIT, 2, 'Card'),
+                        self._create_transaction(self.eth, 1, Transaction.TransactionType.BUY, 3, 'Card')])
+
+        result = self.index.query(accounts=('Card',), types=(Transaction.TransactionType.DEPOSIT,))
+        assert [x.coin.coin_info.tick for x in result] == ['BTC', 'ETH']
+
+        self.index.remove_coin('ETH')
+        assert len(self.index) == 2
+        assert self.index.query('ETH') == []
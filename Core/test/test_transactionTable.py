@@ -0,0 +1,89 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest import TestCase
+
+from ..Dataclasses import Coin, CoinInfo, Transaction
+from ..transactionTable import TransactionTable, epoch_ms
+
+
+class TestTransactionTable(TestCase):
+
+    def setUp(self):
+        self.coin = Coin(CoinInfo('BTC', 'Bitcoin'), [])
+        self.time = datetime(2021, 1, 1)
+
+    def _create_transaction(self, quantity, operation_type, days=0, account='Spot'):
+        return Transaction(quantity, self.coin, operation_type, self.time + timedelta(days=days), account)
+
+    def test_append_keeps_time_order(self):
+        table = TransactionTable()
+        late = self._create_transaction(Decimal(1), Transaction.TransactionType.BUY, days=2)
+        early = self._create_transaction(Decimal(2), Transaction.TransactionType.BUY, days=1)
+        table.append(late)
+        table.append(early)
+
+        assert len(table) == 2
+        assert table.get_transactions() == [early, late]
+        assert list(table.times) == sorted(table.times)
+
+    def test_extend_sorts_unordered_rows(self):
+        table = TransactionTable()
+        transactions = [self._create_transaction(Decimal(x), Transaction.TransactionType.DEPOSIT, days=-x)
+                        for x in range(40)]
+        table.extend(transactions)
+
+        assert table.get_transactions() == list(reversed(transactions))
+
+    def test_sum_quantity_exact(self):
+        table = TransactionTable()
+        table.extend([self._create_transaction(Decimal('0.1'), Transaction.TransactionType.POS_INTEREST, days=x)
+                      for x in range(10)])
+        table.append(self._create_transaction(Decimal('0.00000001'), Transaction.TransactionType.POS_INTEREST))
+
+        assert table.scale == 8
+        assert table.sum_quantity() == Decimal('1.00000001')
+
+    def test_sum_quantity_matches_decimal_representation(self):
+        table = TransactionTable()
+        table.append(self._create_transaction(Decimal('10'), Transaction.TransactionType.BUY))
+        table.append(self._create_transaction(Decimal('-2.50'), Transaction.TransactionType.SELL, days=1))
+        table.append(self._create_transaction(Decimal('0.001'), Transaction.TransactionType.POS_INTEREST, days=2))
+
+        buy_sell = table.mask((Transaction.TransactionType.BUY, Transaction.TransactionType.SELL))
+        assert str(table.sum_quantity(buy_sell)) == str(Decimal(0) + Decimal('10') + Decimal('-2.50'))
+        assert str(table.sum_quantity()) == '7.501'
+
+    def test_type_and_account_masks(self):
+        table = TransactionTable()
+        table.append(self._create_transaction(Decimal(5), Transaction.TransactionType.BUY, account='Spot'))
+        table.append(self._create_transaction(Decimal(-1), Transaction.TransactionType.FEE, account='Spot'))
+        table.append(self._create_transaction(Decimal(2), Transaction.TransactionType.DEPOSIT, account='Card'))
+
+        assert table.sum_quantity(table.mask((Transaction.TransactionType.FEE,))) == Decimal(-1)
+        assert table.sum_quantity(table.mask(accounts=('Card',))) == Decimal(2)
+        assert table.sum_quantity(table.mask(accounts=('Unknown',))) == Decimal(0)
+
+    def test_overflow_falls_back_to_python_integers(self):
+        table = TransactionTable()
+        table.append(self._create_transaction(Decimal('90000000000'), Transaction.TransactionType.DEPOSIT))
+        table.append(self._create_transaction(Decimal('0.000000001'), Transaction.TransactionType.DEPOSIT, days=1))
+
+        assert table.quantities.dtype == object
+        assert table.sum_quantity() == Decimal('90000000000.000000001')
+
+    def test_naive_times_are_utc(self):
+        expected = int(datetime(2021, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+        previous = os.environ.get('TZ')
+        try:
+            for name in ('Asia/Tokyo', 'America/New_York'):
+                os.environ['TZ'] = name
+                time.tzset()
+                assert epoch_ms(self.time) == expected, name
+        finally:
+            if previous is None:
+                os.environ.pop('TZ', None)
+            else:
+                os.environ['TZ'] = previous
+            time.tzset()
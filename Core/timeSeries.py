@@ -0,0 +1,143 @@
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .fixedPoint import INT64_MAX
+from .transactionTable import TransactionTable, epoch_ms
+
+
+@dataclass(frozen=True)
+class PortfolioValueSeries:
+    fiat: str
+    days: np.ndarray
+    holdings: Dict[str, np.ndarray]
+    values: Dict[str, np.ndarray]
+    total: np.ndarray
+
+
+class _CoinSeries:
+
+    def __init__(self, first_day: date):
+        self.first_day = first_day
+        self.rates: List[Optional[Decimal]] = []
+        self.transactions_count = -1
+        self.holdings: Optional[np.ndarray] = None
+
+
+class PortfolioTimeSeries:
+    """Daily value of every coin and of the whole portfolio in the return fiat.
+
+    Holdings at the end of each day are prefix sums over the time sorted `TransactionTable` of the coin, and the daily
+    rates are requested in bulk ranges. Days are UTC days, like the daily candles of the rates. Rates and holdings are
+    cached per coin, so extending the series to new days only requests the rates of those days. The series can be
+    requested from several threads, the caches are updated by one at a time.
+    """
+
+    def __init__(self, return_fiat: str, coin_list_callback: Callable[[], List[str]],
+                 transaction_table_callback: Callable[[str], TransactionTable],
+                 daily_rates_callback: Callable[[str, str, date, int], List[Optional[Decimal]]]):
+        self._return_fiat = return_fiat
+        self._get_coin_list = coin_list_callback
+        self._get_transaction_table = transaction_table_callback
+        self._get_daily_rates = daily_rates_callback
+
+        self._coins: Dict[str, _CoinSeries] = {}
+        self._series: Optional[PortfolioValueSeries] = None
+        self._lock = threading.Lock()
+
+    def get_series(self, end: Optional[date] = None) -> PortfolioValueSeries:
+        end = end if end is not None else datetime.now(timezone.utc).date()
+        with self._lock:
+            return self._get_series(end)
+
+    def _get_series(self, end: date) -> PortfolioValueSeries:
+
+        coins = {}
+        for coin_tick in self._get_coin_list():
+            table = self._get_transaction_table(coin_tick)
+            if len(table):
+                coins[coin_tick] = table
+
+        first_day = min((self._first_day(table) for table in coins.values()), default=None)
+        if first_day is None or end < first_day:
+            return PortfolioValueSeries(self._return_fiat, np.array([], dtype='datetime64[D]'), {}, {},
+                                        np.array([], dtype=np.float64))
+        days = np.arange(np.datetime64(first_day, 'D'), np.datetime64(end, 'D') + 1)
+        if self._is_cached(coins, days):
+            return self._series
+
+        holdings = {}
+        values = {}
+        for coin_tick, table in coins.items():
+            holdings[coin_tick], values[coin_tick] = self._get_coin_series(coin_tick, table, first_day, end)
+
+        total = np.nansum(np.vstack(list(values.values())), axis=0) if values else np.zeros(len(days))
+        self._series = PortfolioValueSeries(self._return_fiat, days, holdings, values, total)
+        return self._series
+
+    def _is_cached(self, coins: Dict[str, TransactionTable], days: np.ndarray) -> bool:
+        if self._series is None or not np.array_equal(self._series.days, days):
+            return False
+        if set(self._series.values) != set(coins):
+            return False
+        return all(self._coins[x].transactions_count == len(table) for x, table in coins.items())
+
+    def _get_coin_series(self, coin_tick: str, table: TransactionTable, first_day: date, end: date):
+        coin_first_day = self._first_day(table)
+        cached = self._coins.get(coin_tick)
+        if cached is None or cached.first_day != coin_first_day:
+            cached = _CoinSeries(coin_first_day)
+            self._coins[coin_tick] = cached
+
+        days = max((end - first_day).days + 1, 0)
+        padding = np.zeros(min(max((coin_first_day - first_day).days, 0), days))
+        coin_days = max(days - len(padding), 0)
+        if cached.transactions_count != len(table) or cached.holdings is None or len(cached.holdings) != coin_days:
+            cached.holdings = self._compute_holdings(table, coin_first_day, coin_days)
+            cached.transactions_count = len(table)
+        self._extend_rates(coin_tick, cached, coin_days)
+
+        rates = np.array([np.nan if x is None else float(x) for x in cached.rates[:coin_days]], dtype=np.float64)
+        holdings = np.concatenate((padding, cached.holdings))
+        values = np.concatenate((padding, cached.holdings * rates))
+        return holdings, values
+
+    def _extend_rates(self, coin_tick: str, cached: _CoinSeries, coin_days: int):
+        # Rates from today on may come from a candle that is still open, request them again
+        closed_days = (datetime.now(timezone.utc).date() - cached.first_day).days
+        del cached.rates[max(closed_days, 0):]
+        missing = coin_days - len(cached.rates)
+        if missing <= 0:
+            return None
+
+        start = cached.first_day + timedelta(days=len(cached.rates))
+        if coin_tick == self._return_fiat:
+            cached.rates.extend([Decimal(1)] * missing)
+            return None
+        try:
+            cached.rates.extend(self._get_daily_rates(coin_tick, self._return_fiat, start, missing))
+        except (KeyError, ValueError):
+            cached.rates.extend([None] * missing)
+
+    @staticmethod
+    def _first_day(table: TransactionTable) -> date:
+        return datetime.fromtimestamp(int(table.times[0]) / 1000, timezone.utc).date()
+
+    @staticmethod
+    def _compute_holdings(table: TransactionTable, first_day: date, days: int) -> np.ndarray:
+        """Quantity held at the end of every UTC day, as floats for plotting."""
+        day_ends = np.fromiter((epoch_ms(datetime.combine(first_day + timedelta(days=x + 1), datetime.min.time(),
+                                                          timezone.utc))
+                                for x in range(days)), dtype=np.int64, count=days)
+        quantities = table.quantities
+        if quantities.dtype != object and len(quantities) and \
+                int(np.abs(quantities).max()) > INT64_MAX // len(quantities):
+            quantities = quantities.astype(object)
+
+        cumulative = np.concatenate((np.zeros(1, dtype=quantities.dtype), np.cumsum(quantities)))
+        positions = np.searchsorted(table.times, day_ends, side='left')
+        return cumulative[positions].astype(np.float64) / 10 ** table.scale
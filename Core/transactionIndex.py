@@ -0,0 +1,196 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from heapq import merge
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .Dataclasses import Transaction
+from .transactionTable import epoch_ms
+
+
+def epoch_ms_of(transaction: Transaction) -> int:
+    return epoch_ms(transaction.UTC_Time)
+
+
+class _SortedTransactions:
+    """Transactions ordered by time, ties kept in insertion order."""
+
+    def __init__(self):
+        self.times: List[int] = []
+        self.transactions: List[Transaction] = []
+
+    def __len__(self):
+        return len(self.times)
+
+    def add(self, time: int, transaction: Transaction):
+        if not self.times or time >= self.times[-1]:
+            self.times.append(time)
+            self.transactions.append(transaction)
+        else:
+            position = bisect_right(self.times, time)
+            self.times.insert(position, time)
+            self.transactions.insert(position, transaction)
+
+    def extend(self, rows: List[Tuple[int, Transaction]]):
+        if not rows:
+            return None
+
+        in_order = all(rows[idx][0] <= rows[idx + 1][0] for idx in range(len(rows) - 1))
+        if in_order and (not self.times or rows[0][0] >= self.times[-1]):
+            self.times.extend(x[0] for x in rows)
+            self.transactions.extend(x[1] for x in rows)
+        elif len(rows) < 16:
+            for time, transaction in rows:
+                self.add(time, transaction)
+        else:
+            merged = sorted(list(zip(self.times, self.transactions)) + rows, key=lambda x: x[0])
+            self.times = [x[0] for x in merged]
+            self.transactions = [x[1] for x in merged]
+
+    def bounds(self, start: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+        low = 0 if start is None else bisect_left(self.times, start)
+        high = len(self.times) if end is None else bisect_left(self.times, end)
+        return low, high
+
+    def slice(self, start: Optional[int], end: Optional[int]) -> List[Transaction]:
+        low, high = self.bounds(start, end)
+        return self.transactions[low:high]
+
+    def rows(self, start: Optional[int], end: Optional[int]) -> Iterable[Tuple[int, Transaction]]:
+        low, high = self.bounds(start, end)
+        return zip(self.times[low:high], self.transactions[low:high])
+
+
+class TransactionIndex:
+    """Time ordered index of the transactions of the database.
+
+    Every coin keeps its transactions sorted by time, plus secondary indexes per operation type and per account, so
+    range queries are answered by bisection. Time ranges are half open, ``start <= UTC_Time < end``.
+    """
+
+    def __init__(self):
+        self._by_coin: Dict[str, _SortedTransactions] = {}
+        self._by_type: Dict[Tuple[str, Transaction.TransactionType], _SortedTransactions] = {}
+        self._by_account: Dict[Tuple[str, str], _SortedTransactions] = {}
+
+    def __len__(self):
+        return sum(len(x) for x in self._by_coin.values())
+
+    def add(self, transactions: [Transaction, Iterable[Transaction]]):
+        if isinstance(transactions, Transaction):
+            transactions = [transactions]
+
+        rows_by_coin = {}
+        rows_by_type = {}
+        rows_by_account = {}
+        for transaction in transactions:
+            row = (epoch_ms(transaction.UTC_Time), transaction)
+            coin_tick = transaction.coin.coin_info.tick
+            rows_by_coin.setdefault(coin_tick, []).append(row)
+            rows_by_type.setdefault((coin_tick, transaction.operation_type), []).append(row)
+            rows_by_account.setdefault((coin_tick, transaction.account), []).append(row)
+
+        for index, rows_by_key in ((self._by_coin, rows_by_coin), (self._by_type, rows_by_type),
+                                   (self._by_account, rows_by_account)):
+            for key, rows in rows_by_key.items():
+                self._get_bucket(index, key).extend(rows)
+
+    def remove_coin(self, coin_tick: str):
+        self._by_coin.pop(coin_tick, None)
+        for key in [x for x in self._by_type if x[0] == coin_tick]:
+            del self._by_type[key]
+        for key in [x for x in self._by_account if x[0] == coin_tick]:
+            del self._by_account[key]
+
+    def get_coin_list(self) -> List[str]:
+        return list(self._by_coin.keys())
+
+    def get_times(self, coin_tick: str) -> List[int]:
+        """Sorted epoch-ms times of all the transactions of a coin, aligned with ``query(coin_tick)``."""
+        try:
+            return self._by_coin[coin_tick].times
+        except KeyError:
+            return []
+
+    def position(self, coin_tick: str, date: datetime) -> int:
+        """Number of transactions of the coin at or before the date."""
+        return bisect_right(self.get_times(coin_tick), epoch_ms(date))
+
+    def get_range(self, coin_tick: str, low: int, high: int) -> List[Transaction]:
+        try:
+            return self._by_coin[coin_tick].transactions[low:high]
+        except KeyError:
+            return []
+
+    def query(self, coin_tick: Optional[str] = None,
+              types: Optional[Iterable[Transaction.TransactionType]] = None,
+              accounts: Optional[Iterable[str]] = None,
+              start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Transaction]:
+        start_ms = None if start is None else epoch_ms(start)
+        end_ms = None if end is None else epoch_ms(end)
+        types = None if types is None else tuple(types)
+        accounts = None if accounts is None else tuple(accounts)
+
+        if coin_tick is not None:
+            return self._query_coin(coin_tick, types, accounts, start_ms, end_ms)
+
+        per_coin = [self._query_coin(x, types, accounts, start_ms, end_ms) for x in self._by_coin]
+        return list(merge(*per_coin, key=epoch_ms_of))
+
+    def count(self, coin_tick: str, types: Optional[Iterable[Transaction.TransactionType]] = None,
+              start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+        start_ms = None if start is None else epoch_ms(start)
+        end_ms = None if end is None else epoch_ms(end)
+        if types is None:
+            buckets = [self._by_coin.get(coin_tick)]
+        else:
+            buckets = [self._by_type.get((coin_tick, x)) for x in types]
+        return self._range_size(buckets, start_ms, end_ms)
+
+    def _query_coin(self, coin_tick: str, types: Optional[Tuple], accounts: Optional[Tuple],
+                    start: Optional[int], end: Optional[int]) -> List[Transaction]:
+        if types is None and accounts is None:
+            bucket = self._by_coin.get(coin_tick)
+            return [] if bucket is None else bucket.slice(start, end)
+
+        type_buckets = None if types is None else [self._by_type.get((coin_tick, x)) for x in types]
+        account_buckets = None if accounts is None else [self._by_account.get((coin_tick, x)) for x in accounts]
+
+        if type_buckets is not None and account_buckets is not None:
+            # Read the smaller side of the range and filter it with the other attribute
+            if self._range_size(account_buckets, start, end) < self._range_size(type_buckets, start, end):
+                types_set = set(types)
+                return [x for x in self._merge_slices(account_buckets, start, end) if x.operation_type in types_set]
+            accounts_set = set(accounts)
+            return [x for x in self._merge_slices(type_buckets, start, end) if x.account in accounts_set]
+
+        return self._merge_slices(type_buckets if type_buckets is not None else account_buckets, start, end)
+
+    @staticmethod
+    def _range_size(buckets: List[Optional[_SortedTransactions]], start: Optional[int], end: Optional[int]) -> int:
+        total = 0
+        for bucket in buckets:
+            if bucket is not None:
+                low, high = bucket.bounds(start, end)
+                total += high - low
+        return total
+
+    @staticmethod
+    def _merge_slices(buckets: List[Optional[_SortedTransactions]], start: Optional[int],
+                      end: Optional[int]) -> List[Transaction]:
+        buckets = [x for x in buckets if x is not None]
+        if not buckets:
+            return []
+        if len(buckets) == 1:
+            return buckets[0].slice(start, end)
+        # merge is stable, so equal times keep the order of the requested buckets
+        return [x[1] for x in merge(*(x.rows(start, end) for x in buckets), key=itemgetter(0))]
+
+    @staticmethod
+    def _get_bucket(index: Dict, key) -> _SortedTransactions:
+        try:
+            return index[key]
+        except KeyError:
+            bucket = _SortedTransactions()
+            index[key] = bucket
+            return bucket
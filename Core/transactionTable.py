@@ -0,0 +1,139 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .Dataclasses import Transaction
+from .fixedPoint import DEFAULT_SCALE, FixedPointColumn
+
+
+def epoch_ms(date: datetime) -> int:
+    """Milliseconds since the epoch, naive times are UTC like the `UTC_Time` of the transactions."""
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return int(date.timestamp() * 1000)
+
+
+class TransactionTable:
+    """Columnar storage of the transactions of a single coin, ordered by time.
+
+    Quantities are kept in a `FixedPointColumn`, so reductions over them are exact and return the same `Decimal` a
+    loop over the transactions would.
+    """
+
+    _INITIAL_CAPACITY = 16
+
+    def __init__(self, scale: int = DEFAULT_SCALE):
+        self._size = 0
+        self._account_codes: Dict[str, int] = {}
+
+        self._times = np.empty(self._INITIAL_CAPACITY, dtype=np.int64)
+        self._types = np.empty(self._INITIAL_CAPACITY, dtype=np.int8)
+        self._accounts = np.empty(self._INITIAL_CAPACITY, dtype=np.int16)
+        self._transactions = np.empty(self._INITIAL_CAPACITY, dtype=object)
+        self._quantities = FixedPointColumn(scale)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def scale(self) -> int:
+        return self._quantities.scale
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._times[:self._size]
+
+    @property
+    def types(self) -> np.ndarray:
+        return self._types[:self._size]
+
+    @property
+    def accounts(self) -> np.ndarray:
+        return self._accounts[:self._size]
+
+    @property
+    def quantities(self) -> np.ndarray:
+        return self._quantities.values
+
+    def account_code(self, account: str) -> int:
+        try:
+            return self._account_codes[account]
+        except KeyError:
+            code = len(self._account_codes)
+            self._account_codes[account] = code
+            return code
+
+    def append(self, transaction: Transaction):
+        time = epoch_ms(transaction.UTC_Time)
+        self._ensure_capacity(self._size + 1)
+
+        size = self._size
+        position = int(np.searchsorted(self._times[:size], time, side='right'))
+        if position < size:
+            for column in self._columns():
+                column[position + 1:size + 1] = column[position:size]
+
+        self._times[position] = time
+        self._types[position] = transaction.operation_type.value
+        self._accounts[position] = self.account_code(transaction.account)
+        self._transactions[position] = transaction
+        self._quantities.insert(position, transaction.quantity)
+        self._size += 1
+
+    def extend(self, transactions: Iterable[Transaction]):
+        transactions = list(transactions)
+        if not transactions:
+            return None
+
+        times = np.fromiter((epoch_ms(x.UTC_Time) for x in transactions), dtype=np.int64, count=len(transactions))
+        self._ensure_capacity(self._size + len(transactions))
+
+        start = self._size
+        end = start + len(transactions)
+        self._times[start:end] = times
+        self._types[start:end] = [x.operation_type.value for x in transactions]
+        self._accounts[start:end] = [self.account_code(x.account) for x in transactions]
+        self._transactions[start:end] = transactions
+        self._quantities.extend(x.quantity for x in transactions)
+        self._size = end
+
+        in_order = start == 0 or self._times[start - 1] <= times[0]
+        if not (in_order and np.all(times[:-1] <= times[1:])):
+            order = np.argsort(self._times[:end], kind='stable')
+            for column in self._columns():
+                column[:end] = column[:end][order]
+            self._quantities.permute(order)
+
+    def mask(self, types: Optional[Iterable[Transaction.TransactionType]] = None,
+             accounts: Optional[Iterable[str]] = None) -> np.ndarray:
+        mask = np.ones(self._size, dtype=bool)
+        if types is not None:
+            mask &= np.isin(self.types, [x.value for x in types])
+        if accounts is not None:
+            codes = [self._account_codes[x] for x in accounts if x in self._account_codes]
+            mask &= np.isin(self.accounts, codes)
+        return mask
+
+    def get_transactions(self, mask: Optional[np.ndarray] = None) -> List[Transaction]:
+        transactions = self._transactions[:self._size]
+        if mask is not None:
+            transactions = transactions[mask]
+        return transactions.tolist()
+
+    def sum_quantity(self, mask: Optional[np.ndarray] = None) -> Decimal:
+        return self._quantities.sum(mask)
+
+    def _columns(self):
+        return self._times, self._types, self._accounts, self._transactions
+
+    def _ensure_capacity(self, required: int):
+        capacity = len(self._times)
+        if required <= capacity:
+            return None
+
+        while capacity < required:
+            capacity *= 2
+        self._times, self._types, self._accounts, self._transactions = \
+            (np.resize(column, capacity) for column in self._columns())
@@ -1,2 +1,13 @@
-from .cryptoApp import CryptoTrackerApp
-from .overviewContext import OverviewContext, LoadingContext
+# Imported when first used, so importing the package does not load Qt
+_EXPORTS = {'CryptoTrackerApp': '.cryptoApp', 'OverviewContext': '.overviewContext',
+            'LoadingContext': '.overviewContext'}
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    # The contexts import cryptoApp, which imports them back, it has to be imported first
+    import_module('.cryptoApp', __name__)
+    return getattr(import_module(module_name, __name__), name)
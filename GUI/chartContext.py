@@ -0,0 +1,231 @@
+import logging
+from typing import Callable, Dict, Optional
+
+import numpy as np
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtCore import QPointF, QRectF, Qt
+from PyQt5.QtGui import QPainter, QPen, QPolygonF
+
+from . import cryptoApp
+from .textProperties import TextProperties
+from Core.downsampling import LevelOfDetailSeries
+from Core.timeSeries import PortfolioValueSeries
+
+logger = logging.getLogger(__name__)
+
+
+class ChartWidget(QtWidgets.QWidget):
+    """Line chart of a `LevelOfDetailSeries`, zoomed with the wheel and panned dragging with the mouse.
+
+    Every repaint asks the series for at most two points per pixel of the visible range, so the cost of drawing does
+    not depend on the length of the history.
+    """
+
+    MARGIN = 40
+    POINTS_PER_PIXEL = 2
+    ZOOM_STEP = 1.25
+    NO_DATA_TEXT = 'No data'
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(400, 250)
+        self._series: Optional[LevelOfDetailSeries] = None
+        self._message = self.NO_DATA_TEXT
+        self._unit = ''
+        self._start = 0.
+        self._end = 1.
+        self._drag_x: Optional[float] = None
+
+    def set_series(self, series: LevelOfDetailSeries, unit: str = ''):
+        self._series = series
+        self._unit = unit
+        self.reset_view()
+
+    def set_message(self, message: str):
+        """Text shown in place of the line while there is no series to draw."""
+        self._message = message
+        self.update()
+
+    def reset_view(self):
+        if self._series is not None and len(self._series):
+            self._start = float(self._series.x[0])
+            self._end = float(max(self._series.x[-1], self._series.x[0] + 1))
+        self.update()
+
+    def _plot_rect(self) -> QRectF:
+        # Room for the longest value label at the left
+        left = self.fontMetrics().horizontalAdvance(f"-8.88888e+88 {self._unit}") + 8
+        return QRectF(left, self.MARGIN / 2, max(self.width() - left - self.MARGIN / 2, 1),
+                      max(self.height() - self.MARGIN * 1.5, 1))
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = self._plot_rect()
+        painter.drawRect(rect)
+        if self._series is None or not len(self._series):
+            painter.drawText(rect, Qt.AlignCenter, self._message if self._series is None else self.NO_DATA_TEXT)
+            return None
+
+        x, y = self._series.get(self._start, self._end, int(rect.width()) * self.POINTS_PER_PIXEL)
+        if not len(x):
+            return None
+        low, high = float(y.min()), float(y.max())
+        if high == low:
+            high = low + 1
+
+        scale_x = rect.width() / (self._end - self._start)
+        scale_y = rect.height() / (high - low)
+        pixels_x = rect.left() + (x.astype(np.float64) - self._start) * scale_x
+        pixels_y = rect.bottom() - (y - low) * scale_y
+        painter.setClipRect(rect)
+        painter.setPen(QPen(Qt.darkBlue, 1.5))
+        painter.drawPolyline(QPolygonF([QPointF(px, py) for px, py in zip(pixels_x, pixels_y)]))
+        painter.setClipping(False)
+
+        painter.setPen(Qt.black)
+        painter.drawText(QRectF(0, rect.top() - 8, rect.left() - 4, 16), Qt.AlignRight,
+                         f"{high:.6g} {self._unit}")
+        painter.drawText(QRectF(0, rect.bottom() - 8, rect.left() - 4, 16), Qt.AlignRight,
+                         f"{low:.6g} {self._unit}")
+        painter.drawText(QRectF(rect.left(), rect.bottom() + 4, 120, 16), Qt.AlignLeft, self._format_x(self._start))
+        painter.drawText(QRectF(rect.right() - 120, rect.bottom() + 4, 120, 16), Qt.AlignRight,
+                         self._format_x(self._end))
+
+    @staticmethod
+    def _format_x(value: float) -> str:
+        return str(np.datetime64(int(value), 'D'))
+
+    def wheelEvent(self, event):
+        rect = self._plot_rect()
+        factor = 1 / self.ZOOM_STEP if event.angleDelta().y() > 0 else self.ZOOM_STEP
+        # Zoom around the day under the cursor
+        anchor = self._start + (event.pos().x() - rect.left()) / rect.width() * (self._end - self._start)
+        span = max((self._end - self._start) * factor, 1.)
+        ratio = (anchor - self._start) / (self._end - self._start)
+        self._start = anchor - span * ratio
+        self._end = self._start + span
+        self.update()
+
+    def mousePressEvent(self, event):
+        self._drag_x = event.pos().x()
+
+    def mouseMoveEvent(self, event):
+        if self._drag_x is None:
+            return None
+        shift = (self._drag_x - event.pos().x()) / self._plot_rect().width() * (self._end - self._start)
+        self._start += shift
+        self._end += shift
+        self._drag_x = event.pos().x()
+        self.update()
+
+    def mouseReleaseEvent(self, event):
+        self._drag_x = None
+
+    def mouseDoubleClickEvent(self, event):
+        self.reset_view()
+
+
+class ValueSeriesLoader(QtCore.QThread):
+    """Gets the value series in the background, the daily prices it needs may be requested to the exchange."""
+
+    loaded = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal()
+
+    def __init__(self, get_value_series: Callable[[], PortfolioValueSeries], parent=None):
+        super().__init__(parent)
+        self._get_value_series = get_value_series
+
+    def run(self):
+        try:
+            value_series = self._get_value_series()
+        except Exception:
+            logger.exception("Could not load the value series")
+            self.failed.emit()
+            return None
+        self.loaded.emit(value_series)
+
+
+class ChartContext:
+    """Daily value of the portfolio, or of one of its coins, in the base fiat.
+
+    The chart shows a placeholder until a `ValueSeriesLoader` has the value series, so the window stays responsive
+    while the missing prices are requested.
+    """
+
+    PORTFOLIO = 'Portfolio'
+    LOADING_TEXT = 'Loading...'
+    NOT_AVAILABLE_TEXT = 'Not available'
+
+    def __init__(self, layout):
+        self._layout = layout
+        self._widget_list = []
+        self._value_series: Optional[PortfolioValueSeries] = None
+        self._series: Dict[str, LevelOfDetailSeries] = {}
+        self._chart: Optional[ChartWidget] = None
+        self._selector: Optional[QtWidgets.QComboBox] = None
+        self._loader: Optional[ValueSeriesLoader] = None
+
+    def create_contents(self):
+        app = cryptoApp.get_instance()
+        back_button = QtWidgets.QPushButton('Back')
+        back_button.clicked.connect(app.show_overview)
+        self._widget_list.append(back_button)
+        header = QtWidgets.QLabel('History')
+        header.setFont(TextProperties.title_font())
+        self._widget_list.append(header)
+
+        self._selector = QtWidgets.QComboBox()
+        self._selector.addItem(self.PORTFOLIO)
+        self._selector.setEnabled(False)
+        self._widget_list.append(self._selector)
+
+        self._chart = ChartWidget()
+        self._chart.set_message(self.LOADING_TEXT)
+        self._widget_list.append(self._chart)
+
+        # Owned by the application, so leaving the context while it runs does not destroy the thread
+        self._loader = ValueSeriesLoader(app.get_value_series, app)
+        self._loader.loaded.connect(self._on_value_series_loaded)
+        self._loader.failed.connect(self._on_value_series_failed)
+        self._loader.finished.connect(self._loader.deleteLater)
+
+    def _on_value_series_loaded(self, value_series: PortfolioValueSeries):
+        self._loader = None
+        self._value_series = value_series
+        self._selector.addItems(sorted(value_series.values))
+        self._selector.currentTextChanged.connect(self._select)
+        self._selector.setEnabled(True)
+        self._select(self._selector.currentText())
+
+    def _on_value_series_failed(self):
+        self._loader = None
+        self._chart.set_message(self.NOT_AVAILABLE_TEXT)
+
+    def _get_series(self, name: str) -> LevelOfDetailSeries:
+        # Each series keeps the levels of detail already computed while the context is open
+        series = self._series.get(name)
+        if series is None:
+            values = self._value_series.total if name == self.PORTFOLIO else self._value_series.values[name]
+            series = LevelOfDetailSeries(self._value_series.days.astype(np.int64), values)
+            self._series[name] = series
+        return series
+
+    def _select(self, name: str):
+        self._chart.set_series(self._get_series(name), self._value_series.fiat)
+
+    def show(self):
+        for widget in self._widget_list:
+            self._layout.addWidget(widget)
+        self._layout.addStretch()
+        if self._loader is not None and not self._loader.isRunning():
+            self._loader.start()
+
+    def hide(self):
+        if self._loader is not None:
+            # The series can't be interrupted while it is computed, it is dropped when it arrives
+            self._loader.loaded.disconnect(self._on_value_series_loaded)
+            self._loader.failed.disconnect(self._on_value_series_failed)
+            self._loader = None
+        for widget in self._widget_list:
+            widget.hide()
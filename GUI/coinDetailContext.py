@@ -0,0 +1,84 @@
+from typing import List, Tuple
+
+from PyQt5 import QtWidgets
+
+from . import cryptoApp
+from .textProperties import TextProperties
+from .table import Table, RowItem
+from Core.Dataclasses import BuyTransactionData
+
+
+class BuyTransactionItem(RowItem):
+    _MONEY_COLUMNS = (2, 3, 5, 6, 8)
+    _QUANTITY_COLUMNS = (1, 4)
+    _PERCENTAGE_COLUMN = 7
+
+    def __init__(self, buy_transaction: BuyTransactionData):
+        super(BuyTransactionItem, self).__init__(BuyTransactionData, self._collect_data(buy_transaction))
+
+    def get_columns_names(self) -> Tuple:
+        return ('Date', 'Quantity', 'Cost per unit', 'Cost', 'Current quantity', 'Current value', 'Unrealized gains',
+                'Unrealized change', 'Realized gains')
+
+    def get_display(self, column: int) -> str:
+        value = self[column]
+        if column == 0:
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        if column in self._QUANTITY_COLUMNS:
+            return self._format_decimal(value)
+        if column in self._MONEY_COLUMNS:
+            return self._format_decimal(value, cryptoApp.get_instance().get_base_fiat())
+        if column == self._PERCENTAGE_COLUMN:
+            return f"{value:.2%}"
+        return super().get_display(column)
+
+    @staticmethod
+    def _collect_data(buy_transaction: BuyTransactionData) -> Tuple:
+        return (buy_transaction.transaction.UTC_Time,
+                buy_transaction.transaction.quantity,
+                buy_transaction.cost_per_unit,
+                buy_transaction.cost,
+                buy_transaction.current_quantity,
+                buy_transaction.unrealized_total_value,
+                buy_transaction.unrealized_gains,
+                buy_transaction.unrealized_gains_change_percentage,
+                buy_transaction.realized_gains)
+
+
+class CoinDetailContext:
+    """Buy lots of a coin.
+
+    The lots are frozen a page at a time when the table is scrolled to them, so coins with many lots open at once.
+    """
+
+    PAGE_SIZE = 200
+
+    def __init__(self, layout, coin_tick: str):
+        self._layout = layout
+        self._coin_tick = coin_tick
+        self._widget_list = []
+
+    def create_contents(self):
+        app = cryptoApp.get_instance()
+        lots_count = app.count_lots(self._coin_tick)
+
+        back_button = QtWidgets.QPushButton('Back')
+        back_button.clicked.connect(app.show_overview)
+        self._widget_list.append(back_button)
+        header = QtWidgets.QLabel(f"{self._coin_tick} - {lots_count} buy lots")
+        header.setFont(TextProperties.title_font())
+        self._widget_list.append(header)
+        self._widget_list.append(Table.paged(self._fetch_lots, lots_count, self.PAGE_SIZE, BuyTransactionItem))
+
+    def _fetch_lots(self, start: int, count: int) -> List[BuyTransactionItem]:
+        lots = cryptoApp.get_instance().get_lots(self._coin_tick, start, count)
+        return [BuyTransactionItem(x) for x in lots]
+
+    def show(self):
+        for widget in self._widget_list:
+            self._layout.addWidget(widget)
+        self._layout.addStretch()
+
+    def hide(self):
+        for widget in self._widget_list:
+            widget.hide()
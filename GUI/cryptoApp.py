@@ -1,48 +1,58 @@
 import os
-import json
-from typing import Optional
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Optional
 from PyQt5 import QtWidgets, QtCore
 
 from API.CSVReader import BinanceCSVReader
 from Core.CoinAPIExternal import BinanceAPI
+from Core.config import Config
+from Core.Dataclasses import BuyTransactionData, CoinData
 from Core.database import DataBaseAPI, TransactionValidator
+from Core.interestAggregator import InterestAggregator
+from Core.metrics import MetricsRegistry
+from Core.timeSeries import PortfolioValueSeries
+from GUI.chartContext import ChartContext
+from GUI.coinDetailContext import CoinDetailContext
 from GUI.overviewContext import OverviewContext
+from GUI.workers import ProcessingRunner, RevaluationScheduler
 
-class MyQThread(QtCore.QThread):
-
-    on_update = QtCore.pyqtSignal(str)
-    on_complete = QtCore.pyqtSignal(int)
-
-    def __init__(self, target, parent=None):
-        super(MyQThread, self).__init__(parent)
-        # You can change variables defined here after initialization - but before calling start()
-        self.completionMessage = "done."
-        self._target = target
-        self._update_method = lambda x: self.on_update.emit(x)
-
-    def run(self):
-        self._target(self._update_method)
-        self.on_complete.emit(0)
+logger = logging.getLogger(__name__)
 
 
 class CryptoTrackerApp(QtWidgets.QApplication):
+    PRICE_POOL_WORKERS = 4
 
     def __init__(self, *args, **kwargs):
         super(CryptoTrackerApp, self).__init__(*args, **kwargs)
         self._config = self._read_config()
+        self._metrics = MetricsRegistry()
         self._externalAPI = BinanceAPI(self._config.get_config_value('keys_path'),
-                                       self._config.get_config_value('cache_folder'))
+                                       self._config.get_config_value('cache_folder'), metrics=self._metrics)
         self._db = DataBaseAPI.create_new_database(self._config.get_config_value('database_name'))
         self._base_fiat = 'EUR'
-        self._db_api = DataBaseAPI(self._db, self._externalAPI, self._base_fiat, now_precision=DataBaseAPI.Precision.H1)
+        self._db_api = DataBaseAPI(self._db, self._externalAPI, self._base_fiat, now_precision=DataBaseAPI.Precision.H1,
+                                   metrics=self._metrics)
         self._validator = TransactionValidator(self._db_api, self._config.get_config_value('duplicate_whitelist'))
+        self._interest_aggregator = InterestAggregator()
+        # Shared by every processing worker, bounds the price requests running at the same time
+        self._price_pool = ThreadPoolExecutor(self.PRICE_POOL_WORKERS, thread_name_prefix='prices')
+        self._processing = ProcessingRunner(self._db_api, self._price_pool, self)
+        self._processing.coin_processed.connect(self._coin_updated)
+        self._processing.finished_processing.connect(self._done_process)
+        self._processing.failed.connect(self._failed_process)
+        self._revaluation = RevaluationScheduler(self._db_api, self._price_pool, self._processing.is_running, self)
+        self._revaluation.coin_revalued.connect(self._coin_updated)
+        self.aboutToQuit.connect(self._shutdown)
 
     def create_contents(self):
         self.main_window = Window()
         self.main_window.show()
+        self._processing.status.connect(self.main_window.update_status_bar)
 
-    def activate_context(self, context_cls):
-        self.main_window.activate_context(context_cls)
+    def activate_context(self, context_cls, *args, **kwargs):
+        self.main_window.activate_context(context_cls, *args, **kwargs)
 
     def show(self):
         self.main_window.show()
@@ -55,7 +65,21 @@ class CryptoTrackerApp(QtWidgets.QApplication):
         data_path = self._config.get_config_value('csv_folder')
         transaction_list = BinanceCSVReader.import_directory(data_path)
         new_transactions = self._validator.validate_and_parse_transactions(transaction_list)
+        if self._config.get_config_value('aggregate_interest', False):
+            new_transactions = self._interest_aggregator.aggregate(new_transactions)
+        # The coins can't be processed while their transactions change, they are added once the workers stopped
+        # and the processing starts again with the new ones
+        was_processing = self._processing.is_running()
+        was_revaluing = self._revaluation.is_active()
+        self._revaluation.stop(then=lambda: self._processing.cancel(
+            then=partial(self._add_transactions, new_transactions, was_processing, was_revaluing)))
+
+    def _add_transactions(self, new_transactions, was_processing: bool, was_revaluing: bool):
         self._db_api.add_transaction(new_transactions)
+        if was_processing:
+            self._processing.start()
+        elif was_revaluing:
+            self._revaluation.start()
 
     def get_base_fiat(self):
         return self._base_fiat
@@ -63,44 +87,61 @@ class CryptoTrackerApp(QtWidgets.QApplication):
     def get_coin_data(self, coin_symbol):
         return self._db_api.get_coin_data(coin_symbol)
 
+    def count_lots(self, coin_symbol) -> int:
+        return self._db_api.count_lots(coin_symbol)
+
+    def get_lots(self, coin_symbol, start: int, count: int) -> List[BuyTransactionData]:
+        return self._db_api.get_lots(coin_symbol, start, count)
+
     def process_coin_data(self, coin_symbol):
         self._db_api.process_coin_data(coin_symbol)
 
+    def get_processing(self) -> ProcessingRunner:
+        return self._processing
+
     def process_all_coin_data(self):
-        process_coins_thread = MyQThread(self._db_api.process_all_coins_data)
-        process_coins_thread.start()
-        process_coins_thread.on_update.connect(self.main_window.update_status_bar)
-        process_coins_thread.on_complete.connect(self._done_process)
+        self._processing.start()
 
-    def _done_process(self, return_code):
-        if return_code == 0:
+    def _done_process(self, cancelled: bool):
+        if not cancelled:
             self.main_window.update_status_bar("Done.")
-            self._show_all_data()
-        else:
-            self.main_window.update_status_bar("Error.")
-
-    def _show_all_data(self):
-        print("Showing all data")
+            self.show_overview()
+            self._revaluation.start()
+
+    def _coin_updated(self, coin_tick: str, coin_data: CoinData):
+        # Coins processed or revalued are shown as soon as they are published
+        context = self.main_window.currentContext
+        if hasattr(context, 'update_coin_data'):
+            context.update_coin_data(coin_tick, coin_data)
+
+    def _failed_process(self, message: str):
+        self.main_window.update_status_bar(f"Error. {message}")
+
+    def _shutdown(self):
+        self._revaluation.stop()
+        self._processing.cancel()
+        self._revaluation.wait()
+        self._processing.wait()
+        self._price_pool.shutdown(cancel_futures=True)
+
+    def show_overview(self):
+        logger.debug("Showing all data")
         self.activate_context(OverviewContext)
 
-    def get_list_all_coins(self):
-        return self._db_api.get_coin_list()
-
+    def show_coin_detail(self, coin_symbol: str):
+        self.activate_context(CoinDetailContext, coin_symbol)
 
-class Config:
+    def show_chart(self):
+        self.activate_context(ChartContext)
 
-    def __init__(self, config_path):
-        self._config_path = config_path
-        with open(config_path) as f:
-            self._config_data = json.load(f)
+    def get_value_series(self) -> PortfolioValueSeries:
+        return self._db_api.get_value_series()
 
-    def get_config_value(self, name):
-        return self._config_data[name]
+    def get_list_all_coins(self):
+        return self._db_api.get_coin_list()
 
-    def update_config_value(self, name, value):
-        self._config_data[name] = value
-        with open(self._config_path, 'w') as f:
-            json.dump(self._config_data, self._config_path)
+    def get_metrics(self) -> MetricsRegistry:
+        return self._metrics
 
 
 class Window(QtWidgets.QMainWindow):
@@ -1,6 +1,7 @@
-from typing import Tuple
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
 
-from PyQt5 import QtWidgets
+from PyQt5 import QtCore, QtWidgets
 from PyQt5.QtCore import QSize
 
 from . import cryptoApp
@@ -8,50 +9,159 @@ from .textProperties import TextProperties
 from .table import Table, RowItem
 from Core.Dataclasses import CoinData
 
+logger = logging.getLogger(__name__)
 
-class CoinDataItem(RowItem):
 
-    def __init__(self, coin_data: CoinData):
+class CoinDataItem(RowItem):
+    LOADING_TEXT = 'Loading...'
+    NOT_AVAILABLE_TEXT = 'Not available'
+
+    def __init__(self, coin_data: Optional[CoinData], coin_tick: Optional[str] = None):
+        super(CoinDataItem, self).__init__(CoinData)
+        self._coin_data = None
+        self.coin_tick = coin_tick if coin_data is None else coin_data.coin.coin_info.tick
+        self._failed = False
+        self._collected_data = (coin_tick, None, None)
+        if coin_data is None:
+            self.extend(self._collected_data)
+        else:
+            self.set_coin_data(coin_data)
+
+    @classmethod
+    def loading(cls, coin_tick: str) -> 'CoinDataItem':
+        """Placeholder row of a coin whose data is not ready yet, filled later by `set_coin_data`."""
+        return cls(None, coin_tick)
+
+    def set_coin_data(self, coin_data: CoinData):
         self._coin_data = coin_data
         self._collected_data = self._collect_data(coin_data)
-        super(CoinDataItem, self).__init__(CoinData, self._collected_data)
+        self[:] = self._collected_data
+
+    def set_failed(self):
+        self._failed = True
 
     def get_columns_names(self) -> Tuple:
         return 'Coin', 'Total Quantity', 'Total value'
 
+    def get_display(self, column: int) -> str:
+        if self._coin_data is None and column > 0:
+            return self.NOT_AVAILABLE_TEXT if self._failed else self.LOADING_TEXT
+        value = self[column]
+        if column == 1 and value is not None:
+            return self._format_decimal(value)
+        if column == 2 and value is not None:
+            return self._format_decimal(value, cryptoApp.get_instance().get_base_fiat())
+        return super().get_display(column)
+
     def _collect_data(self, coin_data: CoinData) -> Tuple:
-        fiat_name = cryptoApp.get_instance().get_base_fiat()
         return (self._get_coin_name(coin_data),
-                self._format_decimal(coin_data.spot_quantity + coin_data.earn_quantity),
-                self._format_decimal(coin_data.current_total_value, fiat_name))
+                coin_data.spot_quantity + coin_data.earn_quantity,
+                coin_data.current_total_value)
 
     def _get_coin_name(self, coin_data):
         coin_info = coin_data.coin.coin_info
         return f"{coin_info.tick}({coin_info.name})"
 
 
+class CoinDataLoader(QtCore.QThread):
+    """Gets the data of the coins one by one in the background, in the given order."""
+
+    coin_loaded = QtCore.pyqtSignal(int, object)
+    coin_failed = QtCore.pyqtSignal(int)
+
+    def __init__(self, coins: List[str], get_coin_data: Callable[[str], CoinData], parent=None):
+        super().__init__(parent)
+        self._coins = coins
+        self._get_coin_data = get_coin_data
+
+    def run(self):
+        for idx, coin in enumerate(self._coins):
+            if self.isInterruptionRequested():
+                return None
+            try:
+                coin_data = self._get_coin_data(coin)
+            except Exception:
+                # The other coins are still loaded
+                logger.exception("Could not load the data of %s", coin)
+                self.coin_failed.emit(idx)
+                continue
+            self.coin_loaded.emit(idx, coin_data)
+
+
 class OverviewContext:
+    """Table with a row per coin.
+
+    The table is shown at once with placeholder rows, and every row is filled when a `CoinDataLoader` has the data of
+    its coin, so the window stays responsive while the current values are computed.
+    """
 
     def __init__(self, layout):
         self._layout = layout
         self._widget_list = []
+        self._items: List[CoinDataItem] = []
+        self._items_by_coin: Dict[str, CoinDataItem] = {}
+        self._table: Optional[Table] = None
+        self._loader: Optional[CoinDataLoader] = None
 
     def create_contents(self):
         _header = QtWidgets.QLabel('Overview')
         _header.setFont(TextProperties.title_font())
         self._widget_list.append(_header)
+        chart_button = QtWidgets.QPushButton('History chart')
+        chart_button.clicked.connect(cryptoApp.get_instance().show_chart)
+        self._widget_list.append(chart_button)
         self._widget_list.append(self._create_coin_info_rows())
 
     def _create_coin_info_rows(self):
         app = cryptoApp.get_instance()
-        return Table([CoinDataItem(app.get_coin_data(coin)) for coin in app.get_list_all_coins()])
+        coins = app.get_list_all_coins()
+        self._items = [CoinDataItem.loading(coin) for coin in coins]
+        self._items_by_coin = {coin: item for coin, item in zip(coins, self._items)}
+        self._table = Table(self._items, CoinDataItem)
+        self._table.row_activated.connect(self._on_row_activated)
+        # Owned by the application, so leaving the context while it runs does not destroy the thread
+        self._loader = CoinDataLoader(coins, app.get_coin_data, app)
+        self._loader.coin_loaded.connect(self._on_coin_loaded)
+        self._loader.coin_failed.connect(self._on_coin_failed)
+        self._loader.finished.connect(self._loader.deleteLater)
+        return self._table
+
+    def _on_coin_loaded(self, idx: int, coin_data: CoinData):
+        item = self._items[idx]
+        item.set_coin_data(coin_data)
+        self._table.row_changed(item)
+
+    def _on_row_activated(self, item: CoinDataItem):
+        cryptoApp.get_instance().show_coin_detail(item.coin_tick)
+
+    def update_coin_data(self, coin_tick: str, coin_data: CoinData):
+        """Shows new data of a coin, like its revalued current value."""
+        item = self._items_by_coin.get(coin_tick)
+        if item is not None:
+            item.set_coin_data(coin_data)
+            self._table.row_changed(item)
+
+    def _on_coin_failed(self, idx: int):
+        item = self._items[idx]
+        item.set_failed()
+        self._table.row_changed(item)
 
     def show(self):
         for widget in self._widget_list:
             self._layout.addWidget(widget)
         self._layout.addStretch()
+        if self._loader is not None and not self._loader.isRunning():
+            self._loader.start()
 
     def hide(self):
+        if self._loader is not None:
+            # The coin being loaded is dropped when it arrives, the rest are skipped
+            self._loader.coin_loaded.disconnect(self._on_coin_loaded)
+            self._loader.coin_failed.disconnect(self._on_coin_failed)
+            self._loader.requestInterruption()
+            if not self._loader.isRunning():
+                self._loader.deleteLater()
+            self._loader = None
         for widget in self._widget_list:
             widget.hide()
 
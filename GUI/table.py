@@ -1,10 +1,15 @@
-from typing import List, Iterable
+from typing import Callable, Dict, List, Iterable, Optional
 
 from PyQt5 import QtWidgets
-from PyQt5.QtCore import QSize, Qt
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QSize, Qt, pyqtSignal
 
 
 class RowItem(list):
+    """Values of a table row, one per column.
+
+    The values are kept as they are and only formatted by `get_display` when the view shows their cell, sorting uses
+    `get_sort_key` so numbers are not compared as text.
+    """
 
     def __init__(self, dataclass_type, *args, **kwargs):
         super(RowItem, self).__init__(*args, **kwargs)
@@ -22,25 +27,162 @@ class RowItem(list):
     def get_columns_num(self):
         return len(self)
 
+    def get_display(self, column: int) -> str:
+        value = self[column]
+        return '' if value is None else str(value)
+
+    def get_sort_key(self, column: int):
+        return self[column]
+
+
+class RowTableModel(QAbstractTableModel):
+    """Model of `RowItem` rows, all of the same type, for `Table`."""
+
+    def __init__(self, rows: List[RowItem], fixed_type=None, parent=None):
+        super().__init__(parent)
+        self._fixed_type = fixed_type
+        self._rows: List[RowItem] = []
+        # Row of every item by identity, rebuilt when the rows move
+        self._positions: Optional[Dict[int, int]] = None
+        self._columns_names = ()
+        self._columns_count = 0
+        self.add_rows(rows)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._columns_count
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        row_item = self._rows[index.row()]
+        if index.column() >= row_item.get_columns_num():
+            return None
+        return row_item.get_display(index.column())
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole):
+        if role != Qt.DisplayRole or orientation != Qt.Horizontal or section >= len(self._columns_names):
+            return None
+        return self._columns_names[section]
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable if index.isValid() else Qt.NoItemFlags
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.AscendingOrder):
+        # The view asks for column -1 when sorting is enabled without a sort indicator
+        if column < 0:
+            return None
+        self.layoutAboutToBeChanged.emit()
+        # Rows without a value in the column stay at the end in both orders
+        rows = []
+        missing = []
+        for row_item in self._rows:
+            if column < row_item.get_columns_num() and row_item.get_sort_key(column) is not None:
+                rows.append(row_item)
+            else:
+                missing.append(row_item)
+        rows.sort(key=lambda x: x.get_sort_key(column), reverse=order == Qt.DescendingOrder)
+        self._rows = rows + missing
+        self._positions = None
+        self.layoutChanged.emit()
+
+    def get_row(self, row: int) -> RowItem:
+        return self._rows[row]
+
+    def row_changed(self, row_item: RowItem):
+        """Repaints the row of an item whose values were updated in place."""
+        if self._positions is None:
+            self._positions = {id(x): idx for idx, x in enumerate(self._rows)}
+        row = self._positions.get(id(row_item))
+        if row is not None:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self._columns_count - 1))
+
+    def add_rows(self, rows: Iterable[RowItem]):
+        rows = list(rows)
+        if not rows:
+            return None
+        self._check_row_item_type(rows[0])
+
+        columns_count = max(self._columns_count, max(x.get_columns_num() for x in rows))
+        if columns_count > self._columns_count:
+            self.beginInsertColumns(QModelIndex(), self._columns_count, columns_count - 1)
+            self._columns_count = columns_count
+            self.endInsertColumns()
+        if not self._columns_names:
+            self._columns_names = tuple(rows[0].get_columns_names())
+            self.headerDataChanged.emit(Qt.Horizontal, 0, columns_count - 1)
+
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(rows) - 1)
+        self._rows.extend(rows)
+        self._positions = None
+        self.endInsertRows()
+
+    def _check_row_item_type(self, row_item: RowItem):
+        # All the rows of a batch come from the same place, checking the first one is enough
+        if self._fixed_type is None:
+            self._fixed_type = type(row_item)
+        if not isinstance(row_item, self._fixed_type):
+            raise TypeError(f"Rows of {self._fixed_type.__name__} expected, got {type(row_item).__name__}")
+
+
+class PagedRowTableModel(RowTableModel):
+    """Model getting its rows a page at a time from `fetch_rows(start, count)` as the view scrolls to them.
+
+    Only the rows already fetched are known, so it can't be sorted.
+    """
+
+    def __init__(self, fetch_rows: Callable[[int, int], List[RowItem]], total_rows: int, page_size: int = 200,
+                 fixed_type=None, parent=None):
+        self._fetch_rows = fetch_rows
+        self._total_rows = total_rows
+        self._page_size = page_size
+        super().__init__(fetch_rows(0, min(page_size, total_rows)) if total_rows else [], fixed_type, parent)
 
-class Table(QtWidgets.QTableWidget):
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and self.rowCount() < self._total_rows
 
-    def __init__(self, children: List[RowItem], fixed_type=None):
+    def fetchMore(self, parent: QModelIndex = QModelIndex()):
+        if not self.canFetchMore(parent):
+            return None
+        start = self.rowCount()
+        self.add_rows(self._fetch_rows(start, min(self._page_size, self._total_rows - start)))
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.AscendingOrder):
+        pass
+
+
+class Table(QtWidgets.QTableView):
+    """Read only sortable table of `RowItem` rows.
+
+    Cells are formatted by the model only when they are painted, so large tables are created without building an item
+    per cell. Column widths are measured on the first rows only. `row_activated` gives the row double clicked.
+    """
+
+    RESIZE_CONTENTS_PRECISION = 200
+
+    row_activated = pyqtSignal(object)
+
+    def __init__(self, children: List[RowItem], fixed_type=None, model: Optional[RowTableModel] = None):
         super().__init__()
         self.verticalHeader().setVisible(False)
-        self.current_row_count = 0
-        self.current_columns_count = 0
-        self.last_row = 0
+        self.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
         header = self.horizontalHeader()
+        header.setResizeContentsPrecision(self.RESIZE_CONTENTS_PRECISION)
         header.setSectionResizeMode(QtWidgets.QHeaderView.ResizeToContents)
-        self._fixed_type = fixed_type
-        self._assert_row_item_type(children)
-        self._children = children
-        self._update_table_size()
-
-        self.setHorizontalHeaderLabels(self._children[0].get_columns_names())
-        for current_child in children:
-            self._add_row(current_child)
+        self._model = model if model is not None else RowTableModel(children, fixed_type, self)
+        self.setModel(self._model)
+        # Keep the rows in their original order until a column is clicked
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+        self.setSortingEnabled(not isinstance(self._model, PagedRowTableModel))
+        self.doubleClicked.connect(self._on_double_clicked)
+
+    @classmethod
+    def paged(cls, fetch_rows: Callable[[int, int], List[RowItem]], total_rows: int, page_size: int = 200,
+              fixed_type=None) -> 'Table':
+        """Table of `total_rows` rows got from `fetch_rows(start, count)` only when they are scrolled to."""
+        return cls([], fixed_type, PagedRowTableModel(fetch_rows, total_rows, page_size, fixed_type))
 
     def sizeHint(self):
         horizontal = self.horizontalHeader()
@@ -49,28 +191,18 @@ class Table(QtWidgets.QTableWidget):
         return QSize(horizontal.length() + vertical.width() + frame,
                      vertical.length() + horizontal.height() + frame)
 
-    def _assert_row_item_type(self, children):
-        if self._fixed_type is None:
-            self._fixed_type = type(children)
-
-        assert all(isinstance(current_child, self._fixed_type) for current_child in children)
+    def get_row(self, row: int) -> Optional[RowItem]:
+        if 0 <= row < self._model.rowCount():
+            return self._model.get_row(row)
+        return None
 
-    def _update_table_size(self):
-        self.current_row_count = len(self._children)
-        self.current_columns_count = max(child.get_columns_num() for child in self._children)
-        self.setRowCount(self.current_row_count)
-        self.setColumnCount(self.current_columns_count)
+    def add_rows(self, rows: Iterable[RowItem]):
+        self._model.add_rows(rows)
 
-    def _add_row(self, row_item: RowItem):
-        for idx, item in enumerate(row_item):
-            item = QtWidgets.QTableWidgetItem(item)
-            item.setFlags(Qt.ItemIsEditable)
-            self.setItem(self.last_row, idx, item)
-        self.last_row += 1
+    def _on_double_clicked(self, index: QModelIndex):
+        row_item = self.get_row(index.row())
+        if row_item is not None:
+            self.row_activated.emit(row_item)
 
-    def add_rows(self, rows: Iterable[RowItem]):
-        self._assert_row_item_type(rows)
-        self._children.extend(rows)
-        self._update_table_size()
-        for row_item in rows:
-            self._add_row(row_item)
+    def row_changed(self, row_item: RowItem):
+        self._model.row_changed(row_item)
@@ -0,0 +1,230 @@
+import logging
+from contextlib import closing
+from concurrent.futures import Executor, wait
+from functools import partial
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from PyQt5 import QtCore
+
+from Core.Dataclasses import CoinData
+from Core.database import DataBaseAPI
+
+logger = logging.getLogger(__name__)
+
+
+class CoinProcessingWorker(QtCore.QThread):
+    """Processes coins in the background and publishes the data of each one as soon as it is ready.
+
+    Cancelling is cooperative, the coins being processed stop at their next stage without being published and the
+    rest are skipped. The worker finishes only when none of its coins is running. The coins are processed
+    in `pool` when given, which can be shared with other workers to bound the price requests running at the same time.
+    """
+
+    coin_processed = QtCore.pyqtSignal(str, CoinData)
+    progress = QtCore.pyqtSignal(int, int)
+    status = QtCore.pyqtSignal(str)
+    failed = QtCore.pyqtSignal(str)
+    finished_processing = QtCore.pyqtSignal(bool)
+
+    def __init__(self, db_api: DataBaseAPI, coins: Optional[List[str]] = None, pool: Optional[Executor] = None,
+                 parent=None):
+        super().__init__(parent)
+        self._db_api = db_api
+        self._coins = coins
+        self._pool = pool
+
+    def cancel(self):
+        self.requestInterruption()
+
+    def is_cancelled(self) -> bool:
+        return self.isInterruptionRequested()
+
+    def run(self):
+        coins = self._coins if self._coins is not None else self._db_api.get_coin_list()
+        number_of_coins = len(coins)
+        processed = 0
+        try:
+            # Closing waits for the coins still running in the pool, none is left when the worker finishes
+            with closing(self._db_api.process_coins(coins, self._pool, self.is_cancelled)) as processing:
+                for coin_tick, coin_data in processing:
+                    processed += 1
+                    self.coin_processed.emit(coin_tick, coin_data)
+                    self.progress.emit(processed, number_of_coins)
+                    self.status.emit(f"Processed coin {coin_tick}, {processed}/{number_of_coins}")
+        except Exception as error:
+            logger.exception("Processing of the coins failed")
+            self.failed.emit(str(error))
+            return None
+        self.finished_processing.emit(self.is_cancelled())
+
+
+class ProcessingRunner(QtCore.QObject):
+    """Runs one `CoinProcessingWorker` at a time and forwards its signals.
+
+    Starting again cancels the running worker and the new one starts when the old one finished, so the signals can be
+    connected once and a restart, after new transactions are imported, is a single call. Nothing waits on the GUI
+    thread, the coins still running in the pool finish in the background.
+    """
+
+    coin_processed = QtCore.pyqtSignal(str, CoinData)
+    progress = QtCore.pyqtSignal(int, int)
+    status = QtCore.pyqtSignal(str)
+    failed = QtCore.pyqtSignal(str)
+    finished_processing = QtCore.pyqtSignal(bool)
+
+    def __init__(self, db_api: DataBaseAPI, pool: Optional[Executor] = None, parent=None):
+        super().__init__(parent)
+        self._db_api = db_api
+        self._pool = pool
+        self._worker: Optional[CoinProcessingWorker] = None
+        # Workers cancelled that did not finish yet
+        self._stopping: List[CoinProcessingWorker] = []
+        # Called once no cancelled worker is running
+        self._when_stopped: List[Callable[[], None]] = []
+        self._pending_start = None
+
+    def is_running(self) -> bool:
+        """Whether a worker is running, or a cancelled one still has coins running."""
+        return self._pending_start is not None or bool(self._stopping) or \
+            (self._worker is not None and self._worker.isRunning())
+
+    def start(self, coins: Optional[List[str]] = None):
+        """Cancels the running worker and starts a new one for `coins` as soon as the old one finished."""
+        self._pending_start = (coins,)
+        self.cancel(self._start_pending)
+
+    def cancel(self, then: Optional[Callable[[], None]] = None) -> bool:
+        """Cancels the running worker without waiting for it, returns whether there was one.
+
+        `then` is called on the GUI thread once no cancelled worker has coins running."""
+        worker = self._worker
+        self._worker = None
+        running = worker is not None and worker.isRunning()
+        if running:
+            worker.cancel()
+            self._stopping.append(worker)
+        elif worker is not None:
+            worker.deleteLater()
+        if then is not None:
+            self._when_stopped.append(then)
+            self._run_when_stopped()
+        return running
+
+    def wait(self):
+        """Blocks until every worker finished, only for the shutdown of the application."""
+        for worker in [self._worker] + self._stopping:
+            if worker is not None:
+                worker.cancel()
+                worker.wait()
+
+    def _run_when_stopped(self):
+        while self._when_stopped and not self._stopping:
+            self._when_stopped.pop(0)()
+
+    def _on_worker_finished(self, worker: CoinProcessingWorker):
+        if worker in self._stopping:
+            self._stopping.remove(worker)
+            worker.deleteLater()
+            self._run_when_stopped()
+
+    def _start_pending(self):
+        # Several starts while a worker was stopping start a single worker, for the last coins
+        if self._pending_start is None:
+            return None
+        coins, = self._pending_start
+        self._pending_start = None
+        worker = CoinProcessingWorker(self._db_api, coins, self._pool, self)
+        for name in ('coin_processed', 'progress', 'status', 'failed', 'finished_processing'):
+            getattr(worker, name).connect(partial(self._forward, worker, getattr(self, name)))
+        worker.finished.connect(partial(self._on_worker_finished, worker))
+        self._worker = worker
+        worker.start()
+
+    def _forward(self, worker: CoinProcessingWorker, signal, *args):
+        # Signals of a cancelled worker still queued are dropped
+        if worker is self._worker:
+            signal.emit(*args)
+
+
+class RevaluationScheduler(QtCore.QObject):
+    """Revalues the open positions at the start of every `DataBaseAPI` precision bucket.
+
+    Each time the current rates can change, one bulk rate request is done in `pool` and only the coins whose rate
+    changed are published. Buckets starting while `is_busy` returns True, like while the coins are being processed,
+    are skipped.
+    """
+
+    # Margin after the bucket boundary so the new bucket has started on every clock
+    MARGIN_MS = 1000
+
+    coin_revalued = QtCore.pyqtSignal(str, CoinData)
+    failed = QtCore.pyqtSignal(str)
+    _revaluation_done = QtCore.pyqtSignal()
+
+    def __init__(self, db_api: DataBaseAPI, pool: Executor, is_busy: Callable[[], bool] = lambda: False,
+                 parent=None):
+        super().__init__(parent)
+        self._db_api = db_api
+        self._pool = pool
+        self._is_busy = is_busy
+        self._pending = None
+        self._active = False
+        # Called once the revaluation in progress when stopping is done
+        self._when_stopped: List[Callable[[], None]] = []
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._on_timeout)
+        self._revaluation_done.connect(self._on_revaluation_done)
+
+    def is_active(self) -> bool:
+        return self._active
+
+    def start(self):
+        self._active = True
+        self._schedule()
+
+    def stop(self, then: Optional[Callable[[], None]] = None):
+        """Stops the scheduling without waiting for a revaluation in progress.
+
+        `then` is called on the GUI thread once no revaluation is running."""
+        self._active = False
+        self._timer.stop()
+        if then is None:
+            return None
+        if self._pending is not None and not self._pending.done():
+            self._when_stopped.append(then)
+        else:
+            then()
+
+    def wait(self):
+        """Blocks until the revaluation in progress is done, only for the shutdown of the application."""
+        if self._pending is not None:
+            wait([self._pending])
+
+    def _on_revaluation_done(self):
+        while self._when_stopped:
+            self._when_stopped.pop(0)()
+        self._schedule()
+
+    def _schedule(self):
+        if not self._active:
+            return None
+        wait = self._db_api.get_next_revaluation_time() - datetime.now()
+        self._timer.start(max(int(wait.total_seconds() * 1000), 0) + self.MARGIN_MS)
+
+    def _on_timeout(self):
+        if self._is_busy() or (self._pending is not None and not self._pending.done()):
+            self._schedule()
+            return None
+        self._pending = self._pool.submit(self._revalue)
+
+    def _revalue(self):
+        try:
+            for coin_tick, coin_data in self._db_api.revalue_open_positions().items():
+                self.coin_revalued.emit(coin_tick, coin_data)
+        except Exception as error:
+            logger.exception("Revaluation of the open positions failed")
+            self.failed.emit(str(error))
+        finally:
+            self._revaluation_done.emit()
@@ -0,0 +1,67 @@
+"""Keep one processed portfolio in memory and answer the queries of every local tool.
+
+Run from the repository root with ``python -m Service --config config.json --port 8765``. The transactions are imported
+and processed once at start, with the config of the command line, and the open positions are revalued in the
+background. Clients use ``Service.client.ServiceClient``.
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m Service', description=__doc__.splitlines()[0])
+    parser.add_argument('--config', type=Path, default=Path('config.json'))
+    parser.add_argument('--csv-folder', type=Path, help="Overrides csv_folder of the config")
+    parser.add_argument('--cache-folder', type=Path, help="Overrides cache_folder of the config")
+    parser.add_argument('--fiat', default='EUR')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=0, help="Coins processed at the same time")
+    parser.add_argument('--aggregate-interest', action=argparse.BooleanOptionalAction,
+                        help="Fold the interest payments of a day, taken from the config by default")
+    parser.add_argument('--verbose', '-v', action='store_true')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr,
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    from CLI.pipeline import load_database
+    from Core.config import Config
+    from Core.database import TransactionValidator
+    from Core.metrics import MetricsRegistry
+    from .server import DataService, ServiceServer
+
+    try:
+        db_api = load_database(Config(args.config), args.csv_folder, args.cache_folder, args.fiat,
+                               args.aggregate_interest, MetricsRegistry())
+    except TransactionValidator.ValidationError as error:
+        print(error.report, file=sys.stderr)
+        return 1
+
+    service = DataService(db_api)
+    if args.workers > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(args.workers, thread_name_prefix='prices') as executor:
+            service.process(executor)
+    else:
+        service.process()
+    service.start_revaluation()
+
+    server = ServiceServer(service, args.host, args.port)
+    logger.info("Serving %d coins on %s", len(db_api.get_coin_list()), server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
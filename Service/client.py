@@ -0,0 +1,78 @@
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+
+class ServiceClient:
+    """Thin client of a running data service, see `Service.server`.
+
+    Only the standard library is used, so scripts and dashboards start without the dependencies of the database. The
+    answers are kept with their ETag and asked again with If-None-Match, so an answer that did not change since the
+    last call is not sent again. Decimals come as text, like in the command line reports.
+    """
+
+    class ServiceError(RuntimeError):
+
+        def __init__(self, status: int, message: str):
+            super().__init__(f"{status}: {message}")
+            self.status = status
+
+    def __init__(self, url: str = 'http://127.0.0.1:8765', timeout: float = 30.):
+        self._url = url.rstrip('/')
+        self._timeout = timeout
+        self._responses: Dict[str, Tuple[str, object]] = {}
+        self._lock = threading.Lock()
+
+    def get_coin_list(self) -> List[str]:
+        return self._get('/coins')['coins']
+
+    def get_return_fiat(self) -> str:
+        return self._get('/coins')['fiat']
+
+    def get_coin_data(self, coin_tick: str) -> Dict[str, Optional[str]]:
+        return self._get(f"/coins/{coin_tick}")
+
+    def get_lots(self, coin_tick: str, start: int = 0, count: Optional[int] = None, full: bool = False) -> List[Dict]:
+        return self.get_lots_page(coin_tick, start, count, full)['lots']
+
+    def count_lots(self, coin_tick: str) -> int:
+        return self.get_lots_page(coin_tick, 0, 0)['total']
+
+    def get_lots_page(self, coin_tick: str, start: int = 0, count: Optional[int] = None, full: bool = False) -> Dict:
+        query = f"start={start}" + (f"&count={count}" if count is not None else '') + ('&full=true' if full else '')
+        return self._get(f"/coins/{coin_tick}/lots?{query}")
+
+    def get_metrics(self) -> Dict:
+        return self._request(Request(self._url + '/metrics'))[1]
+
+    def revalue(self) -> List[str]:
+        return self._request(Request(self._url + '/revalue', method='POST'))[1]['revalued']
+
+    def _get(self, path: str):
+        with self._lock:
+            cached = self._responses.get(path)
+        request = Request(self._url + path)
+        if cached is not None:
+            request.add_header('If-None-Match', cached[0])
+        etag, data = self._request(request)
+        if data is None:
+            return cached[1]
+        if etag is not None:
+            with self._lock:
+                self._responses[path] = (etag, data)
+        return data
+
+    def _request(self, request: Request) -> Tuple[Optional[str], object]:
+        try:
+            with urlopen(request, timeout=self._timeout) as response:
+                return response.headers.get('ETag'), json.load(response)
+        except HTTPError as error:
+            if error.code == 304:
+                return error.headers.get('ETag'), None
+            try:
+                message = json.load(error).get('error', error.reason)
+            except ValueError:
+                message = error.reason
+            raise self.ServiceError(error.code, message) from None
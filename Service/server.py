@@ -0,0 +1,265 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import fields
+from datetime import datetime
+from decimal import Decimal
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from CLI.report import coin_report_row
+from Core.Dataclasses import BuyTransactionData
+from Core.database import CoinSnapshot, DataBaseAPI
+
+logger = logging.getLogger(__name__)
+
+
+def _to_json_value(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def lot_to_dict(lot: BuyTransactionData) -> Dict:
+    """JSON friendly values of a frozen buy lot, Decimals as text."""
+    data = {'id': lot.transaction.id, 'time': lot.transaction.UTC_Time.isoformat(),
+            'quantity': str(lot.transaction.quantity), 'account': lot.transaction.account}
+    for field in fields(lot):
+        if field.name not in ('transaction', 'amortized'):
+            data[field.name] = _to_json_value(getattr(lot, field.name))
+    if lot.amortized is not None:
+        data['amortized'] = [{'quantity': str(x.quantity), 'total_value': str(x.total_value)} for x in lot.amortized]
+    return data
+
+
+class ResponseCache:
+    """Encoded responses of the current data version, the least recently used are dropped past `max_entries`.
+
+    Every change of the data starts a new version and drops the responses of the previous one.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self._max_entries = max_entries
+        self._responses: 'OrderedDict[str, Tuple[bytes, int]]' = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def new_version(self) -> int:
+        with self._lock:
+            self._version += 1
+            self._responses.clear()
+            return self._version
+
+    def get(self, key: str) -> Optional[Tuple[bytes, int]]:
+        """Encoded response of `key` and its version."""
+        with self._lock:
+            response = self._responses.get(key)
+            if response is not None:
+                self._responses.move_to_end(key)
+            return response
+
+    def put(self, key: str, version: int, body: bytes):
+        with self._lock:
+            # A response built while the data changed belongs to the previous version
+            if version != self._version:
+                return None
+            self._responses[key] = (body, version)
+            if len(self._responses) > self._max_entries:
+                self._responses.popitem(last=False)
+
+
+class DataService:
+    """Owns a processed `DataBaseAPI` and answers the queries of the service clients.
+
+    Requests read the published snapshots of the coins without locking, only the processing and the revaluations
+    wait for each other. The answers are cached until the data changes, after the processing or when a revaluation
+    changes the rate of a coin. Open positions are revalued in the background at the
+    start of every precision bucket of the database.
+    """
+
+    # Margin after the bucket boundary so the new bucket has started on every clock
+    REVALUATION_MARGIN_SECONDS = 1.
+
+    class NotFound(KeyError):
+        pass
+
+    class NotProcessed(KeyError):
+        pass
+
+    def __init__(self, db_api: DataBaseAPI, cache: Optional[ResponseCache] = None):
+        self._db_api = db_api
+        self._lock = threading.RLock()
+        self._cache = cache if cache is not None else ResponseCache()
+        self._stop = threading.Event()
+        self._revaluation_thread: Optional[threading.Thread] = None
+
+    @property
+    def cache(self) -> ResponseCache:
+        return self._cache
+
+    @property
+    def metrics(self):
+        return self._db_api.metrics
+
+    def process(self, executor=None):
+        with self._lock:
+            for coin_tick, _ in self._db_api.process_coins(executor=executor):
+                logger.debug("Processed %s", coin_tick)
+            self._cache.new_version()
+
+    def revalue(self) -> List[str]:
+        """Revalues the open positions now, returns the coins whose rate changed."""
+        with self._lock:
+            revalued = list(self._db_api.revalue_open_positions())
+            if revalued:
+                self._cache.new_version()
+        return revalued
+
+    def start_revaluation(self):
+        self._stop.clear()
+        self._revaluation_thread = threading.Thread(target=self._revaluation_loop, name='revaluation', daemon=True)
+        self._revaluation_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._revaluation_thread is not None:
+            self._revaluation_thread.join()
+            self._revaluation_thread = None
+
+    def _revaluation_loop(self):
+        while True:
+            wait = (self._db_api.get_next_revaluation_time() - datetime.now()).total_seconds()
+            if self._stop.wait(max(wait, 0) + self.REVALUATION_MARGIN_SECONDS):
+                return None
+            try:
+                self.revalue()
+            except Exception:
+                logger.exception("Revaluation of the open positions failed")
+
+    def cached_response(self, key: str, build) -> Tuple[bytes, int]:
+        """Encoded answer of `build()` for the request `key` and the version it belongs to."""
+        response = self._cache.get(key)
+        if response is not None:
+            self.metrics.increment('service_cache.hit')
+            return response
+        self.metrics.increment('service_cache.miss')
+        version = self._cache.version
+        body = json.dumps(build()).encode()
+        self._cache.put(key, version, body)
+        return body, version
+
+    def get_coin_list(self) -> Dict:
+        return {'fiat': self._db_api.get_return_fiat(), 'coins': self._db_api.get_coin_list()}
+
+    def get_coin_data(self, coin_tick: str) -> Dict:
+        return coin_report_row(coin_tick, self._get_snapshot(coin_tick).get_coin_data())
+
+    def get_lots(self, coin_tick: str, start: int = 0, count: Optional[int] = None, full: bool = False) -> Dict:
+        snapshot = self._get_snapshot(coin_tick)
+        return {'coin': coin_tick, 'total': snapshot.count_lots(), 'start': start,
+                'lots': [lot_to_dict(x) for x in snapshot.get_lots(start, count, full)]}
+
+    def _get_snapshot(self, coin_tick: str) -> CoinSnapshot:
+        """Published snapshot of a coin, the total and the page of the lots are read from the same one."""
+        if coin_tick not in self._db_api.get_coin_list():
+            raise self.NotFound(coin_tick)
+        try:
+            return self._db_api.get_snapshot(coin_tick)
+        except KeyError:
+            # Listed coins are published once the processing reaches them
+            raise self.NotProcessed(coin_tick) from None
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """JSON API of a `DataService`.
+
+    GET ``/coins``, ``/coins/<coin>``, ``/coins/<coin>/lots?start=&count=&full=`` and ``/metrics``, POST
+    ``/revalue``. Cached answers carry the data version as ETag, a request with a matching If-None-Match gets an
+    empty 304. Errors are JSON with an ``error`` message, 404 for an unknown coin and 503 for a coin that is not
+    processed yet.
+    """
+
+    server: 'ServiceServer'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [x for x in url.path.split('/') if x]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        service = self.server.service
+        try:
+            if parts == ['metrics']:
+                return self._send_json(service.metrics.to_dict())
+            if parts == ['coins']:
+                return self._send_cached(self.path, service.get_coin_list)
+            if len(parts) == 2 and parts[0] == 'coins':
+                return self._send_cached(self.path, lambda: service.get_coin_data(parts[1]))
+            if len(parts) == 3 and parts[0] == 'coins' and parts[2] == 'lots':
+                start = int(query.get('start', 0))
+                count = int(query['count']) if 'count' in query else None
+                full = query.get('full', 'false').lower() in ('1', 'true')
+                return self._send_cached(self.path, lambda: service.get_lots(parts[1], start, count, full))
+        except DataService.NotFound as error:
+            return self._send_error(HTTPStatus.NOT_FOUND, f"Unknown coin {error.args[0]}")
+        except DataService.NotProcessed as error:
+            return self._send_error(HTTPStatus.SERVICE_UNAVAILABLE, f"Coin {error.args[0]} is being processed")
+        except ValueError as error:
+            return self._send_error(HTTPStatus.BAD_REQUEST, str(error))
+        except Exception:
+            logger.exception("Request %s failed", self.path)
+            return self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal error")
+        self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path {url.path}")
+
+    def do_POST(self):
+        if urlsplit(self.path).path.strip('/') != 'revalue':
+            return self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path {self.path}")
+        self._send_json({'revalued': self.server.service.revalue()})
+
+    def _send_cached(self, key: str, build):
+        body, version = self.server.service.cached_response(key, build)
+        etag = f'"{version}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return None
+        self._send_body(HTTPStatus.OK, body, etag)
+
+    def _send_json(self, data, status: HTTPStatus = HTTPStatus.OK):
+        self._send_body(status, json.dumps(data).encode())
+
+    def _send_error(self, status: HTTPStatus, message: str):
+        self._send_json({'error': message}, status)
+
+    def _send_body(self, status: HTTPStatus, body: bytes, etag: Optional[str] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s " + format, self.address_string(), *args)
+
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, service: DataService, host: str = '127.0.0.1', port: int = 8765):
+        super().__init__((host, port), ServiceRequestHandler)
+        self.service = service
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
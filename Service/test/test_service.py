@@ -0,0 +1,93 @@
+import threading
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict
+from unittest import TestCase
+
+from Core.CoinAPIExternal import APIBase
+from Core.Dataclasses import ProtoTransaction
+from Core.database import DataBaseAPI, TransactionValidator
+from ..client import ServiceClient
+from ..server import DataService, ServiceServer
+
+
+class ConstantRatesAPI(APIBase):
+
+    def __init__(self, rates: Dict[str, Decimal]):
+        self.rates = rates
+
+    def get_conversion_rate(self, first: str, second: str, date: datetime = None) -> Decimal:
+        return self.rates[first]
+
+
+class TestDataService(TestCase):
+
+    def setUp(self):
+        self.external_api = ConstantRatesAPI({'BTC': Decimal(10), 'ETH': Decimal(2)})
+        self.db_api = db_api = DataBaseAPI(DataBaseAPI.create_new_database('service'), self.external_api)
+        time = datetime(2021, 1, 1)
+        proto_list = [ProtoTransaction(Decimal(1), 'BTC', ProtoTransaction.TransactionType.BUY, time, 'test'),
+                      ProtoTransaction(Decimal(2), 'BTC', ProtoTransaction.TransactionType.BUY, time.replace(day=2),
+                                       'test'),
+                      ProtoTransaction(Decimal(5), 'ETH', ProtoTransaction.TransactionType.BUY, time, 'test')]
+        db_api.add_transaction(TransactionValidator(db_api).validate_and_parse_transactions(proto_list))
+
+        self.service = DataService(db_api)
+        self.service.process()
+        self.server = ServiceServer(self.service, port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        self.client = ServiceClient(self.server.url)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_queries(self):
+        assert self.client.get_coin_list() == ['BTC', 'ETH']
+        assert self.client.get_return_fiat() == 'EUR'
+        assert self.client.get_coin_data('BTC')['spot_quantity'] == '3'
+        assert self.client.get_coin_data('ETH')['current_total_value'] == '10'
+
+        assert self.client.count_lots('BTC') == 2
+        lots = self.client.get_lots('BTC', 1, 1, full=True)
+        assert [x['quantity'] for x in lots] == ['2']
+        assert lots[0]['amortized'] == []
+        assert 'amortized' not in self.client.get_lots('BTC')[0]
+
+    def test_unknown_coin(self):
+        for query in (lambda: self.client.get_coin_data('DOGE'), lambda: self.client.get_lots('DOGE')):
+            with self.assertRaises(ServiceClient.ServiceError) as context:
+                query()
+            assert context.exception.status == 404
+            assert 'DOGE' in str(context.exception)
+
+    def test_coin_not_processed_yet(self):
+        proto = ProtoTransaction(Decimal(3), 'DOGE', ProtoTransaction.TransactionType.BUY, datetime(2021, 1, 3), 'test')
+        self.db_api.add_transaction(TransactionValidator(self.db_api).validate_and_parse_transactions([proto]))
+        assert 'DOGE' in self.client.get_coin_list()
+
+        for query in (lambda: self.client.get_coin_data('DOGE'), lambda: self.client.count_lots('DOGE')):
+            with self.assertRaises(ServiceClient.ServiceError) as context:
+                query()
+            assert context.exception.status == 503
+            assert 'DOGE' in str(context.exception)
+
+        self.external_api.rates['DOGE'] = Decimal(1)
+        self.service.process()
+        assert self.client.get_coin_data('DOGE')['spot_quantity'] == '3'
+
+    def test_responses_are_cached_until_the_data_changes(self):
+        metrics = self.service.metrics
+        first = self.client.get_coin_data('BTC')
+        assert ServiceClient(self.server.url).get_coin_data('BTC') == first
+        assert self.client.get_coin_data('BTC') == first
+        assert metrics.get_counter('service_cache.miss') == 1
+        assert metrics.get_counter('service_cache.hit') == 2
+
+        self.external_api.rates['BTC'] = Decimal(20)
+        assert self.client.revalue() == ['BTC', 'ETH']
+        assert self.client.revalue() == []
+        assert self.client.get_coin_data('BTC')['current_total_value'] == '60'
+        assert metrics.get_counter('service_cache.miss') == 2
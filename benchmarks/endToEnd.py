@@ -0,0 +1,142 @@
+"""Time every stage of importing and processing a synthetic Binance export.
+
+Run from the repository root with ``python -m benchmarks.endToEnd --coins 20 --days 730 --output results.json``.
+Each stage records its wall time and, unless ``--no-memory`` is given, its peak traced memory. Results are written as
+JSON so runs on different commits can be compared.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+
+from API.CSVReader import BinanceCSVReader
+from Core.CoinAPIExternal import BinanceAPI
+from Core.database import DataBaseAPI, TransactionValidator
+from Core.fakeBinance import FakeBinanceClient
+from Core.metrics import MetricsRegistry
+
+from .fixedPointAggregates import DeterministicPriceAPI
+from .syntheticPortfolio import FIAT, PortfolioSpec, coin_names, write_export
+
+
+class StageTimer:
+
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield
+        result = {'seconds': time.perf_counter() - start}
+        if self.trace_memory:
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1] - memory_before
+        self.stages[name] = result
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def _create_external_api(prices: str, spec: PortfolioSpec, cache_folder: Path, metrics: MetricsRegistry):
+    if prices == 'formula':
+        return DeterministicPriceAPI(), None
+    symbols = [(x, FIAT) for x in coin_names(spec.coins)] + [('USDT', FIAT)]
+    client = FakeBinanceClient(symbols)
+    cache_folder.mkdir()
+    return BinanceAPI(None, cache_folder, client=client, metrics=metrics), client
+
+
+def run(spec: PortfolioSpec, prices: str = 'formula', trace_memory: bool = True) -> dict:
+    timer = StageTimer(trace_memory)
+    metrics = MetricsRegistry()
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            folder = Path(folder)
+            with timer.stage('generate_export'):
+                files = write_export(folder / 'export', spec)
+            external_api, client = _create_external_api(prices, spec, folder / 'cache', metrics)
+
+            with timer.stage('import_directory'):
+                proto_transactions = BinanceCSVReader.import_directory(folder / 'export')
+
+            api = DataBaseAPI(DataBaseAPI.create_new_database('benchmark'), external_api, FIAT, metrics=metrics)
+            with timer.stage('validate_and_parse_transactions'):
+                transactions = TransactionValidator(api).validate_and_parse_transactions(proto_transactions)
+
+            with timer.stage('add_transaction'):
+                api.add_transaction(transactions)
+
+            with timer.stage('process_all_coins_data'):
+                api.process_all_coins_data()
+
+            with timer.stage('get_coin_data_full'):
+                for coin_tick in api.get_coin_list():
+                    api.get_coin_data(coin_tick, full=True)
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    result = {
+        'benchmark': 'endToEnd',
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'spec': {**asdict(spec), 'start': spec.start.isoformat()},
+        'prices': prices,
+        'files': len(files),
+        'transactions': len(transactions),
+        'stages': timer.stages,
+        'metrics': metrics.to_dict(),
+    }
+    if client is not None:
+        result['requests'] = {'count': client.request_count, 'weight': client.used_weight,
+                              'by_endpoint': dict(client.requests_by_endpoint)}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--coins', type=int, default=10)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--buy-every-days', type=int, default=7)
+    parser.add_argument('--no-interest', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--prices', choices=('formula', 'fake-binance'), default='formula',
+                        help="formula prices every time directly, fake-binance goes through BinanceAPI and its cache")
+    parser.add_argument('--no-memory', action='store_true', help="skip tracemalloc, it slows the stages down")
+    parser.add_argument('--output', type=Path, help="JSON file to write, printed to stdout by default")
+    args = parser.parse_args(argv)
+
+    spec = PortfolioSpec(coins=args.coins, days=args.days, buy_every_days=args.buy_every_days,
+                         interest=not args.no_interest, seed=args.seed)
+    result = run(spec, args.prices, not args.no_memory)
+
+    text = json.dumps(result, indent=2)
+    if args.output is None:
+        sys.stdout.write(text + '\n')
+    else:
+        args.output.write_text(text + '\n')
+        for name, stage in result['stages'].items():
+            print(f"{name}: {stage['seconds']:.3f} s")
+
+
+if __name__ == '__main__':
+    main()
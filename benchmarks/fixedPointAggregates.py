@@ -0,0 +1,95 @@
+"""Compare the Decimal and the fixed-point computation of the CoinData aggregates.
+
+Run from the repository root with ``python -m benchmarks.fixedPointAggregates``. Both the rates of direct pairs and
+the rates of inverse pairs, 1 / price with every digit of the Decimal context, are measured.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from Core.CoinAPIExternal import APIBase
+from Core.Dataclasses import ProtoTransaction
+from Core.database import DataBaseAPI, TransactionValidator
+
+AGGREGATES = ('_get_current_average_cost', '_get_total_costs', '_get_total_current_cost',
+              '_get_total_unrealized_gains', '_get_current_total_value', '_get_total_realized_gains',
+              '_get_total_realized_value')
+
+
+class DeterministicPriceAPI(APIBase):
+
+    def get_conversion_rate(self, first: str, second: str, date: datetime) -> Decimal:
+        minutes = int(date.timestamp()) // 60
+        return Decimal(20000 + minutes % 5000) + Decimal(minutes % 997).scaleb(-4)
+
+
+class InversePairPriceAPI(DeterministicPriceAPI):
+    """Rates read from the inverse pair, like `BinanceAPI` does for the pairs Binance only lists the other way."""
+
+    def get_conversion_rate(self, first: str, second: str, date: datetime) -> Decimal:
+        return Decimal(1) / (super().get_conversion_rate(first, second, date) / 10 ** 8)
+
+
+RATES = {'direct': DeterministicPriceAPI, 'inverse': InversePairPriceAPI}
+
+
+def _create_transactions(number_of_buys: int, seed: int):
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    protos = []
+    for idx in range(number_of_buys):
+        date = start + timedelta(minutes=idx * 7)
+        protos.append(ProtoTransaction(Decimal(rng.randint(1, 10 ** 8)).scaleb(-8), 'BTC',
+                                       ProtoTransaction.TransactionType.BUY, date, 'Spot'))
+        if idx % 4 == 3:
+            protos.append(ProtoTransaction(-Decimal(rng.randint(1, 10 ** 8)).scaleb(-8), 'BTC',
+                                           ProtoTransaction.TransactionType.SELL, date + timedelta(minutes=1),
+                                           'Spot'))
+    return protos
+
+
+def _process(protos, use_fixed_point: bool, price_api: APIBase):
+    api = DataBaseAPI(DataBaseAPI.create_new_database('benchmark'), price_api)
+    api.USE_FIXED_POINT_ENGINE = use_fixed_point
+    api.COMPUTE_FEES_QUANTITIES = False
+    api.COMPUTE_EARNINGS = False
+    api.add_transaction(TransactionValidator(api).validate_and_parse_transactions(protos))
+    api.process_coin_data('BTC')
+    return api._get_coin_data('BTC')
+
+
+def _time_aggregates(coin_data, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [getattr(coin_data, name)() for name in AGGREGATES]
+    return (time.perf_counter() - start) / repeat, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lots', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rates', nargs='+', choices=list(RATES), default=list(RATES))
+    args = parser.parse_args(argv)
+
+    protos = _create_transactions(args.lots, args.seed)
+    print(f"Lots: {args.lots}")
+    for rates in args.rates:
+        decimal_time, decimal_results = _time_aggregates(_process(protos, False, RATES[rates]()), args.repeat)
+        fixed_time, fixed_results = _time_aggregates(_process(protos, True, RATES[rates]()), args.repeat)
+
+        for name, expected, result in zip(AGGREGATES, decimal_results, fixed_results):
+            if str(expected) != str(result):
+                raise AssertionError(f"{rates} rates, {name}: Decimal {expected} != fixed point {result}")
+
+        print(f"{rates.capitalize()} pair rates")
+        print(f"  Decimal aggregates:     {decimal_time * 1000:.2f} ms")
+        print(f"  Fixed-point aggregates: {fixed_time * 1000:.2f} ms")
+        print(f"  Speedup: {decimal_time / fixed_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
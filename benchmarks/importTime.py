@@ -0,0 +1,122 @@
+"""Time the import of every package and entry point in a fresh interpreter.
+
+Run from the repository root with ``python -m benchmarks.importTime --repeat 5 --output imports.json``. Every import
+runs ``--repeat`` times in its own process, the median wall time is kept together with the heavy dependencies the
+import loaded and the slowest modules reported by ``-X importtime``. Results are written as JSON so runs on different
+commits can be compared, ``--check`` fails when an import loads a dependency it should not.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from .endToEnd import _commit
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_DEPENDENCIES = ('numpy', 'pandas', 'binance', 'PyQt5')
+
+# Import and the heavy dependencies it is allowed to load
+TARGETS: Dict[str, Tuple[str, ...]] = {
+    'Core': ('numpy',),
+    'Core.database': ('numpy',),
+    'Core.CoinAPIExternal': ('numpy',),
+    'API': ('numpy',),
+    'CLI.__main__': (),
+    'CLI.report': ('numpy',),
+    'Service.client': (),
+    'Service.server': ('numpy',),
+    'GUI': (),
+    'GUI.cryptoApp': ('numpy', 'PyQt5'),
+}
+
+_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(seconds, ','.join(x for x in {heavy!r} if x in sys.modules))
+"""
+
+
+def _parse_importtime(stderr: str, top: int) -> List[Dict]:
+    # Lines are "import time: self [us] | cumulative | imported package", the first one is the header
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue
+        modules.append({'module': fields[2].strip(), 'self_seconds': self_us / 1e6,
+                        'cumulative_seconds': cumulative_us / 1e6})
+    modules.sort(key=lambda x: x['self_seconds'], reverse=True)
+    return modules[:top]
+
+
+def measure(module: str, repeat: int, top: int) -> Dict:
+    script = _SCRIPT.format(module=module, heavy=HEAVY_DEPENDENCIES)
+    times = []
+    loaded: List[str] = []
+    slowest: List[Dict] = []
+    for idx in range(repeat):
+        # The last run also reports the time of every module, it is slower so it is not timed
+        command = [sys.executable] + (['-X', 'importtime'] if idx == repeat - 1 else []) + ['-c', script]
+        output = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True)
+        seconds, loaded_text = (output.stdout.strip().split(' ') + [''])[:2]
+        if idx < repeat - 1 or repeat == 1:
+            times.append(float(seconds))
+        loaded = [x for x in loaded_text.split(',') if x]
+        if idx == repeat - 1:
+            slowest = _parse_importtime(output.stderr, top)
+    return {'seconds': statistics.median(times), 'min_seconds': min(times), 'loaded': loaded,
+            'unexpected': [x for x in loaded if x not in TARGETS.get(module, HEAVY_DEPENDENCIES)],
+            'slowest': slowest}
+
+
+def run(modules: List[str], repeat: int = 5, top: int = 5) -> dict:
+    return {
+        'benchmark': 'importTime',
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'imports': {x: measure(x, repeat, top) for x in modules},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=list(TARGETS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5, help="slowest modules kept for every import")
+    parser.add_argument('--check', action='store_true', help="exit with 1 if an import loads an unexpected dependency")
+    parser.add_argument('--output', type=Path, help="JSON file to write, printed to stdout by default")
+    args = parser.parse_args(argv)
+
+    result = run(args.modules, max(args.repeat, 1), args.top)
+
+    text = json.dumps(result, indent=2)
+    if args.output is None:
+        sys.stdout.write(text + '\n')
+    else:
+        args.output.write_text(text + '\n')
+        for name, entry in result['imports'].items():
+            print(f"{name}: {entry['seconds']:.3f} s, loads {', '.join(entry['loaded']) or 'nothing heavy'}")
+
+    unexpected = {name: x['unexpected'] for name, x in result['imports'].items() if x['unexpected']}
+    if args.check and unexpected:
+        for name, dependencies in unexpected.items():
+            print(f"{name} imports {', '.join(dependencies)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Synthetic Binance transaction history exports.
+
+Writes CSV files with the columns of the Binance "Generate all statements" export, readable by
+`BinanceCSVReader.import_directory`. Every coin gets a monthly fiat deposit, periodic DCA buys paid in fiat with their
+fee, occasional partial sells, a staking purchase and daily staking interest. The same arguments always generate the
+same files.
+"""
+import csv
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import List, Tuple
+
+from Core.CoinAPIExternal import CoinAPI
+
+COLUMNS = ('User_ID', 'UTC_Time', 'Account', 'Operation', 'Coin', 'Change', 'Remark')
+FIAT = 'EUR'
+# The database only accepts the coins CoinAPI knows
+KNOWN_COINS = tuple(x for x in CoinAPI._coin_data if x not in (FIAT, 'LDFTM', 'USDT', 'BUSD'))
+
+Row = Tuple[datetime, str, str, str, Decimal]
+
+
+@dataclass
+class PortfolioSpec:
+    coins: int = 10
+    days: int = 365
+    buy_every_days: int = 7
+    sell_every_buys: int = 6
+    interest: bool = True
+    start: datetime = datetime(2021, 1, 1)
+    seed: int = 0
+    rows_per_file: int = 100000
+
+
+def coin_names(number_of_coins: int) -> List[str]:
+    if number_of_coins > len(KNOWN_COINS):
+        raise ValueError(f"At most {len(KNOWN_COINS)} coins can be generated")
+    return list(KNOWN_COINS[:number_of_coins])
+
+
+def _quantity(value: float, digits: int = 8) -> Decimal:
+    return Decimal(value).quantize(Decimal(1).scaleb(-digits))
+
+
+def _coin_rows(coin: str, index: int, spec: PortfolioSpec, rng: random.Random) -> List[Row]:
+    rows = []
+    unit_price = 10 ** rng.uniform(-1, 4)
+    # Every coin trades at its own minute of the day so the generated ids never collide
+    offset = timedelta(hours=10, minutes=index % 600 // 10, seconds=index % 10 * 6)
+
+    bought = Decimal(0)
+    sold = Decimal(0)
+    staked = Decimal(0)
+    buys = 0
+    for day in range(spec.days):
+        date = spec.start + timedelta(days=day)
+        if date.day == 1:
+            rows.append((date + offset - timedelta(hours=1), 'Spot', 'Deposit', FIAT,
+                         _quantity(rng.uniform(100, 1000), 2)))
+
+        if day % spec.buy_every_days == 0:
+            fiat = rng.uniform(20, 200)
+            quantity = _quantity(fiat / unit_price)
+            if quantity > 0:
+                rows.append((date + offset, 'Spot', 'Buy', coin, quantity))
+                rows.append((date + offset, 'Spot', 'Buy', FIAT, -_quantity(fiat, 2)))
+                rows.append((date + offset, 'Spot', 'Fee', coin, -_quantity(float(quantity) * 0.001)))
+                bought += quantity
+                buys += 1
+
+                if buys % spec.sell_every_buys == 0:
+                    sell = _quantity(float(bought - sold) * rng.uniform(0.05, 0.3))
+                    if sell > 0:
+                        sell_time = date + offset + timedelta(hours=3)
+                        rows.append((sell_time, 'Spot', 'Sell', coin, -sell))
+                        rows.append((sell_time, 'Spot', 'Sell', FIAT, _quantity(float(sell) * unit_price, 2)))
+                        sold += sell
+
+        if spec.interest and buys:
+            if not staked:
+                staked = _quantity(float(bought) * 0.5)
+                rows.append((date + offset + timedelta(hours=1), 'Spot', 'POS savings purchase', coin, -staked))
+            interest = _quantity(float(staked) * 0.05 / 365)
+            if interest > 0:
+                rows.append((date + timedelta(hours=2, seconds=index % 3600), 'Spot', 'POS savings interest', coin,
+                             interest))
+
+        unit_price *= 1 + rng.gauss(0, 0.02)
+    return rows
+
+
+def generate_rows(spec: PortfolioSpec) -> List[Row]:
+    rng = random.Random(spec.seed)
+    rows = []
+    for index, coin in enumerate(coin_names(spec.coins)):
+        rows.extend(_coin_rows(coin, index, spec, rng))
+    rows.sort(key=lambda x: x[0])
+    return rows
+
+
+def write_export(directory: Path, spec: PortfolioSpec) -> List[Path]:
+    directory.mkdir(parents=True, exist_ok=True)
+    rows = generate_rows(spec)
+
+    paths = []
+    for part, first in enumerate(range(0, len(rows), spec.rows_per_file)):
+        path = directory / f"binance_export_{part:03d}.csv"
+        with path.open('w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            for time, account, operation, coin, change in rows[first:first + spec.rows_per_file]:
+                writer.writerow(('123456789', time.strftime('%Y-%m-%d %H:%M:%S'), account, operation, coin,
+                                 str(change), ''))
+        paths.append(path)
+    return paths